@@ -0,0 +1,3 @@
+"""
+This code defines the benchmarks with which HPML's performance can be measured.
+"""
@@ -0,0 +1,131 @@
+"""
+This code runs the benchmark suite from the command line. Run it from the root
+of the repository with:
+
+    python -m benchmarks --output results.json
+    python -m benchmarks --compare results.json
+"""
+
+# Standard imports.
+import argparse
+
+# Local imports.
+from .corpus import CorpusSpec
+from .suite import (
+    DEFAULT_REPEAT,
+    compare_results,
+    load_results,
+    run_suite,
+    save_results
+)
+
+#############
+# FUNCTIONS #
+#############
+
+def make_parser() -> argparse.ArgumentParser:
+    """ Ronseal. """
+    defaults = CorpusSpec()
+    result = argparse.ArgumentParser(description="Benchmark HPML.")
+    result.add_argument("--stanzas", type=int, default=defaults.stanza_count)
+    result.add_argument(
+        "--lines-per-stanza",
+        type=int,
+        default=defaults.lines_per_stanza
+    )
+    result.add_argument(
+        "--words-per-line",
+        type=int,
+        default=defaults.words_per_line
+    )
+    result.add_argument(
+        "--chorus-frequency",
+        type=float,
+        default=defaults.chorus_frequency
+    )
+    result.add_argument(
+        "--minichorus-frequency",
+        type=float,
+        default=defaults.minichorus_frequency
+    )
+    result.add_argument(
+        "--density",
+        action="append",
+        default=[],
+        metavar="KEY=CHANCE",
+        help=(
+            "Set the chance that a line contains a given semantic command; "+
+            "give this once for each command, in place of the defaults."
+        )
+    )
+    result.add_argument(
+        "--fraction-usage",
+        type=float,
+        default=defaults.fraction_usage
+    )
+    result.add_argument("--seed", type=int, default=defaults.seed)
+    result.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    result.add_argument(
+        "--only",
+        help="Run only the benchmarks whose names contain this string."
+    )
+    result.add_argument("--output", help="Save the results to this JSON file.")
+    result.add_argument(
+        "--compare",
+        help="Compare the results with those saved in this JSON file."
+    )
+    return result
+
+def parse_densities(densities) -> dict[str, float]:
+    """ Parse each KEY=CHANCE string. """
+    result = {}
+    for density in densities:
+        key, _, chance = density.partition("=")
+        result[key.strip()] = float(chance)
+    return result
+
+def print_results(results, ratios=None):
+    """ Print a table of results, with the ratio to a previous run if one is
+    given. """
+    for item in results["results"]:
+        row = (
+            item["name"].ljust(40)+
+            format(item["median_time"]*1000, "10.3f")+" ms"+
+            format(item["lines_per_second"], "14,.0f")+" lines/s"+
+            format(item["peak_memory"]/1024, "12,.1f")+" KiB"
+        )
+        if ratios and (item["name"] in ratios):
+            row += format(ratios[item["name"]], "8.2f")+"x"
+        print(row)
+
+###################
+# RUN AND WRAP UP #
+###################
+
+def run():
+    """ Run this file. """
+    arguments = make_parser().parse_args()
+    options = {}
+    if arguments.density:
+        options["command_density"] = parse_densities(arguments.density)
+    spec = \
+        CorpusSpec(
+            stanza_count=arguments.stanzas,
+            lines_per_stanza=arguments.lines_per_stanza,
+            words_per_line=arguments.words_per_line,
+            chorus_frequency=arguments.chorus_frequency,
+            minichorus_frequency=arguments.minichorus_frequency,
+            fraction_usage=arguments.fraction_usage,
+            seed=arguments.seed,
+            **options
+        )
+    results = run_suite(spec, repeat=arguments.repeat, only=arguments.only)
+    ratios = None
+    if arguments.compare:
+        ratios = compare_results(load_results(arguments.compare), results)
+    print_results(results, ratios)
+    if arguments.output:
+        save_results(results, arguments.output)
+
+if __name__ == "__main__":
+    run()
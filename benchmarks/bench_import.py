@@ -0,0 +1,94 @@
+"""
+This code defines a benchmark which measures how long a fresh process takes to
+import HPML, and then to compile its first poem, with and without the
+precompiled translators.
+
+Run it from the root of the repository with:
+
+    python -m benchmarks.bench_import
+"""
+
+# Standard imports.
+from pathlib import Path
+from statistics import median
+from tempfile import TemporaryDirectory
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Local constants.
+PATH_OBJ_TO_ROOT = Path(__file__).parent.parent
+DEFAULT_RUNS = 20
+CACHE_DIR_ENV_VAR = "HPML_CACHE_DIR"
+CHILD_CODE = """
+import json, time
+start = time.perf_counter()
+try:
+    import hpml
+except ImportError:
+    import source as hpml
+imported = time.perf_counter()
+hpml.HPMLCompiler(input_string="#PERSON{Sappho} #ADD I\\nThe moon.").compile()
+compiled = time.perf_counter()
+timings = {"import": imported-start, "first_compile": compiled-imported}
+print(json.dumps(timings))
+"""
+
+#############
+# FUNCTIONS #
+#############
+
+def time_child(path_to_cache_dir) -> dict:
+    """ Run the child code in a fresh interpreter, and return its timings. """
+    env = dict(os.environ, **{CACHE_DIR_ENV_VAR: path_to_cache_dir})
+    completed = \
+        subprocess.run(
+            [sys.executable, "-c", CHILD_CODE],
+            cwd=PATH_OBJ_TO_ROOT,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True
+        )
+    return json.loads(completed.stdout)
+
+def run_benchmark(runs=DEFAULT_RUNS) -> dict:
+    """ Time a number of cold starts, in each of which the translators have to
+    be built, and of warm starts, in each of which they are loaded from the
+    cache, and return the median timings in milliseconds. """
+    result = {}
+    with TemporaryDirectory() as path_to_warm_cache_dir:
+        time_child(path_to_warm_cache_dir)
+        for mode in ("cold", "warm"):
+            timings = []
+            for _ in range(runs):
+                if mode == "cold":
+                    with TemporaryDirectory() as path_to_cold_cache_dir:
+                        timings.append(time_child(path_to_cold_cache_dir))
+                else:
+                    timings.append(time_child(path_to_warm_cache_dir))
+            result[mode] = {
+                key: median(timing[key] for timing in timings)*1000
+                for key in timings[0]
+            }
+    return result
+
+###################
+# RUN AND WRAP UP #
+###################
+
+def run():
+    """ Run this file. """
+    parser = argparse.ArgumentParser(description="Time HPML's start-up.")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS)
+    arguments = parser.parse_args()
+    for mode, timings in run_benchmark(runs=arguments.runs).items():
+        print(
+            mode+": import "+format(timings["import"], ".1f")+" ms, "+
+            "first compile "+format(timings["first_compile"], ".1f")+" ms"
+        )
+
+if __name__ == "__main__":
+    run()
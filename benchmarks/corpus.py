@@ -0,0 +1,128 @@
+"""
+This code defines a generator of synthetic HPML, with which the benchmarks can
+be fed a corpus of any size and shape.
+"""
+
+# Standard imports.
+from dataclasses import dataclass, field
+import random
+
+# Source imports.
+from source.lookups import SEMANTICS, ENDBLC, FRACTIONS
+
+# Local constants.
+WORDS = (
+    "the", "moon", "and", "sea", "of", "green", "silent", "ships", "sail",
+    "over", "a", "field", "where", "old", "kings", "lie", "in", "stone",
+    "light", "falls", "upon", "thy", "brow", "like", "rain", "through",
+    "ancient", "towers", "dreaming", "westward", "far", "beyond", "gold"
+)
+PROPER_NOUNS = (
+    "Arcady", "Tempe", "Sappho", "Keats", "Hesperus", "Albion", "Troy",
+    "Endymion", "Ganges", "Hector"
+)
+# The semantic commands which can turn up inside a line, and whether each one
+# takes an argument.
+INLINE_SEMANTICS = {
+    "add": False,
+    "tab": False,
+    "person": True,
+    "place": True,
+    "publication": True,
+    "ship": True,
+    "foreign": True,
+    "ital": True,
+    "stress": True,
+    "sub": True,
+    "footnote": True,
+    "blfootnote": True,
+    "whitespace": True,
+    "flagverse": True,
+    "marginnote": True
+}
+MINI_BLOCKS = (SEMANTICS.minichorus.hpml, SEMANTICS.miniinscription.hpml)
+DEFAULT_COMMAND_DENSITY = {
+    "add": 0.1,
+    "tab": 0.3,
+    "person": 0.05,
+    "place": 0.05,
+    "publication": 0.02,
+    "ship": 0.02,
+    "foreign": 0.02,
+    "ital": 0.02,
+    "stress": 0.01,
+    "footnote": 0.01
+}
+
+##############
+# MAIN CLASS #
+##############
+
+@dataclass
+class CorpusSpec:
+    """ The knobs which shape a synthetic corpus. The command density gives,
+    for each key in SEMANTICS which can turn up inside a line, the chance that
+    a given line contains that command. The chorus frequency is the chance
+    that a given stanza is a chorus; the mini-chorus frequency and the
+    fraction usage are the chances that a given line is a mini-chorus, and
+    that it contains a fraction. """
+    stanza_count: int = 100
+    lines_per_stanza: int = 8
+    words_per_line: int = 8
+    command_density: dict[str, float] = \
+        field(default_factory=lambda: dict(DEFAULT_COMMAND_DENSITY))
+    chorus_frequency: float = 0.1
+    minichorus_frequency: float = 0.05
+    fraction_usage: float = 0.02
+    seed: int = 0
+
+    def __post_init__(self):
+        for key in self.command_density:
+            if key not in INLINE_SEMANTICS:
+                raise ValueError("No inline semantic command with key: "+key)
+
+    def get_line_count(self) -> int:
+        """ Count the lines of verse which the corpus will contain. """
+        return self.stanza_count*self.lines_per_stanza
+
+#############
+# FUNCTIONS #
+#############
+
+def generate_hpml(spec=None) -> str:
+    """ Generate a poem in HPML, to a given spec. The same spec always gives
+    the same poem. """
+    if spec is None:
+        spec = CorpusSpec()
+    rand = random.Random(spec.seed)
+    stanzas = []
+    for _ in range(spec.stanza_count):
+        stanza = [
+            generate_line(spec, rand) for _ in range(spec.lines_per_stanza)
+        ]
+        if rand.random() < spec.chorus_frequency:
+            stanza.insert(0, SEMANTICS.chorus.hpml)
+        stanzas.append("\n".join(stanza))
+    return "\n\n".join(stanzas)+"\n"
+
+def generate_line(spec, rand) -> str:
+    """ Generate a single line of verse. """
+    words = [rand.choice(WORDS) for _ in range(spec.words_per_line)]
+    words[0] = words[0].capitalize()
+    for key, density in spec.command_density.items():
+        if rand.random() >= density:
+            continue
+        hpml = getattr(SEMANTICS, key).hpml
+        if INLINE_SEMANTICS[key]:
+            index = rand.randrange(len(words))
+            words[index] = hpml+rand.choice(PROPER_NOUNS)+ENDBLC
+        elif key == "tab":
+            words.insert(0, hpml)
+        else:
+            words.insert(rand.randrange(1, len(words)+1), hpml)
+    if rand.random() < spec.fraction_usage:
+        words.insert(rand.randrange(len(words)+1), rand.choice(list(FRACTIONS)))
+    line = " ".join(words)
+    if rand.random() < spec.minichorus_frequency:
+        line = rand.choice(MINI_BLOCKS)+line
+    return line
@@ -0,0 +1,181 @@
+"""
+This code defines the benchmarks for the compiler's public entry points and for
+each of its stages, and the machinery with which they are timed, and their
+results saved and compared.
+"""
+
+# pylint: disable=protected-access
+
+# Standard imports.
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from operator import methodcaller
+from statistics import median
+import json
+import platform
+import time
+import tracemalloc
+
+# Source imports.
+from source.centerer import Centerer
+from source.hpml_compiler import STANDARD_MODS, HPMLCompiler
+from source.preprocessor import Preprocessor
+
+# Local imports.
+from .corpus import CorpusSpec, generate_hpml
+
+# Local constants.
+DEFAULT_REPEAT = 5
+RESULTS_VERSION = 1
+
+###########
+# RESULTS #
+###########
+
+@dataclass
+class BenchmarkResult:
+    """ The result of running one benchmark a number of times. Times are in
+    seconds, and memory in bytes. """
+    name: str
+    line_count: int
+    repeat: int
+    median_time: float
+    best_time: float
+    lines_per_second: float
+    peak_memory: int
+
+##########
+# STAGES #
+##########
+
+def get_latex_lines(compiler):
+    """ Gather the lines, ready to be enclosed. """
+    compiler._lines = compiler._document.get_latex_lines()
+
+# Each stage of HPMLCompiler.compile(), in the order in which they run.
+STAGES = (
+    ("_preprocess", methodcaller("_preprocess")),
+    ("_parse", methodcaller("_parse")),
+    ("_emit", methodcaller("_emit")),
+    ("_restore_stanzas", methodcaller("_restore_stanzas")),
+    ("_process_choruses", methodcaller("_process_choruses")),
+    ("_process_minichoruses", methodcaller("_process_minichoruses")),
+    ("_add_endings", methodcaller("_add_endings")),
+    ("_translate", methodcaller("_translate")),
+    ("_store_stanzas", methodcaller("_store_stanzas")),
+    ("get_latex_lines", get_latex_lines),
+    ("_center_output", methodcaller("_center_output"))
+)
+
+#############
+# FUNCTIONS #
+#############
+
+def get_benchmarks(hpml) -> list[tuple]:
+    """ Return a (name, setup, run) triple for each benchmark. Each setup
+    function returns the state which the run function is then passed. """
+    result = [
+        (
+            "HPMLCompiler.compile",
+            lambda: HPMLCompiler(input_string=hpml),
+            methodcaller("compile")
+        ),
+        (
+            "Preprocessor.preprocess",
+            lambda: Preprocessor(hpml, STANDARD_MODS),
+            methodcaller("preprocess")
+        ),
+        (
+            "Centerer.get_settowidth_string",
+            lambda: Centerer(input_string=hpml),
+            methodcaller("get_settowidth_string")
+        )
+    ]
+    for index, (name, run) in enumerate(STAGES):
+        result.append(
+            (
+                "HPMLCompiler."+name,
+                lambda index=index: set_up_stage(hpml, index),
+                run
+            )
+        )
+    return result
+
+def set_up_stage(hpml, index) -> HPMLCompiler:
+    """ Make a compiler, and run every stage before a given one. """
+    result = HPMLCompiler(input_string=hpml)
+    for _, run in STAGES[:index]:
+        run(result)
+    return result
+
+def measure(name, setup, run, line_count, repeat=DEFAULT_REPEAT):
+    """ Time a benchmark a number of times, and then find its peak memory on
+    one more run. Only the run function is timed or traced. """
+    times = []
+    for _ in range(repeat):
+        state = setup()
+        start = time.perf_counter()
+        run(state)
+        times.append(time.perf_counter()-start)
+    state = setup()
+    tracemalloc.start()
+    try:
+        run(state)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    median_time = median(times)
+    result = \
+        BenchmarkResult(
+            name=name,
+            line_count=line_count,
+            repeat=repeat,
+            median_time=median_time,
+            best_time=min(times),
+            lines_per_second=line_count/median_time if median_time else 0.0,
+            peak_memory=peak_memory
+        )
+    return result
+
+def run_suite(spec=None, repeat=DEFAULT_REPEAT, only=None) -> dict:
+    """ Run every benchmark, or only those whose names contain a given
+    string, against a corpus generated to a given spec. """
+    if spec is None:
+        spec = CorpusSpec()
+    hpml = generate_hpml(spec)
+    line_count = spec.get_line_count()
+    results = []
+    for name, setup, run in get_benchmarks(hpml):
+        if only and (only not in name):
+            continue
+        results.append(measure(name, setup, run, line_count, repeat))
+    result = {
+        "version": RESULTS_VERSION,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "corpus": asdict(spec),
+        "results": [asdict(item) for item in results]
+    }
+    return result
+
+def save_results(results, path):
+    """ Ronseal. """
+    with open(path, "w") as results_file:
+        json.dump(results, results_file, indent=4)
+
+def load_results(path) -> dict:
+    """ Ronseal. """
+    with open(path, "r") as results_file:
+        return json.load(results_file)
+
+def compare_results(old, new) -> dict[str, float]:
+    """ Give, for each benchmark in both runs, the ratio of its new median
+    time to its old one, so that anything above 1 is a slowdown. """
+    old_times = {item["name"]: item["median_time"] for item in old["results"]}
+    result = {}
+    for item in new["results"]:
+        old_time = old_times.get(item["name"])
+        if old_time:
+            result[item["name"]] = item["median_time"]/old_time
+    return result
@@ -13,6 +13,7 @@ GIT_URL_STEM = "https://github.com/tomhosker"
 AUTHOR = "Tom Hosker"
 AUTHOR_EMAIL = "tomdothosker@gmail.com"
 SCRIPT_PATHS = ()
+ENTRY_POINTS = {"console_scripts": ["hpml=hpml.cli:run_cli"]}
 INSTALL_REQUIRES = ("hosker_utils",)
 INCLUDE_PACKAGE_DATA = True
 
@@ -31,6 +32,7 @@ setup(
     package_dir={ PACKAGE_NAME: "source" },
     packages=[PACKAGE_NAME],
     scripts=SCRIPT_PATHS,
+    entry_points=ENTRY_POINTS,
     install_requires=INSTALL_REQUIRES,
     include_package_data=INCLUDE_PACKAGE_DATA
 )
@@ -3,8 +3,48 @@ This code compiles HPML (Hosker's Poetical Markup Language) into LaTeX.
 """
 
 # Local imports.
+from .cache import CompileCache
 from .hpml_compiler import HPMLCompiler
+from .registry import CommandRegistry
+from .stats import CompileStats
 from .utils import get_package_code
 
 # Local constants.
-PACKAGE_CODE = get_package_code()
+# The names which are imported only if and when they are asked for, since the
+# modules which define them are slow to import, and not needed by every user,
+# mapped to those modules.
+LAZY_NAMES = {
+    "Anthology": "anthology",
+    "AsyncCompiler": "asynchronous",
+    "compile_async": "asynchronous",
+    "compile_file_async": "asynchronous",
+    "BatchResult": "batch",
+    "compile_many": "batch",
+    "Builder": "builder",
+    "BuildReport": "builder",
+    "CorpusReader": "corpus_reader",
+    "HPMLEngine": "engine",
+    "CorpusIndex": "indexer",
+    "StreamingCompiler": "streaming",
+    "TeXRunner": "tex_runner",
+    "wrap_in_document": "tex_runner",
+    "Watcher": "watcher"
+}
+
+###########
+# LOADERS #
+###########
+
+def __getattr__(name):
+    """ Read the package code, and import each of the slower modules, only if
+    and when they are asked for. """
+    if name == "PACKAGE_CODE":
+        globals()[name] = get_package_code()
+        return globals()[name]
+    if name in LAZY_NAMES:
+        # pylint: disable-next=import-outside-toplevel
+        from importlib import import_module
+        module = import_module("."+LAZY_NAMES[name], __name__)
+        globals()[name] = getattr(module, name)
+        return globals()[name]
+    raise AttributeError("module "+__name__+" has no attribute "+name)
@@ -0,0 +1,294 @@
+"""
+This code defines a class which compiles an ANTHOLOGY, i.e. a single HPML file
+containing many poems, into a single LaTeX file.
+
+Each poem begins with a ###POEM line, optionally giving its title, e.g.
+###POEM{Ode on a Grecian Urn}, and may override the options with which it is
+compiled, e.g. ###OPTIONS{is_prose_poem=true, line_numbers=5}. Each poem may
+also have its own ###EPIGRAPH and ###SETTOWIDTH directives.
+
+An anthology given as a file is memory-mapped, and split into poems by scanning
+its bytes; each worker then reads its own poems straight from the file.
+"""
+
+# Standard imports.
+from pathlib import Path
+import re
+import warnings
+
+# Local imports.
+from .batch import compile_many
+from .corpus_reader import CorpusReader
+from .hpml_compiler import HPMLCompilerException
+from .lookups import SEMANTICS, ENDBLC, OtherLaTeX
+from .parser import is_directive
+from .translator import get_latex_translator
+from .utils import TEX_EXTENSION, get_package_code
+
+# Local constants.
+POEM_OPTIONS = {
+    "is_prose_poem": bool,
+    "enclose": bool,
+    "auto_center": bool,
+    "estimate_widths": bool,
+    "line_numbers": int,
+    "mods": list
+}
+TRUE_STRINGS = ("true", "yes", "1")
+FALSE_STRINGS = ("false", "no", "0")
+POEM_MARKER_PATTERN = \
+    re.compile(
+        b"^[^\\S\\n]*"+re.escape(SEMANTICS.poem.hpml.encode())+
+        b"(?:\\{[^\\n]*\\})?[^\\S\\n]*$",
+        re.MULTILINE
+    )
+OPTIONS_PATTERN = \
+    re.compile(
+        b"^[^\\S\\n]*"+re.escape(SEMANTICS.options.hpml.encode())+
+        b"[^\\n]*\\}[^\\S\\n]*$",
+        re.MULTILINE
+    )
+
+##############
+# MAIN CLASS #
+##############
+
+class Anthology:
+    """ The class in question. """
+    def __init__(
+            self,
+            path_to_input_file=None,
+            input_string=None,
+            path_to_output_file=None,
+            jobs=None,
+            include_preamble=True,
+            **options
+        ):
+        if path_to_input_file and input_string:
+            raise HPMLCompilerException(
+                "You must Specify either an input file or an input string, "+
+                "but NOT BOTH."
+            )
+        if not path_to_input_file and not input_string:
+            raise HPMLCompilerException(
+                "You must specify either an input file or an input string."
+            )
+        self.path_to_input_file = path_to_input_file
+        self.input_string = input_string
+        self.path_to_output_file = path_to_output_file
+        if path_to_input_file and not path_to_output_file:
+            self.path_to_output_file = \
+                Path(path_to_input_file).with_suffix(TEX_EXTENSION)
+        self.jobs = jobs
+        self.include_preamble = include_preamble
+        self.options = options
+        self.output_string = None
+
+    def compile(self) -> str:
+        """ Compile each poem, in parallel, and stitch the results together, in
+        order. """
+        poems = list(self.iter_poems())
+        # Each source is a string of HPML, or a slice, never a path, so that no
+        # poem can be mistaken for a file.
+        items = [(poem.source, poem.options) for poem in poems]
+        results = \
+            compile_many(items, jobs=self.jobs, save=False, **self.options)
+        blocks = []
+        if self.include_preamble:
+            blocks.append(get_package_code().rstrip("\n"))
+        for index, (poem, result) in enumerate(zip(poems, results)):
+            if not result.ok:
+                raise HPMLCompilerException(
+                    "Failed to compile poem "+str(index+1)+
+                    describe_title(poem.title)+": "+str(result.error)
+                )
+            if poem.title is not None:
+                blocks.append(
+                    OtherLaTeX.POEM_TITLE.value+poem.title+ENDBLC+"\n"+
+                    result.output_string
+                )
+            else:
+                blocks.append(result.output_string)
+        self.output_string = "\n\n".join(blocks)
+        if self.path_to_output_file:
+            return self.path_to_output_file
+        return self.output_string
+
+    def iter_poems(self):
+        """ Split the input into poems, leaving out any poem which is nothing
+        but blank lines. """
+        if self.input_string is None:
+            with CorpusReader(self.path_to_input_file) as reader:
+                yield from iter_mapped_poems(reader)
+            return
+        poem = None
+        for line in self.input_string.split("\n"):
+            if is_poem_marker(line):
+                if poem and poem.has_content():
+                    yield poem.finish()
+                poem = Poem(title=get_poem_title(line))
+            elif poem is None:
+                if line.strip():
+                    poem = Poem(lines=[line])
+            else:
+                poem.add_line(line)
+        if poem and poem.has_content():
+            yield poem.finish()
+
+    def save_to_file(self) -> str:
+        """ Save the output string to a file. """
+        if not self.path_to_output_file:
+            raise HPMLCompilerException("No save file path specified.")
+        with open(self.path_to_output_file, "w") as output_file:
+            output_file.write(self.output_string)
+        return self.path_to_output_file
+
+##################
+# HELPER CLASSES #
+##################
+
+class Poem:
+    """ A single poem within an anthology. Its source is what is handed to the
+    compiler: either its HPML, or a slice of a mapped file. """
+    def __init__(self, title=None, lines=None):
+        self.title = title
+        self.lines = lines or []
+        self.options = {}
+        self.hpml = None
+        self.source = None
+
+    def add_line(self, line):
+        """ Add a line, unless it is the poem's first set of options. """
+        marker = SEMANTICS.options.hpml
+        if (not self.options) and is_directive(line.strip(), marker):
+            self.options = parse_poem_options(line.strip()[len(marker):-1])
+        else:
+            self.lines.append(line)
+
+    def has_content(self) -> bool:
+        """ Determine whether any line of the poem isn't blank. """
+        return any(line.strip() for line in self.lines)
+
+    def finish(self):
+        """ Join the lines into a single string of HPML. """
+        self.hpml = "\n".join(self.lines)
+        self.source = self.hpml
+        return self
+
+####################
+# HELPER FUNCTIONS #
+####################
+
+def iter_mapped_poems(reader):
+    """ Split a mapped file into poems, as Anthology.iter_poems() splits a
+    string, but without reading the file into memory. """
+    markers = [
+        (start, end)
+        for start, end in reader.find_lines(POEM_MARKER_PATTERN)
+        if is_poem_marker(reader.decode(start, end))
+    ]
+    boundaries = [start for start, _ in markers]+[len(reader)]
+    first_line = reader.find_content(0, boundaries[0])
+    if first_line != -1:
+        poem = \
+            make_mapped_poem(
+                reader,
+                None,
+                first_line,
+                boundaries[0],
+                is_implicit=True
+            )
+        if poem:
+            yield poem
+    for (start, end), boundary in zip(markers, boundaries[1:]):
+        if boundary <= end+1:
+            continue
+        title = get_poem_title(reader.decode(start, end))
+        poem = make_mapped_poem(reader, title, end+1, boundary)
+        if poem:
+            yield poem
+
+def make_mapped_poem(reader, title, start, boundary, is_implicit=False):
+    """ Make a poem from the lines between a given start and the next
+    boundary, or return None if it is nothing but blank lines. A poem which
+    doesn't begin with a marker can't have its options set on its first
+    line. """
+    end = reader.trim_line_break(start, boundary)
+    result = Poem(title=title)
+    options_start = start
+    if is_implicit:
+        options_start = reader.find_line_break(start, end)+1 or end
+    cuts = []
+    marker = SEMANTICS.options.hpml
+    for line_start, line_end in \
+            reader.find_lines(OPTIONS_PATTERN, options_start, end):
+        if result.options:
+            break
+        line = reader.decode(line_start, line_end).strip()
+        if not is_directive(line, marker):
+            continue
+        result.options = parse_poem_options(line[len(marker):-1])
+        cuts.append((line_start, line_end))
+    result.source = reader.make_slice(start, end, cuts)
+    for range_start, range_end in result.source.ranges:
+        if reader.find_content(range_start, range_end) != -1:
+            return result
+    return None
+
+def is_poem_marker(line) -> bool:
+    """ Determine whether a given line begins a new poem. """
+    line = line.strip()
+    marker = SEMANTICS.poem.hpml
+    return (
+        (line == marker) or
+        is_directive(line, marker+OtherLaTeX.START_BLOCK.value)
+    )
+
+def get_poem_title(line) -> str|None:
+    """ Get the title from a line which begins a new poem, if it has one. """
+    line = line.strip()
+    marker = SEMANTICS.poem.hpml+OtherLaTeX.START_BLOCK.value
+    if is_directive(line, marker):
+        return get_latex_translator().translate(line[len(marker):-1]) or None
+    return None
+
+def parse_poem_options(string) -> dict:
+    """ Parse a string of the form "key=value, key=value", giving the options
+    for a single poem. """
+    result = {}
+    for item in string.split(","):
+        if not item.strip():
+            continue
+        key, _, value = item.partition("=")
+        key = key.strip()
+        value = value.strip()
+        if key not in POEM_OPTIONS:
+            warnings.warn("Unrecognised poem option: "+key)
+        elif POEM_OPTIONS[key] is bool:
+            result[key] = parse_bool(key, value)
+        elif POEM_OPTIONS[key] is int:
+            if not value.isdigit():
+                raise HPMLCompilerException(
+                    "The poem option "+key+" must be a whole number, not: "+
+                    value
+                )
+            result[key] = int(value)
+        else:
+            result[key] = value.split()
+    return result
+
+def parse_bool(key, value) -> bool:
+    """ Ronseal. """
+    if value.lower() in TRUE_STRINGS:
+        return True
+    if value.lower() in FALSE_STRINGS:
+        return False
+    raise HPMLCompilerException(
+        "The poem option "+key+" must be true or false, not: "+value
+    )
+
+def describe_title(title) -> str:
+    """ Describe a poem's title in an error message. """
+    if title is None:
+        return ""
+    return " ("+title+")"
@@ -0,0 +1,121 @@
+"""
+This code defines a class, and a couple of functions, with which HPML can be
+compiled from within an asyncio event loop, without blocking it.
+"""
+
+# Standard imports.
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+import asyncio
+
+# Local imports.
+from .engine import HPMLEngine
+from .hpml_compiler import HPMLCompiler
+from .utils import TEX_EXTENSION
+
+# Local constants.
+DEFAULT_MAX_CONCURRENCY = 4
+
+##############
+# MAIN CLASS #
+##############
+
+class AsyncCompiler:
+    """ The class in question. The compiling itself is handed to an executor -
+    the event loop's default thread pool, unless another executor is given -
+    and no more than a given number of compilations run at once. Files are
+    read and written in a worker thread. """
+    def __init__(
+            self,
+            executor=None,
+            max_concurrency=DEFAULT_MAX_CONCURRENCY,
+            engine=None,
+            **defaults
+        ):
+        if engine is None:
+            engine = HPMLEngine(**defaults)
+        elif defaults:
+            raise AsyncCompilerException(
+                "You must specify either an engine or a set of defaults, "+
+                "but NOT BOTH."
+            )
+        self.executor = executor
+        self.engine = engine
+        self.max_concurrency = max_concurrency
+        self._semaphore = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """ Make the semaphore the first time it is needed, so that it belongs
+        to the running loop. """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def compile(self, text, **overrides) -> str:
+        """ Compile a string of HPML, and return the output. """
+        if isinstance(self.executor, ProcessPoolExecutor):
+            # The engine's cache and stats can't cross into another process,
+            # so send only the text and the options.
+            job = \
+                partial(
+                    compile_text,
+                    text,
+                    self.engine.get_options(overrides),
+                    self.engine.registry
+                )
+        else:
+            job = partial(self.engine.compile, text, **overrides)
+        loop = asyncio.get_running_loop()
+        async with self._get_semaphore():
+            return await loop.run_in_executor(self.executor, job)
+
+    async def compile_file(self, path, out_path=None, **overrides) -> Path:
+        """ Compile a file of HPML, save the output alongside it, or to a given
+        path, and return the path to which it was saved. """
+        path = Path(path)
+        if out_path is None:
+            out_path = path.with_suffix(TEX_EXTENSION)
+        out_path = Path(out_path)
+        text = await asyncio.to_thread(path.read_text)
+        output_string = await self.compile(text, **overrides)
+        await asyncio.to_thread(out_path.write_text, output_string)
+        return out_path
+
+##################
+# HELPER CLASSES #
+##################
+
+class AsyncCompilerException(Exception):
+    """ A custom exception. """
+
+#############
+# FUNCTIONS #
+#############
+
+async def compile_async(text, executor=None, **options) -> str:
+    """ Compile a string of HPML without blocking the event loop. To cap the
+    number of compilations across many calls, share an AsyncCompiler
+    instead. """
+    compiler = AsyncCompiler(executor=executor, **options)
+    return await compiler.compile(text)
+
+async def compile_file_async(
+        path,
+        out_path=None,
+        executor=None,
+        **options
+    ) -> Path:
+    """ Compile a file of HPML without blocking the event loop. """
+    compiler = AsyncCompiler(executor=executor, **options)
+    return await compiler.compile_file(path, out_path)
+
+####################
+# HELPER FUNCTIONS #
+####################
+
+def compile_text(text, options, registry=None) -> str:
+    """ Compile a string of HPML with a given set of options. This is what a
+    worker process runs. """
+    compiler = HPMLCompiler(input_string=text, registry=registry, **options)
+    return compiler.compile()
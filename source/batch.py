@@ -0,0 +1,120 @@
+"""
+This code defines a function which compiles many pieces of HPML at once, across
+a pool of processes.
+"""
+
+# Standard imports.
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+import os
+
+# Local imports.
+from .corpus_reader import CorpusReader, CorpusSlice
+from .hpml_compiler import HPMLCompiler
+
+# Local constants.
+CHUNKS_PER_WORKER = 4
+
+# The readers which this process has open, keyed on the path to each file, so
+# that the many slices of one file are read without mapping it for each.
+_readers = {}
+
+###########
+# RESULTS #
+###########
+
+@dataclass
+class BatchResult:
+    """ The result of compiling one item in a batch. """
+    item: str|Path|CorpusSlice
+    output_string: str|None = None
+    path_to_output_file: str|None = None
+    error: Exception|None = None
+
+    @property
+    def ok(self) -> bool:
+        """ Ronseal. """
+        return self.error is None
+
+#############
+# FUNCTIONS #
+#############
+
+def compile_many(
+        paths_or_strings,
+        jobs: int|None = None,
+        chunksize: int|None = None,
+        save: bool = True,
+        **options
+    ) -> list[BatchResult]:
+    """ Compile each item, returning the results in the order given. An item
+    is treated as a path if, and only if, it is a Path object; a string is
+    always treated as HPML, whatever it looks like. Any other keyword
+    arguments are passed on to each HPMLCompiler. An item may also be given
+    as a (path_or_string, overrides) pair, where the overrides are keyword
+    arguments for that item alone. An item may also be a slice of a mapped
+    file, which is read only in the process which compiles it, each process
+    mapping the file only once.
+
+    Each worker process imports the lookups, and builds the translators, once;
+    items are then handed out in chunks. """
+    items = list(paths_or_strings)
+    compile_item = partial(_compile_item, save=save, options=options)
+    if not jobs:
+        jobs = os.cpu_count() or 1
+    jobs = min(jobs, len(items))
+    if jobs <= 1:
+        try:
+            return [compile_item(item) for item in items]
+        finally:
+            close_readers()
+    if not chunksize:
+        chunksize = max(1, len(items)//(jobs*CHUNKS_PER_WORKER))
+    # This is slow to import, and only needed for a pool, so import it here.
+    # pylint: disable-next=import-outside-toplevel
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(compile_item, items, chunksize=chunksize))
+
+def is_path(item) -> bool:
+    """ Decide whether an item in a batch is a path or a string of HPML. """
+    return isinstance(item, Path)
+
+####################
+# HELPER FUNCTIONS #
+####################
+
+def _compile_item(item, save, options) -> BatchResult:
+    """ Compile a single item, catching any error. """
+    result = BatchResult(item)
+    if isinstance(item, tuple):
+        item, overrides = item
+        options = dict(options, **overrides)
+    try:
+        if isinstance(item, CorpusSlice):
+            reader = get_reader(item.path_to_input_file)
+            compiler = HPMLCompiler(input_string=item.read(reader), **options)
+        elif is_path(item):
+            compiler = HPMLCompiler(path_to_input_file=str(item), **options)
+        else:
+            compiler = HPMLCompiler(input_string=item, **options)
+        compiler.compile()
+        result.output_string = compiler.output_string
+        if save and compiler.path_to_output_file:
+            result.path_to_output_file = str(compiler.save_to_file())
+    except Exception as error: # pylint: disable=broad-exception-caught
+        result.error = error
+    return result
+
+def get_reader(path_to_input_file) -> CorpusReader:
+    """ Get this process's reader of a given file, mapping the file the first
+    time it is asked for. A worker's readers are closed when it exits. """
+    if path_to_input_file not in _readers:
+        _readers[path_to_input_file] = CorpusReader(path_to_input_file)
+    return _readers[path_to_input_file]
+
+def close_readers():
+    """ Close each of this process's readers. """
+    while _readers:
+        _readers.popitem()[1].close()
@@ -0,0 +1,153 @@
+"""
+This code defines a class which builds a directory tree of HPML files
+incrementally, keeping a manifest of what each output was built from.
+"""
+
+# Standard imports.
+from dataclasses import dataclass, field
+from pathlib import Path
+import hashlib
+import json
+import os
+
+# Local imports.
+from .batch import compile_many
+from .utils import HPML_EXTENSION, TEX_EXTENSION, get_lookups_fingerprint
+
+# Local constants.
+MANIFEST_FN = ".hpml_manifest.json"
+MANIFEST_VERSION = 1
+
+##############
+# MAIN CLASS #
+##############
+
+class Builder:
+    """ The class in question. """
+    def __init__(self, path_to_root, jobs=None, force=False, **options):
+        self.path_obj_to_root = Path(path_to_root)
+        self.path_obj_to_manifest = self.path_obj_to_root/MANIFEST_FN
+        self.jobs = jobs
+        self.force = force
+        self.options = options
+        self.options_hash = hash_options(options)
+        self.lookups_fingerprint = get_lookups_fingerprint()
+
+    def build(self) -> "BuildReport":
+        """ Rebuild each stale output, and remove each orphaned one. """
+        report = BuildReport()
+        old_entries = self._read_manifest()
+        new_entries = {}
+        stale = {}
+        pattern = "*"+HPML_EXTENSION
+        for path_obj in sorted(self.path_obj_to_root.rglob(pattern)):
+            key = self._get_key(path_obj)
+            entry = self._check_entry(path_obj, old_entries.pop(key, None))
+            if entry is None:
+                stale[key] = self._make_entry(path_obj)
+            else:
+                new_entries[key] = entry
+                report.skipped.append(str(path_obj))
+        paths_to_stale = [self.path_obj_to_root/key for key in stale]
+        results = compile_many(paths_to_stale, jobs=self.jobs, **self.options)
+        for key, result in zip(stale, results):
+            path = str(self.path_obj_to_root/key)
+            if result.ok:
+                new_entries[key] = stale[key]
+                report.compiled.append(path)
+            else:
+                report.failed.append((path, result.error))
+        for entry in old_entries.values():
+            path_obj_to_output = self.path_obj_to_root/entry["output"]
+            if path_obj_to_output.exists():
+                path_obj_to_output.unlink()
+                report.removed.append(str(path_obj_to_output))
+        self._write_manifest(new_entries)
+        return report
+
+    def _check_entry(self, path_obj, entry) -> dict|None:
+        """ Return an up-to-date manifest entry for a given source, or None if
+        its output needs to be rebuilt. """
+        if (
+            self.force or
+            (entry is None) or
+            (entry["options"] != self.options_hash) or
+            (entry["lookups"] != self.lookups_fingerprint) or
+            (not (self.path_obj_to_root/entry["output"]).exists())
+        ):
+            return None
+        stat = path_obj.stat()
+        if [stat.st_mtime_ns, stat.st_size] == entry["stat"]:
+            return entry
+        if hash_file(path_obj) != entry["input"]:
+            return None
+        return dict(entry, stat=[stat.st_mtime_ns, stat.st_size])
+
+    def _get_key(self, path_obj) -> str:
+        """ Get the key under which a given file is recorded in the
+        manifest. """
+        return path_obj.relative_to(self.path_obj_to_root).as_posix()
+
+    def _make_entry(self, path_obj) -> dict:
+        """ Make the manifest entry for a source which is about to be built. """
+        stat = path_obj.stat()
+        result = {
+            "input": hash_file(path_obj),
+            "stat": [stat.st_mtime_ns, stat.st_size],
+            "options": self.options_hash,
+            "lookups": self.lookups_fingerprint,
+            "output": self._get_key(path_obj.with_suffix(TEX_EXTENSION))
+        }
+        return result
+
+    def _read_manifest(self) -> dict:
+        """ Read the manifest, if there is a usable one. """
+        try:
+            with open(self.path_obj_to_manifest, "r") as manifest_file:
+                manifest = json.load(manifest_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+        if manifest.get("version") != MANIFEST_VERSION:
+            return {}
+        return manifest.get("entries", {})
+
+    def _write_manifest(self, entries):
+        """ Write the manifest, replacing the old one in a single step. """
+        manifest = {"version": MANIFEST_VERSION, "entries": entries}
+        path_obj_to_temp = self.path_obj_to_manifest.with_suffix(".tmp")
+        with open(path_obj_to_temp, "w") as manifest_file:
+            json.dump(manifest, manifest_file, indent=4, sort_keys=True)
+        os.replace(path_obj_to_temp, self.path_obj_to_manifest)
+
+##################
+# HELPER CLASSES #
+##################
+
+@dataclass
+class BuildReport:
+    """ What a build did. """
+    compiled: list[str] = field(default_factory=list)
+    skipped: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    failed: list[tuple[str, Exception]] = field(default_factory=list)
+
+####################
+# HELPER FUNCTIONS #
+####################
+
+def hash_options(options) -> str:
+    """ Hash a set of compiler options, taking a command registry by its
+    fingerprint, rather than by its identity. """
+    options = dict(options)
+    if options.get("registry") is not None:
+        options["registry"] = options["registry"].get_fingerprint()
+    return hash_string(repr(sorted(options.items())))
+
+def hash_string(string) -> str:
+    """ Ronseal. """
+    return hashlib.sha256(string.encode()).hexdigest()
+
+def hash_file(path) -> str:
+    """ Ronseal. """
+    with open(path, "rb") as the_file:
+        return hashlib.sha256(the_file.read()).hexdigest()
@@ -0,0 +1,122 @@
+"""
+This code defines a bounded, least-recently-used cache in which compiled output
+can be kept, keyed on a hash of the input and every option which affects it,
+and a finer-grained cache of the same kind for single stanzas.
+"""
+
+# Standard imports.
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+import hashlib
+
+# Local imports.
+from .utils import get_lookups_fingerprint
+
+# Local constants.
+DEFAULT_MAXSIZE = 256
+DEFAULT_STANZA_MAXSIZE = 8192
+LOOKUPS_FINGERPRINT = get_lookups_fingerprint()
+
+##############
+# MAIN CLASS #
+##############
+
+class CompileCache:
+    """ The class in question. """
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """ Return the entry for a given key, or None, counting the hit or
+        miss. """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        """ Add an entry, evicting the least recently used if need be. """
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """ Empty the cache, and reset the counters. """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def get_stats(self) -> dict:
+        """ Return the counters as a dictionary. """
+        with self._lock:
+            result = {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "maxsize": self.maxsize
+            }
+        return result
+
+##################
+# HELPER CLASSES #
+##################
+
+class StanzaCache(CompileCache):
+    """ Maps each stanza, in its context, to what was compiled from it. One
+    cache can be shared between any number of compilers, so that an edit to
+    one stanza of a long poem only recompiles that stanza. """
+    def __init__(self, maxsize=DEFAULT_STANZA_MAXSIZE):
+        super().__init__(maxsize=maxsize)
+
+@dataclass(frozen=True)
+class CacheEntry:
+    """ What the compiler needs to restore from a cache hit. """
+    output_string: str
+    manual_settowidth_string: str|None = None
+    epigraph: str|None = None
+    outputs: tuple[tuple[str, str], ...] = ()
+
+####################
+# HELPER FUNCTIONS #
+####################
+
+def make_cache_key(input_string, mods, **options) -> str:
+    """ Hash the input, together with the resolved set of mods, the other
+    options and the version of the lookups. """
+    hasher = hashlib.sha256()
+    hasher.update(input_string.encode())
+    components = [
+        LOOKUPS_FINGERPRINT,
+        repr(sorted(mods)),
+        repr(sorted(options.items()))
+    ]
+    for component in components:
+        hasher.update(b"\0"+component.encode())
+    return hasher.hexdigest()
+
+def make_stanza_key(stanza, **context) -> tuple:
+    """ Key a stanza on the HPML of its lines, together with whatever else the
+    LaTeX for those lines depends on, e.g. whether it is the last stanza. """
+    return (
+        tuple(line.hpml for line in stanza.lines),
+        tuple(sorted(context.items()))
+    )
@@ -4,13 +4,16 @@ poem on a page.
 """
 
 # Local imports.
-from .lookups import SEMANTICS, SYNTACTICS, FRACTIONS, STABLC, ENDBLC
-from .utils import (
-    trim_whitespace,
-    trim_blank_lines,
-    remove_command_with_argument,
-    remove_commands_keep_arguments
+from .cache import make_stanza_key
+from .lookups import SEMANTICS, STABLC, ENDBLC
+from .metrics import WidthEstimator
+from .parser import (
+    parse_document,
+    remove_commands_keep_arguments,
+    remove_commands_with_arguments
 )
+from .translator import get_plain_translator
+from .utils import trim_whitespace, trim_blank_lines
 
 # Constants.
 COMMANDS_WITH_ARGUMENTS_TO_PURGE = (
@@ -28,30 +31,84 @@ COMMANDS_WITH_ARGUMENTS_TO_PURGE = (
 
 class Centerer:
     """ The class in question. """
-    def __init__(self, input_string):
+    def __init__(
+            self,
+            input_string=None,
+            document=None,
+            estimate_widths=False,
+            registry=None,
+            stanza_cache=None
+        ):
+        if document is None:
+            document = parse_document(input_string)
         self.input_string = input_string
-        self.lines = input_string.split("\n")
+        self.document = document
+        self.estimate_widths = estimate_widths
+        self.registry = registry
+        self.stanza_cache = stanza_cache
+        if registry is None:
+            self.plain_translator = get_plain_translator()
+        else:
+            self.plain_translator = registry.get_plain_translator()
+        self.lines = document.get_hpml_lines()
 
     def convert_lines_to_plain_text(self):
         """ Purge any HPML code, etc, from each line. """
         for index, line in enumerate(self.lines):
-            self.lines[index] = convert_line_of_hpml_to_plain_text(line)
+            self.lines[index] = \
+                convert_line_of_hpml_to_plain_text(line, self.plain_translator)
         self.lines = trim_blank_lines(self.lines)
 
+    def get_plain_lines(self, stanza) -> tuple[str, ...]:
+        """ Purge any HPML code, etc, from each line of a given stanza, taking
+        the result from the stanza cache if it's there. """
+        key = \
+            make_stanza_key(
+                stanza,
+                target="plain",
+                registry=(
+                    None if self.registry is None
+                    else self.registry.get_fingerprint()
+                )
+            )
+        result = self.stanza_cache.get(key)
+        if result is None:
+            result = tuple(
+                convert_line_of_hpml_to_plain_text(
+                    line.hpml,
+                    self.plain_translator
+                )
+                for line in stanza.lines
+            )
+            self.stanza_cache.put(key, result)
+        return result
+
     def get_second_longest_line(self):
         """ Ronseal. """
-        longest_line = self.lines[0]
-        second_longest_line = self.lines[0]
-        for line in self.lines:
-            if len(line) > len(longest_line):
-                second_longest_line = longest_line
-                longest_line = line
-            elif len(longest_line) > len(line) > len(second_longest_line):
-                second_longest_line = line
-        return second_longest_line
+        return get_second_longest_line(self.lines)
 
     def get_settowidth_string(self):
-        """ Get the second longest PURGED line. """
+        """ Get the second longest PURGED line, or, if estimating widths, the
+        PURGED line which is estimated to be the second widest. """
+        if self.estimate_widths:
+            estimator = \
+                WidthEstimator(plain_translator=self.plain_translator)
+            line = estimator.get_second_widest_line(self.document.stanzas)
+            if line is None:
+                return ""
+            return \
+                convert_line_of_hpml_to_plain_text(
+                    line.hpml,
+                    self.plain_translator
+                )
+        if self.stanza_cache is not None:
+            plain_lines = (
+                line
+                for stanza in self.document.stanzas
+                for line in self.get_plain_lines(stanza)
+                if line
+            )
+            return get_second_longest_line(plain_lines)
         self.convert_lines_to_plain_text()
         return self.get_second_longest_line()
 
@@ -59,13 +116,28 @@ class Centerer:
 # HELPER FUNCTIONS #
 ####################
 
-def convert_line_of_hpml_to_plain_text(line):
+def get_second_longest_line(lines):
+    """ Get the second longest of an iterable of lines, holding no more than
+    two lines at a time. """
+    lines = iter(lines)
+    longest_line = next(lines, "")
+    second_longest_line = longest_line
+    for line in lines:
+        if len(line) > len(longest_line):
+            second_longest_line = longest_line
+            longest_line = line
+        elif len(longest_line) > len(line) > len(second_longest_line):
+            second_longest_line = line
+    return second_longest_line
+
+def convert_line_of_hpml_to_plain_text(line, plain_translator=None):
     """ Purge any HPML code, etc, from a given line. """
+    if plain_translator is None:
+        plain_translator = get_plain_translator()
     tabs = line.count(SEMANTICS.tab.hpml)
-    line = convert_equivalents_in_line(line)
-    line = convert_fractions_in_line(line)
-    for command in COMMANDS_WITH_ARGUMENTS_TO_PURGE:
-        line = remove_command_with_argument(command, line)
+    line = plain_translator.translate(line)
+    line = \
+        remove_commands_with_arguments(line, COMMANDS_WITH_ARGUMENTS_TO_PURGE)
     line = remove_commands_keep_arguments(line)
     line = line.replace(STABLC, "")
     line = line.replace(ENDBLC, "")
@@ -73,15 +145,3 @@ def convert_line_of_hpml_to_plain_text(line):
     for _ in range(tabs):
         line = SEMANTICS.tab.plain+line
     return line
-
-def convert_equivalents_in_line(line):
-    """ Convert any straightforward equivalents from HPML to plain text. """
-    for hpml_code, value in SYNTACTICS.items():
-        line = line.replace(hpml_code, value.plain)
-    return line
-
-def convert_fractions_in_line(line):
-    """ Convert any fractions from HPML to plain text. """
-    for hpml_code, value in FRACTIONS.items():
-        line = line.replace(hpml_code, value.plain)
-    return line
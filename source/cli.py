@@ -0,0 +1,212 @@
+"""
+This code defines the command line interface, i.e. the "hpml" script.
+"""
+
+# Standard imports.
+import argparse
+import sys
+
+# Local imports.
+from .builder import Builder
+from .indexer import CorpusIndex
+from .server import (
+    DEFAULT_HOST,
+    DEFAULT_PORT,
+    DEFAULT_REQUEST_TIMEOUT,
+    CompileServer
+)
+
+#############
+# FUNCTIONS #
+#############
+
+def make_parser() -> argparse.ArgumentParser:
+    """ Make the object which parses the command line arguments. """
+    result = argparse.ArgumentParser(
+        prog="hpml",
+        description="Compile HPML into LaTeX."
+    )
+    subparsers = result.add_subparsers(dest="command", required=True)
+    build_parser = \
+        subparsers.add_parser(
+            "build",
+            help="Rebuild the stale .tex files in a directory tree."
+        )
+    build_parser.add_argument("directory")
+    build_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="The number of worker processes; defaults to the number of CPUs."
+    )
+    build_parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Rebuild everything, whether stale or not."
+    )
+    add_compiler_arguments(build_parser)
+    serve_parser = \
+        subparsers.add_parser(
+            "serve",
+            help="Compile HPML sent over HTTP, in a pool of warm workers."
+        )
+    serve_parser.add_argument("--host", default=DEFAULT_HOST)
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve_parser.add_argument(
+        "--socket",
+        help="Listen on this Unix socket, instead of on a port."
+    )
+    serve_parser.add_argument(
+        "--timeout",
+        type=float,
+        default=DEFAULT_REQUEST_TIMEOUT,
+        help="The number of seconds to wait for a compilation."
+    )
+    serve_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="The number of worker processes; defaults to the number of CPUs."
+    )
+    add_compiler_arguments(serve_parser)
+    index_parser = \
+        subparsers.add_parser(
+            "index",
+            help=(
+                "Bring the index of a directory tree up to date, and search "+
+                "it."
+            )
+        )
+    index_parser.add_argument("directory")
+    index_parser.add_argument(
+        "--word",
+        action="append",
+        dest="words",
+        default=[],
+        help="A word to search for; may be given more than once."
+    )
+    index_parser.add_argument(
+        "--entity",
+        action="append",
+        dest="entities",
+        default=[],
+        help=(
+            "A tagged person, place, etc to search for; may be given more "+
+            "than once."
+        )
+    )
+    return result
+
+def add_compiler_arguments(parser):
+    """ Add the arguments which are passed on to each HPMLCompiler. """
+    parser.add_argument(
+        "--mod",
+        action="append",
+        dest="mods",
+        help="A preprocessor mod to apply; may be given more than once."
+    )
+    parser.add_argument(
+        "--prose-poem",
+        action="store_true",
+        help="Treat each input as a prose poem."
+    )
+    parser.add_argument(
+        "--no-auto-center",
+        action="store_true",
+        help="Don't center each poem automatically."
+    )
+    parser.add_argument(
+        "--estimate-widths",
+        action="store_true",
+        help="Center each poem by its lines' estimated widths, not lengths."
+    )
+
+def get_compiler_options(arguments) -> dict:
+    """ Get the keyword arguments for each HPMLCompiler. """
+    result = {}
+    if arguments.mods:
+        result["mods"] = arguments.mods
+    if arguments.prose_poem:
+        result["is_prose_poem"] = True
+    if arguments.no_auto_center:
+        result["auto_center"] = False
+    if arguments.estimate_widths:
+        result["estimate_widths"] = True
+    return result
+
+def build(arguments) -> int:
+    """ Run the build subcommand. """
+    builder = \
+        Builder(
+            arguments.directory,
+            jobs=arguments.jobs,
+            force=arguments.force,
+            **get_compiler_options(arguments)
+        )
+    report = builder.build()
+    for path, error in report.failed:
+        print("Failed to compile "+path+": "+str(error), file=sys.stderr)
+    print(
+        "Compiled "+str(len(report.compiled))+", "+
+        "skipped "+str(len(report.skipped))+", "+
+        "removed "+str(len(report.removed))+", "+
+        "failed "+str(len(report.failed))+"."
+    )
+    if report.failed:
+        return 1
+    return 0
+
+def serve(arguments) -> int:
+    """ Run the serve subcommand. """
+    server = \
+        CompileServer(
+            host=arguments.host,
+            port=arguments.port,
+            socket_path=arguments.socket,
+            jobs=arguments.jobs,
+            request_timeout=arguments.timeout,
+            **get_compiler_options(arguments)
+        )
+    print("Serving on "+server.get_address()+".")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+    return 0
+
+def index(arguments) -> int:
+    """ Run the index subcommand. """
+    corpus_index = CorpusIndex(arguments.directory)
+    report = corpus_index.update()
+    if arguments.words or arguments.entities:
+        for path in corpus_index.search(arguments.words, arguments.entities):
+            print(path)
+    else:
+        print(
+            "Indexed "+str(len(report.indexed))+", "+
+            "skipped "+str(len(report.skipped))+", "+
+            "removed "+str(len(report.removed))+"."
+        )
+    return 0
+
+def run_cli(argv=None) -> int:
+    """ Ronseal. """
+    arguments = make_parser().parse_args(argv)
+    if arguments.command == "build":
+        return build(arguments)
+    if arguments.command == "serve":
+        return serve(arguments)
+    if arguments.command == "index":
+        return index(arguments)
+    return 1
+
+###################
+# RUN AND WRAP UP #
+###################
+
+if __name__ == "__main__":
+    sys.exit(run_cli())
@@ -0,0 +1,159 @@
+"""
+This code defines a class which memory-maps a large HPML file, e.g. an
+anthology, and finds the boundaries within it - of poems, or of any other kind
+of line - by scanning the bytes, without reading the file into a string, or
+splitting it into lines.
+
+What it hands out are SLICES: a path and a set of byte ranges, which are
+decoded only when they are read. A slice can be sent to another process as it
+is, and that process maps the file for itself, so none of the text need ever
+be pickled.
+"""
+
+# Standard imports.
+from dataclasses import dataclass
+from pathlib import Path
+import mmap
+import re
+
+# Local constants.
+ENCODING = "utf-8"
+CONTENT_PATTERN = re.compile(b"\\S")
+NEWLINE = b"\n"
+
+##############
+# MAIN CLASS #
+##############
+
+class CorpusReader:
+    """ The class in question. Offsets are in bytes, and each range runs from
+    its start up to, but not including, its end. """
+    def __init__(self, path_to_input_file):
+        self.path_to_input_file = str(path_to_input_file)
+        self._file = None
+        self._map = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def __len__(self):
+        return len(self._get_map())
+
+    def open(self):
+        """ Map the file, unless it is mapped already. """
+        if self._map is not None:
+            return
+        self._file = open(self.path_to_input_file, "rb")
+        if Path(self.path_to_input_file).stat().st_size == 0:
+            # An empty file can't be mapped.
+            self._map = b""
+        else:
+            self._map = \
+                mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        """ Unmap the file. """
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        if self._file is not None:
+            self._file.close()
+        self._map = None
+        self._file = None
+
+    def _get_map(self):
+        """ Ronseal. """
+        self.open()
+        return self._map
+
+    def decode(self, start=0, end=None) -> str:
+        """ Decode a single range, as it would be read from the file in text
+        mode. """
+        the_map = self._get_map()
+        if end is None:
+            end = len(the_map)
+        return decode(the_map[start:end])
+
+    def find_lines(self, pattern, start=0, end=None):
+        """ Yield the range of each line, within a given range, which matches
+        a given pattern. The pattern is a compiled bytes pattern, anchored to
+        the start and end of a line in multiline mode. """
+        the_map = self._get_map()
+        if end is None:
+            end = len(the_map)
+        for match in pattern.finditer(the_map, start, end):
+            yield match.start(), match.end()
+
+    def find_content(self, start=0, end=None) -> int:
+        """ Find the start of the first line, within a given range, which isn't
+        blank, or return -1. """
+        the_map = self._get_map()
+        if end is None:
+            end = len(the_map)
+        match = CONTENT_PATTERN.search(the_map, start, end)
+        if not match:
+            return -1
+        return the_map.rfind(NEWLINE, start, match.start())+1 or start
+
+    def trim_line_break(self, start, end) -> int:
+        """ Move the end of a range back over a line break, if the range ends
+        in one. """
+        the_map = self._get_map()
+        if (end > start) and (the_map[end-1:end] == NEWLINE):
+            end -= 1
+            if (end > start) and (the_map[end-1:end] == b"\r"):
+                end -= 1
+        return end
+
+    def find_line_break(self, start, end) -> int:
+        """ Find the first line break within a given range, or return -1. """
+        return self._get_map().find(NEWLINE, start, end)
+
+    def make_slice(self, start, end, cuts=()) -> "CorpusSlice":
+        """ Make a slice of the lines within a given range, bar the lines whose
+        ranges are given as cuts, as if the lines had been split and joined
+        again. """
+        ranges = []
+        position = start
+        for cut_start, cut_end in cuts:
+            ranges.append((position, cut_start))
+            position = cut_end+1
+        ranges.append((position, end))
+        ranges = [(start, end) for start, end in ranges if end > start]
+        if cuts and (cuts[-1][1] >= end) and ranges:
+            # The last line has been cut, so the line break before it goes.
+            last_start, last_end = ranges.pop()
+            last_end = self.trim_line_break(last_start, last_end)
+            if last_end > last_start:
+                ranges.append((last_start, last_end))
+        return CorpusSlice(self.path_to_input_file, tuple(ranges))
+
+##################
+# HELPER CLASSES #
+##################
+
+@dataclass(frozen=True)
+class CorpusSlice:
+    """ Some ranges of a mapped file, to be read as one string. """
+    path_to_input_file: str
+    ranges: tuple[tuple[int, int], ...]
+
+    def read(self, reader=None) -> str:
+        """ Decode the ranges, using a given reader of the file, if it has one,
+        rather than mapping the file again. """
+        if reader is None:
+            with CorpusReader(self.path_to_input_file) as reader:
+                return self.read(reader)
+        return "".join(reader.decode(*each) for each in self.ranges)
+
+####################
+# HELPER FUNCTIONS #
+####################
+
+def decode(data) -> str:
+    """ Decode some bytes, with the line breaks normalised, as when a file is
+    read in text mode. """
+    return data.decode(ENCODING).replace("\r\n", "\n")
@@ -0,0 +1,281 @@
+"""
+This code defines the classes which render a parsed document as plain text and
+as HTML, and a function which renders any number of these targets in a single
+pass over the document's lines.
+
+The HTML marks up each semantic command with a span whose class is named after
+the command, e.g. <span class="place">Rome</span>, and leaves the styling to
+the page.
+"""
+
+# Standard imports.
+from functools import cache
+from html import escape
+import unicodedata
+
+# Local imports.
+from .lookups import SEMANTICS, SYNTACTICS, FRACTIONS, STABLC, ENDBLC
+from .parser import MAX_NESTING_DEPTH, LineKind, tokenise
+
+# Local constants.
+TARGET_LATEX = "latex"
+TARGET_PLAIN = "plain"
+TARGET_HTML = "html"
+TARGETS = (TARGET_LATEX, TARGET_PLAIN, TARGET_HTML)
+MINICHORUS = SEMANTICS.minichorus.hpml.strip()
+MINIINSCRIPTION = SEMANTICS.miniinscription.hpml.strip()
+BLOCK_CLASSES = {
+    SEMANTICS.chorus.hpml: "chorus",
+    SEMANTICS.inscription.hpml: "inscription",
+    MINICHORUS: "minichorus",
+    MINIINSCRIPTION: "miniinscription"
+}
+# The commands whose arguments are notes on the verse, not part of it.
+NOTE_COMMANDS = {
+    SEMANTICS.footnote.hpml,
+    SEMANTICS.blfootnote.hpml,
+    SEMANTICS.flagverse.hpml,
+    SEMANTICS.marginnote.hpml
+}
+HTML_TAGS = {
+    SEMANTICS.ital.hpml: "i",
+    SEMANTICS.sub.hpml: "sub"
+}
+HTML_SPANS = {
+    SEMANTICS.person.hpml: "person",
+    SEMANTICS.place.hpml: "place",
+    SEMANTICS.ship.hpml: "ship",
+    SEMANTICS.foreign.hpml: "foreign",
+    SEMANTICS.publication.hpml: "publication",
+    SEMANTICS.footnote.hpml: "footnote",
+    SEMANTICS.blfootnote.hpml: "blfootnote",
+    SEMANTICS.flagverse.hpml: "flagverse",
+    SEMANTICS.marginnote.hpml: "marginnote"
+}
+HTML_WHITESPACE = "<span class=\"whitespace\" style=\"visibility: hidden\">"
+HTML_LINE_BREAK = "<br>"
+COMBINING_ACUTE = "\u0301"
+
+#############
+# RENDERERS #
+#############
+
+class PlainRenderer:
+    """ Renders a document as plain text, leaving out any notes. Commands
+    nested too deeply are rendered as text. """
+    target = TARGET_PLAIN
+
+    def __init__(self, symbols=None):
+        self.symbols = get_symbols() if symbols is None else symbols
+
+    def render_line(self, tokens, _block=None) -> str:
+        """ Ronseal. """
+        return self.render_tokens(tokens).rstrip()
+
+    def render_text(self, text) -> str:
+        """ Render some text, dropping any braces. """
+        return text.replace(STABLC, "").replace(ENDBLC, "")
+
+    def render_tokens(self, tokens, depth=0) -> str:
+        """ Render a list of tokens, found within a given number of
+        commands. """
+        result = []
+        for index, token in enumerate(tokens):
+            if isinstance(token, str):
+                result.append(self.render_text(token))
+            elif (
+                (token.name in (MINICHORUS, MINIINSCRIPTION)) and
+                (depth < MAX_NESTING_DEPTH)
+            ):
+                if token.name == MINICHORUS:
+                    result.append(SEMANTICS.tab.plain)
+                rest = drop_space(tokens[index+1:])
+                result.append(self.render_tokens(rest, depth+1))
+                break
+            else:
+                result.append(self.render_command(token, depth))
+        return "".join(result)
+
+    def render_command(self, command, depth=0) -> str:
+        """ Render a single command, with its argument if it has one. """
+        if command.argument is None:
+            entry = self.symbols.get(command.name)
+            if (entry is None) or (entry.plain is None):
+                return ""
+            return entry.plain
+        opener = command.name+STABLC
+        if opener in NOTE_COMMANDS:
+            return ""
+        if depth >= MAX_NESTING_DEPTH:
+            return self.render_text(command.argument)
+        result = self.render_tokens(command.get_tokens(), depth+1)
+        if opener == SEMANTICS.whitespace.hpml:
+            return " "*len(result)
+        return result
+
+    def render_document(self, stanzas, epigraph=None) -> str:
+        """ Join the rendered lines of each stanza, with the epigraph, if there
+        is one, first. """
+        blocks = ["\n".join(stanza) for stanza in stanzas if stanza]
+        if epigraph:
+            blocks.insert(0, epigraph)
+        return "\n\n".join(blocks)
+
+class HTMLRenderer(PlainRenderer):
+    """ Renders a document as HTML, with a span for each semantic command. """
+    target = TARGET_HTML
+
+    def render_line(self, tokens, block=None) -> str:
+        """ Render a line, marking it up if it lies within a chorus or
+        inscription. """
+        result = self.render_tokens(tokens).rstrip()
+        if block and result:
+            return make_span(BLOCK_CLASSES[block], result)
+        return result
+
+    def render_text(self, text) -> str:
+        """ Render some text, dropping any braces, and escaping the rest. """
+        return escape(super().render_text(text))
+
+    def render_tokens(self, tokens, depth=0) -> str:
+        """ Render a list of tokens, found within a given number of
+        commands. """
+        result = []
+        for index, token in enumerate(tokens):
+            if isinstance(token, str):
+                result.append(self.render_text(token))
+            elif (
+                (token.name in (MINICHORUS, MINIINSCRIPTION)) and
+                (depth < MAX_NESTING_DEPTH)
+            ):
+                if token.name == MINICHORUS:
+                    result.append(SEMANTICS.tab.html)
+                rest = \
+                    self.render_tokens(drop_space(tokens[index+1:]), depth+1)
+                result.append(make_span(BLOCK_CLASSES[token.name], rest))
+                break
+            else:
+                result.append(self.render_command(token, depth))
+        return "".join(result)
+
+    def render_command(self, command, depth=0) -> str:
+        """ Render a single command, with its argument if it has one. """
+        if command.argument is None:
+            entry = self.symbols.get(command.name)
+            if entry is None:
+                return ""
+            if entry.html is not None:
+                return entry.html
+            return escape(entry.plain or "")
+        if depth >= MAX_NESTING_DEPTH:
+            return self.render_text(command.argument)
+        opener = command.name+STABLC
+        tokens = command.get_tokens()
+        if opener == SEMANTICS.stress.hpml:
+            if (len(tokens) == 1) and isinstance(tokens[0], str):
+                return escape(add_acute(tokens[0]))
+            return self.render_tokens(tokens, depth+1)
+        result = self.render_tokens(tokens, depth+1)
+        if opener in HTML_TAGS:
+            tag = HTML_TAGS[opener]
+            return "<"+tag+">"+result+"</"+tag+">"
+        if opener in HTML_SPANS:
+            return make_span(HTML_SPANS[opener], result)
+        if opener == SEMANTICS.whitespace.hpml:
+            return HTML_WHITESPACE+result+"</span>"
+        return result
+
+    def render_document(self, stanzas, epigraph=None) -> str:
+        """ Wrap each stanza in a paragraph, and the whole in a division. """
+        result = ["<div class=\"poem\">"]
+        if epigraph:
+            result.append("<p class=\"epigraph\"><i>"+epigraph+"</i></p>")
+        for stanza in stanzas:
+            if stanza:
+                result.append(
+                    "<p class=\"stanza\">\n"+
+                    (HTML_LINE_BREAK+"\n").join(stanza)+
+                    "\n</p>"
+                )
+        result.append("</div>")
+        return "\n".join(result)
+
+#############
+# FUNCTIONS #
+#############
+
+def get_renderers(targets, symbols=None) -> list:
+    """ Make a renderer for each target, bar LaTeX, which the compiler renders
+    itself. """
+    result = []
+    for target in targets:
+        if target == TARGET_PLAIN:
+            result.append(PlainRenderer(symbols))
+        elif target == TARGET_HTML:
+            result.append(HTMLRenderer(symbols))
+    return result
+
+def emit_document(document, targets, symbols=None) -> dict[str, str]:
+    """ Render a document for each of a list of targets, bar LaTeX,
+    tokenising each line only once, however many targets there are. The
+    symbols map each command which takes no argument to its entry. """
+    renderers = get_renderers(targets, symbols)
+    if not renderers:
+        return {}
+    stanzas = {renderer.target: [] for renderer in renderers}
+    for stanza in document.stanzas:
+        rendered = {renderer.target: [] for renderer in renderers}
+        block = None
+        for line in stanza.lines:
+            if line.kind == LineKind.BLOCK_OPENER:
+                block = get_block(line.hpml)
+                continue
+            tokens = line.get_tokens()
+            for renderer in renderers:
+                text = renderer.render_line(tokens, block)
+                if text:
+                    rendered[renderer.target].append(text)
+        for target, lines in rendered.items():
+            stanzas[target].append(lines)
+    result = {}
+    for renderer in renderers:
+        epigraph = None
+        if document.epigraph:
+            epigraph = renderer.render_tokens(tokenise(document.epigraph))
+        result[renderer.target] = \
+            renderer.render_document(stanzas[renderer.target], epigraph)
+    return result
+
+####################
+# HELPER FUNCTIONS #
+####################
+
+@cache
+def get_symbols() -> dict:
+    """ Map each command which takes no argument to its entry. """
+    result = dict(SYNTACTICS)
+    result.update(FRACTIONS)
+    for entry in (SEMANTICS.add, SEMANTICS.tab):
+        result[entry.hpml] = entry
+    return result
+
+def get_block(line) -> str:
+    """ Get the block which a given opener begins. """
+    if SEMANTICS.inscription.hpml in line:
+        return SEMANTICS.inscription.hpml
+    return SEMANTICS.chorus.hpml
+
+def drop_space(tokens) -> list:
+    """ Drop the space which follows a mini-block marker. """
+    if tokens and isinstance(tokens[0], str):
+        return [tokens[0].removeprefix(" ")]+tokens[1:]
+    return tokens
+
+def make_span(class_name, html) -> str:
+    """ Ronseal. """
+    return "<span class=\""+class_name+"\">"+html+"</span>"
+
+def add_acute(text) -> str:
+    """ Put an acute accent on the first letter of a string, as LaTeX's \\'
+    does. """
+    return unicodedata.normalize("NFC", text[:1]+COMBINING_ACUTE+text[1:])
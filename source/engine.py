@@ -0,0 +1,141 @@
+"""
+This code defines a class which compiles any number of pieces of HPML, with a
+set of default options, from any number of threads at once.
+"""
+
+# Standard imports.
+from types import MappingProxyType
+
+# Local imports.
+from .emitter import TARGETS
+from .hpml_compiler import STANDARD_MODS, HPMLCompiler
+from .metrics import get_glyph_widths
+from .preprocessor import build_mods, get_mod_plan
+from .translator import get_latex_translator, get_plain_translator
+
+# Local constants.
+# The options which an engine may be given, and their defaults.
+COMPILE_OPTIONS = MappingProxyType({
+    "is_prose_poem": False,
+    "mods": tuple(STANDARD_MODS),
+    "enclose": True,
+    "manual_settowidth_string": None,
+    "auto_center": True,
+    "estimate_widths": False,
+    "epigraph": None,
+    "line_numbers": None,
+    "targets": None
+})
+# The type, or types, of each option, which may also be None.
+OPTION_TYPES = MappingProxyType({
+    "is_prose_poem": bool,
+    "mods": (list, tuple),
+    "enclose": bool,
+    "manual_settowidth_string": str,
+    "auto_center": bool,
+    "estimate_widths": bool,
+    "epigraph": str,
+    "line_numbers": int,
+    "targets": (list, tuple)
+})
+
+##############
+# MAIN CLASS #
+##############
+
+class HPMLEngine:
+    """ The class in question. The engine holds nothing which changes between
+    one compilation and the next, other than the caches and the stats, if
+    given, which guard themselves; everything else belonging to a compilation
+    lives on a compiler object of its own. A command registry, if given,
+    should be filled before the engine is built. """
+    def __init__(
+            self,
+            cache=None,
+            stats=None,
+            registry=None,
+            stanza_cache=None,
+            **defaults
+        ):
+        check_options(defaults)
+        if defaults.get("mods") is not None:
+            defaults["mods"] = tuple(defaults["mods"])
+        self.defaults = MappingProxyType(dict(COMPILE_OPTIONS, **defaults))
+        self.cache = cache
+        self.stats = stats
+        self.registry = registry
+        self.stanza_cache = stanza_cache
+        self._warm_up()
+
+    def _warm_up(self):
+        """ Build every table which a compilation might need now, so that no
+        two threads race to build one later. """
+        get_latex_translator()
+        get_plain_translator()
+        get_glyph_widths()
+        if self.registry is not None:
+            self.registry.get_translators()
+            self.registry.get_symbols()
+            self.registry.get_fingerprint()
+        get_mod_plan(frozenset(build_mods(self.defaults["mods"] or ())))
+
+    def get_options(self, overrides) -> dict:
+        """ Merge a set of overrides into the defaults. """
+        check_options(overrides)
+        return dict(self.defaults, **overrides)
+
+    def make_compiler(self, text, overrides) -> HPMLCompiler:
+        """ Make a compiler, of its own, for a single compilation. """
+        result = \
+            HPMLCompiler(
+                input_string=text,
+                cache=self.cache,
+                stats=self.stats,
+                registry=self.registry,
+                stanza_cache=self.stanza_cache,
+                **self.get_options(overrides)
+            )
+        return result
+
+    def compile(self, text, **overrides) -> str:
+        """ Compile a string of HPML, with the defaults overridden by any
+        keyword arguments given, and return the output. """
+        return self.make_compiler(text, overrides).compile()
+
+    def emit(self, text, **overrides) -> dict[str, str]:
+        """ As above, but return the output for every target, keyed on the
+        target. """
+        compiler = self.make_compiler(text, overrides)
+        compiler.compile()
+        return compiler.outputs
+
+##################
+# HELPER CLASSES #
+##################
+
+class HPMLEngineException(Exception):
+    """ A custom exception. """
+
+####################
+# HELPER FUNCTIONS #
+####################
+
+def check_options(options):
+    """ Raise an exception if any option is not one which an engine takes, or
+    has a value which it can't take. """
+    unknown = set(options)-set(COMPILE_OPTIONS)
+    if unknown:
+        raise HPMLEngineException(
+            "Unrecognised compile option(s): "+", ".join(sorted(unknown))
+        )
+    for name, value in options.items():
+        if (value is not None) and not isinstance(value, OPTION_TYPES[name]):
+            raise HPMLEngineException(
+                "Bad value for compile option "+name+": "+repr(value)
+            )
+    for mod in options.get("mods") or ():
+        if not isinstance(mod, str):
+            raise HPMLEngineException("Bad mod: "+repr(mod))
+    for target in options.get("targets") or ():
+        if target not in TARGETS:
+            raise HPMLEngineException("Unrecognised target: "+repr(target))
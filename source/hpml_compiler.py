@@ -3,24 +3,36 @@ This code defines a class which compiles HPML into LaTeX.
 """
 
 # Standard imports.
+from collections import Counter
 from dataclasses import dataclass
 from pathlib import Path
 
 # Local imports.
+from .cache import (
+    CacheEntry,
+    CompileCache,
+    StanzaCache,
+    make_cache_key,
+    make_stanza_key
+)
 from .centerer import Centerer
+from .emitter import TARGET_LATEX, TARGETS, emit_document
 from .lookups import (
     SEMANTICS,
-    SYNTACTICS,
-    FRACTIONS,
     ENDBLC,
     OtherLaTeX,
     SuppressNonStandardMods
 )
-from .preprocessor import Preprocessor
-from .utils import TEX_EXTENSION, trim_whitespace, trim_blank_lines
+from .parser import Document, Stanza, parse_document
+from .preprocessor import Preprocessor, build_mods
+from .registry import CommandRegistry
+from .stats import CompileStats, timed_stage
+from .translator import get_latex_translator
+from .utils import TEX_EXTENSION
 
 # Local constants.
 STANDARD_MODS = [SuppressNonStandardMods.SUPPRESS_FRACTIONS.value]
+COMMAND = "command:"
 
 ##############
 # MAIN CLASS #
@@ -38,11 +50,24 @@ class HPMLCompiler:
     enclose: bool = True
     manual_settowidth_string: str|None = None
     auto_center: bool = True
+    estimate_widths: bool = False
     epigraph: list[str]|None = None
     line_numbers: int|None = None
+    cache: CompileCache|None = None
+    stats: CompileStats|None = None
+    targets: list[str]|None = None
+    outputs: dict[str, str]|None = None
+    registry: CommandRegistry|None = None
+    stanza_cache: StanzaCache|None = None
     # Non-public.
     _temp: str|None = None
     _lines: list[str]|None = None
+    _document: Document|None = None
+    _stanzas: list[Stanza]|None = None
+    _pending: dict[tuple, list[Stanza]]|None = None
+    _restored: Counter|None = None
+    _counts: dict[int, Counter]|None = None
+    _repeats: dict[int, int]|None = None
 
     def __post_init__(self):
         if not self.mods:
@@ -64,191 +89,251 @@ class HPMLCompiler:
                 Path(self.path_to_input_file).with_suffix(TEX_EXTENSION)
         if self.is_prose_poem:
             self.enclose = False
+        if not self.targets:
+            self.targets = [TARGET_LATEX]
+        for target in self.targets:
+            if target not in TARGETS:
+                raise HPMLCompilerException("Unrecognised target: "+target)
 
     def compile(self) -> str:
         """ Build the output string from the input. """
-        self._preprocess()
-        self._process()
+        if self.cache is None:
+            self._preprocess()
+            self._process()
+        else:
+            self._compile_with_cache()
         if self.path_to_output_file:
             return self.path_to_output_file
         return self.output_string
 
-    def _preprocess(self):
+    def _compile_with_cache(self):
+        """ Look up the output in the cache, compiling and storing it if it
+        isn't there. """
+        mods = build_mods(self.mods)
+        key = \
+            make_cache_key(
+                self.input_string,
+                mods,
+                is_prose_poem=self.is_prose_poem,
+                enclose=self.enclose,
+                auto_center=self.auto_center,
+                estimate_widths=self.estimate_widths,
+                manual_settowidth_string=self.manual_settowidth_string,
+                epigraph=self.epigraph,
+                line_numbers=self.line_numbers,
+                targets=tuple(self.targets),
+                registry=(
+                    None if self.registry is None
+                    else self.registry.get_fingerprint()
+                )
+            )
+        entry = self.cache.get(key)
+        if entry is None:
+            self._preprocess(mods)
+            self._process()
+            entry = \
+                CacheEntry(
+                    output_string=self.output_string,
+                    manual_settowidth_string=self.manual_settowidth_string,
+                    epigraph=self.epigraph,
+                    outputs=tuple(self.outputs.items())
+                )
+            self.cache.put(key, entry)
+        else:
+            self.output_string = entry.output_string
+            self.outputs = dict(entry.outputs)
+            self.manual_settowidth_string = entry.manual_settowidth_string
+            self.epigraph = entry.epigraph
+
+    @timed_stage
+    def _preprocess(self, mods=None):
         """ Run the input through a preprocessor object. """
-        preprocessor = Preprocessor(self.input_string, self.mods)
+        if mods is None:
+            mods = self.mods
+        preprocessor = \
+            Preprocessor(
+                self.input_string,
+                mods,
+                count_replacements=self.stats is not None
+            )
         self._temp = preprocessor.preprocess()
+        return preprocessor.replacements
 
     def _process(self):
         """ Ronseal. """
-        self._lines = self._temp.split("\n")
-        self._update_manual_settowidth_string()
-        self._update_epigraph()
-        self._purge_whitespace()
+        if self.stats is not None:
+            self.stats.record_compilation()
+        self._parse()
+        self._emit()
+        self._restore_stanzas()
         self._process_choruses()
         self._process_minichoruses()
         self._add_endings()
-        self._process_syntactics()
-        self._process_semantics()
+        self._translate()
+        self._store_stanzas()
+        self._lines = self._document.get_latex_lines()
         if self.enclose:
             self._enclose_output()
         self.output_string = "\n".join(self._lines)
+        self.outputs[TARGET_LATEX] = self.output_string
 
-    def _purge_whitespace(self):
-        """ Ronseal. """
-        for index, line in enumerate(self._lines):
-            self._lines[index] = trim_whitespace(line)
-        self._lines = trim_blank_lines(self._lines)
+    @timed_stage
+    def _parse(self):
+        """ Parse the preprocessed HPML, and pick up any directives. """
+        self._document = parse_document(self._temp)
+        self._stanzas = self._document.stanzas
+        self._update_manual_settowidth_string()
+        self._update_epigraph()
 
-    def _process_choruses(self):
-        """ Handles choruses and inscriptions. """
-        for index, line in enumerate(self._lines):
-            if (
-                (SEMANTICS.chorus.hpml in line) or
-                (SEMANTICS.inscription.hpml in line)
-            ):
-                for line_num in range(index+1, len(self._lines)):
-                    current_line = self._lines[line_num]
-                    previous_line = self._lines[line_num-1]
-                    if line_num == len(self._lines)-1:
-                        self._lines[line_num] = current_line+ENDBLC
-                    elif current_line == "":
-                        self._lines[line_num-1] = previous_line+ENDBLC
-                        break
-                self._lines[index] = OtherLaTeX.MULTILINE_ITALICS.value
-
-    def _process_minichoruses(self):
-        """ Handles mini-choruses and mini-inscriptions. """
-        for index, line in enumerate(self._lines):
-            if (
-                (SEMANTICS.minichorus.hpml in line) or
-                (SEMANTICS.miniinscription.hpml in line)
-            ):
-                line = \
-                    line.replace(
-                        SEMANTICS.minichorus.hpml,
-                        SEMANTICS.minichorus.latex
-                    )
-                line = \
-                    line.replace(
-                        SEMANTICS.miniinscription.hpml,
-                        SEMANTICS.miniinscription.latex
-                    )
-                line = line+ENDBLC
-                self._lines[index] = line
-
-    def _add_endings(self):
-        """ Adds "\\", "\\*" or "\\!" to each line, as appropriate. """
-        if self.is_prose_poem:
+    @timed_stage
+    def _emit(self):
+        """ Render every target bar LaTeX from the parsed document, before the
+        LaTeX passes begin. """
+        symbols = None if self.registry is None else self.registry.get_symbols()
+        self.outputs = emit_document(self._document, self.targets, symbols)
+
+    @timed_stage
+    def _restore_stanzas(self):
+        """ Take the LaTeX for each stanza which has been compiled before from
+        the stanza cache, and leave the rest to be compiled - once for each
+        distinct stanza, however many times it is repeated. If stats are being
+        kept, then what was counted in each restored stanza is kept too, and a
+        stanza cached without its counts is compiled again. """
+        if self.stanza_cache is None:
             return
-        for index, line in enumerate(self._lines):
+        self._pending = {}
+        self._restored = Counter()
+        for stanza in self._document.stanzas:
+            key = self._get_stanza_key(stanza)
+            if key in self._pending:
+                self._pending[key].append(stanza)
+                continue
+            compiled = self.stanza_cache.get(key)
             if (
-                (line == "") or
-                (line == OtherLaTeX.MULTILINE_ITALICS.value) or
-                (index == len(self._lines)-1)
-               ):
-                pass
-            elif (index != len(self._lines)-1) and (self._lines[index+1] == ""):
-                line = line+OtherLaTeX.NEW_VERSE.value
-                self._lines[index] = line
-            elif (
-                (index in (0, len(self._lines)-2)) or
-                (self._lines[index-1] == "") or
-                ((index < len(self._lines)-2) and (self._lines[index+2] == ""))
+                (compiled is None) or
+                ((self.stats is not None) and (compiled.counts is None))
             ):
-                line = line+OtherLaTeX.NEW_LINE_NO_BREAK.value
-                self._lines[index] = line
+                self._pending[key] = [stanza]
             else:
-                line = line+OtherLaTeX.NEW_LINE.value
-                self._lines[index] = line
-
-    def _process_syntactics(self):
-        """ Translate those clusters for which clear equivalents exist. """
-        for hpml_code, value in SYNTACTICS.items():
-            self._replace_across_all_lines(hpml_code, value.latex)
-
-    def _replace_across_all_lines(self, old, new):
-        """ Replace every instance of old with new across all lines. """
-        for index, line in enumerate(self._lines):
-            self._lines[index] = line.replace(old, new)
-
-    def _replace_across_all_lines_semantic(self, semantic_obj):
-        """ Replace the HPML command with the equivalent LaTeX command. """
-        self._replace_across_all_lines(semantic_obj.hpml, semantic_obj.latex)
-
-    def _process_semantics(self):
-        """ Ronseal. """
-        self._process_tabs()
-        self._process_margin_notes()
-        self._process_places()
-        self._process_persons()
-        self._process_publications()
-        self._process_ships()
-        self._process_foreign_strings()
-        self._process_fractions()
-        self._process_ampersands()
-        self._process_stress()
-        self._process_flagverses()
-        self._process_subscript()
-        self._process_footnotes()
-        self._process_whitespace()
-
-    def _process_tabs(self):
-        """ Ronseal. """
-        self._replace_across_all_lines_semantic(SEMANTICS.tab)
-
-    def _process_margin_notes(self):
-        """ Ronseal. """
-        self._replace_across_all_lines_semantic(SEMANTICS.marginnote)
-
-    def _process_places(self):
-        """ Ronseal. """
-        self._replace_across_all_lines_semantic(SEMANTICS.place)
-
-    def _process_persons(self):
-        """ Ronseal. """
-        self._replace_across_all_lines_semantic(SEMANTICS.person)
-
-    def _process_publications(self):
+                restore_stanza(stanza, compiled.latex_lines)
+                if self.stats is not None:
+                    self._restored.update(compiled.counts)
+        self._stanzas = [stanzas[0] for stanzas in self._pending.values()]
+        if self.stats is not None:
+            self._counts = {id(stanza): Counter() for stanza in self._stanzas}
+            self._repeats = {
+                id(stanzas[0]): len(stanzas)
+                for stanzas in self._pending.values()
+            }
+
+    def _get_stanza_key(self, stanza) -> tuple:
         """ Ronseal. """
-        self._replace_across_all_lines_semantic(SEMANTICS.publication)
-
-    def _process_ships(self):
-        """ Ronseal. """
-        self._replace_across_all_lines_semantic(SEMANTICS.ship)
-
-    def _process_foreign_strings(self):
-        """ Ronseal. """
-        self._replace_across_all_lines_semantic(SEMANTICS.foreign)
-
-    def _process_fractions(self):
-        """ Ronseal. """
-        for hpml, value in FRACTIONS.items():
-            self._replace_across_all_lines(hpml, value.latex)
-
-    def _process_ampersands(self):
-        """ Ronseal. """
-        self._replace_across_all_lines_semantic(SEMANTICS.add)
-
-    def _process_stress(self):
-        """ Handles stressed syllables. """
-        self._replace_across_all_lines_semantic(SEMANTICS.stress)
+        result = \
+            make_stanza_key(
+                stanza,
+                target=TARGET_LATEX,
+                is_last_stanza=stanza is self._document.stanzas[-1],
+                is_prose_poem=self.is_prose_poem,
+                registry=(
+                    None if self.registry is None
+                    else self.registry.get_fingerprint()
+                )
+            )
+        return result
 
-    def _process_flagverses(self):
-        """ Adds mini-titles to particular verses. """
-        self._replace_across_all_lines_semantic(SEMANTICS.flagverse)
+    def _count(self, name, stanza, count) -> int:
+        """ Record what a stage counted in a stanza, if it is to be cached
+        with it, and return what it counts for in the whole document, where
+        the stanza may be repeated. """
+        if self._counts is None:
+            return count
+        self._counts[id(stanza)][name] += count
+        return count*self._repeats[id(stanza)]
+
+    def _get_restored(self, name=None):
+        """ Get what was counted in the stanzas restored from the stanza
+        cache: either under a given name, or everything. """
+        restored = self._restored or Counter()
+        if name is None:
+            return restored
+        return restored[name]
+
+    @timed_stage
+    def _process_choruses(self) -> int:
+        """ Handles choruses and inscriptions. """
+        result = self._get_restored("choruses")
+        for stanza in self._stanzas:
+            result += \
+                self._count("choruses", stanza, process_choruses(stanza))
+        return result
 
-    def _process_subscript(self):
-        """ Ronseal. """
-        self._replace_across_all_lines_semantic(SEMANTICS.sub)
+    @timed_stage
+    def _process_minichoruses(self) -> int:
+        """ Handles mini-choruses and mini-inscriptions. """
+        result = self._get_restored("minichoruses")
+        for stanza in self._stanzas:
+            result += \
+                self._count(
+                    "minichoruses",
+                    stanza,
+                    process_minichoruses(stanza)
+                )
+        return result
 
-    def _process_footnotes(self):
-        """ Ronseal. """
-        self._replace_across_all_lines_semantic(SEMANTICS.footnote)
-        self._replace_across_all_lines_semantic(SEMANTICS.blfootnote)
+    @timed_stage
+    def _add_endings(self) -> int:
+        """ Adds "\\", "\\*" or "\\!" to each line, as appropriate. """
+        if self.is_prose_poem:
+            return 0
+        result = self._get_restored("endings")
+        last_stanza = self._document.stanzas[-1] if self._stanzas else None
+        for stanza in self._stanzas:
+            result += \
+                self._count(
+                    "endings",
+                    stanza,
+                    add_endings(stanza, stanza is last_stanza)
+                )
+        return result
 
-    def _process_whitespace(self):
-        """ Ronseal. """
-        self._replace_across_all_lines_semantic(SEMANTICS.whitespace)
+    @timed_stage
+    def _translate(self) -> int|None:
+        """ Translate every syntactic and semantic command, and every fraction,
+        in a single pass over each line. """
+        counts = None if self.stats is None else Counter()
+        translator = None
+        if self.registry is not None:
+            translator = self.registry.get_latex_translator()
+        for stanza in self._stanzas:
+            if self._counts is None:
+                translate(stanza, counts, translator)
+                continue
+            stanza_counts = Counter()
+            translate(stanza, stanza_counts, translator)
+            for command, count in stanza_counts.items():
+                counts[command] += self._count(COMMAND+command, stanza, count)
+        if counts is None:
+            return None
+        for name, count in self._get_restored().items():
+            if name.startswith(COMMAND):
+                counts[name.removeprefix(COMMAND)] += count
+        self.stats.record_commands(counts)
+        return counts.total()
+
+    @timed_stage
+    def _store_stanzas(self):
+        """ Put the LaTeX for each stanza just compiled into the stanza cache,
+        and copy it to any repeats of that stanza. """
+        if self.stanza_cache is None:
+            return
+        for key, (stanza, *repeats) in self._pending.items():
+            latex_lines = tuple(line.latex for line in stanza.lines)
+            counts = None
+            if self._counts is not None:
+                counts = dict(+self._counts[id(stanza)])
+            self.stanza_cache.put(key, CompiledStanza(latex_lines, counts))
+            for repeat in repeats:
+                restore_stanza(repeat, latex_lines)
 
     def make_epigraph_block(self) -> list:
         """ Make the epigraph block from the epigraph. """
@@ -293,25 +378,23 @@ class HPMLCompiler:
             self._lines = epigraph_block+self._lines
 
     def _update_manual_settowidth_string(self):
-        """ Check each line to see whether the verse width is set manually. """
-        settowidth_marker = SEMANTICS.settowidth.hpml
-        settowidth_len = len(settowidth_marker)
-        settowidth_line_index = None
-        for index, line in enumerate(self._lines):
-            if line.startswith(settowidth_marker) and line.endswith(ENDBLC):
-                if not self.manual_settowidth_string:
-                    self.manual_settowidth_string = line[settowidth_len:-1]
-                settowidth_line_index = index
-                break
-        if settowidth_line_index is not None:
-            self._lines.pop(settowidth_line_index)
+        """ See whether the verse width is set manually. """
+        if not self.manual_settowidth_string:
+            self.manual_settowidth_string = self._document.settowidth
 
     def _get_auto_settowidth_string(self):
         """ Get an automatically-generated settowidth string for a given poem in
         HPML code. """
-        centerer = Centerer(self.input_string)
+        centerer = \
+            Centerer(
+                document=self._document,
+                estimate_widths=self.estimate_widths,
+                registry=self.registry,
+                stanza_cache=self.stanza_cache
+            )
         return centerer.get_settowidth_string()
 
+    @timed_stage
     def _center_output(self):
         """ Add a string to center this poem on the page. """
         if self.manual_settowidth_string:
@@ -326,21 +409,13 @@ class HPMLCompiler:
         self._lines = [settowidth_line]+self._lines
 
     def _update_epigraph(self):
-        """ Find and process the epigraph, if it exists. """
-        epigraph_marker = SEMANTICS.epigraph.hpml
-        epigraph_len = len(epigraph_marker)
-        epigraph_index = None
-        for index, line in enumerate(self._lines):
-            if line.startswith(epigraph_marker) and line.endswith(ENDBLC):
-                self.epigraph = (
-                    SEMANTICS.ital.latex+
-                    line[epigraph_len:-1]+
-                    OtherLaTeX.END_BLOCK.value
-                )
-                epigraph_index = index
-                break
-        if epigraph_index is not None:
-            self._lines.pop(epigraph_index)
+        """ Process the epigraph, if it exists. """
+        if self._document.epigraph is not None:
+            self.epigraph = (
+                SEMANTICS.ital.latex+
+                self._document.epigraph+
+                OtherLaTeX.END_BLOCK.value
+            )
 
     def save_to_file(self) -> str:
         """ Save the output string to a file. """
@@ -354,5 +429,77 @@ class HPMLCompiler:
 # HELPER CLASSES #
 ##################
 
+@dataclass(frozen=True)
+class CompiledStanza:
+    """ What the stanza cache keeps for a stanza: the LaTeX for each line,
+    and, if stats were being kept, what each stage counted in it. """
+    latex_lines: tuple[str, ...]
+    counts: dict[str, int]|None = None
+
 class HPMLCompilerException(Exception):
     """ A custom exception. """
+
+####################
+# HELPER FUNCTIONS #
+####################
+
+def process_choruses(stanza) -> int:
+    """ Handles choruses and inscriptions within a given stanza, returning how
+    many there were. """
+    last_line = stanza.lines[-1]
+    for index in stanza.block_openers:
+        line = stanza.lines[index]
+        if line is not last_line:
+            last_line.latex = last_line.latex+ENDBLC
+        line.latex = OtherLaTeX.MULTILINE_ITALICS.value
+    return len(stanza.block_openers)
+
+def process_minichoruses(stanza) -> int:
+    """ Handles mini-choruses and mini-inscriptions within a given stanza,
+    returning how many there were. """
+    for index in stanza.mini_blocks:
+        line = stanza.lines[index]
+        latex = \
+            line.latex.replace(
+                SEMANTICS.minichorus.hpml,
+                SEMANTICS.minichorus.latex
+            )
+        latex = \
+            latex.replace(
+                SEMANTICS.miniinscription.hpml,
+                SEMANTICS.miniinscription.latex
+            )
+        line.latex = latex+ENDBLC
+    return len(stanza.mini_blocks)
+
+def add_endings(stanza, is_last_stanza) -> int:
+    """ Adds "\\", "\\*" or "\\!" to each line of a given stanza, as
+    appropriate, returning how many were added. """
+    result = 0
+    last_index = len(stanza.lines)-1
+    for index, line in enumerate(stanza.lines):
+        if line.latex == OtherLaTeX.MULTILINE_ITALICS.value:
+            continue
+        if index == last_index:
+            if is_last_stanza:
+                continue
+            line.latex = line.latex+OtherLaTeX.NEW_VERSE.value
+        elif index in (0, last_index-1):
+            line.latex = line.latex+OtherLaTeX.NEW_LINE_NO_BREAK.value
+        else:
+            line.latex = line.latex+OtherLaTeX.NEW_LINE.value
+        result += 1
+    return result
+
+def translate(stanza, counts=None, translator=None):
+    """ Translate every command in a given stanza into LaTeX. If a counter is
+    given, count how many times each command is replaced. """
+    if translator is None:
+        translator = get_latex_translator()
+    for line in stanza.lines:
+        line.latex = translator.translate(line.latex, counts)
+
+def restore_stanza(stanza, latex_lines):
+    """ Set the LaTeX for each line of a stanza. """
+    for line, latex in zip(stanza.lines, latex_lines):
+        line.latex = latex
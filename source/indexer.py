@@ -0,0 +1,290 @@
+"""
+This code defines a class which keeps an on-disk inverted index of a directory
+tree of HPML files: where each word, and each tagged person, place, ship,
+publication or foreign phrase, is found, by poem and by line.
+
+The index is brought up to date incrementally, in the same way as a build: a
+file is only read again if it has changed since it was last indexed.
+"""
+
+# Standard imports.
+from dataclasses import dataclass, field
+from pathlib import Path
+import hashlib
+import json
+import os
+import re
+
+# Local imports.
+from .builder import hash_file
+from .emitter import PlainRenderer
+from .lookups import SEMANTICS, STABLC
+from .parser import MAX_NESTING_DEPTH, Command, is_directive, tokenise
+from .utils import HPML_EXTENSION, get_lookups_fingerprint, trim_whitespace
+
+# Local constants.
+INDEX_FN = ".hpml_index.json"
+INDEX_VERSION = 1
+WORD_PATTERN = re.compile("[^\\W_]+(?:['’][^\\W_]+)*")
+ENTITY_KINDS = {
+    SEMANTICS.person.hpml.removesuffix(STABLC): "person",
+    SEMANTICS.place.hpml.removesuffix(STABLC): "place",
+    SEMANTICS.ship.hpml.removesuffix(STABLC): "ship",
+    SEMANTICS.publication.hpml.removesuffix(STABLC): "publication",
+    SEMANTICS.foreign.hpml.removesuffix(STABLC): "foreign"
+}
+
+##############
+# MAIN CLASS #
+##############
+
+class CorpusIndex:
+    """ The class in question. Words and entities are looked up without
+    regard to case; line numbers count from one. """
+    def __init__(self, path_to_root, path_to_index=None, registry=None):
+        self.path_obj_to_root = Path(path_to_root)
+        if path_to_index is None:
+            path_to_index = self.path_obj_to_root/INDEX_FN
+        self.path_obj_to_index = Path(path_to_index)
+        if registry is None:
+            self.fingerprint = get_lookups_fingerprint()
+            self.renderer = PlainRenderer()
+        else:
+            self.fingerprint = registry.get_fingerprint()
+            self.renderer = PlainRenderer(registry.get_symbols())
+        self.files = {}
+        self.words = {}
+        self.entities = {}
+        self._read_index()
+
+    def update(self) -> "IndexReport":
+        """ Index each new or changed file, and forget each deleted one. """
+        report = IndexReport()
+        is_changed = False
+        orphaned_keys = set(self.files)
+        pattern = "*"+HPML_EXTENSION
+        for path_obj in sorted(self.path_obj_to_root.rglob(pattern)):
+            key = self._get_key(path_obj)
+            orphaned_keys.discard(key)
+            old_entry = self.files.get(key)
+            entry = self._check_entry(path_obj, old_entry)
+            if entry is None:
+                self._remove(key)
+                self._add(key, path_obj)
+                report.indexed.append(str(path_obj))
+            else:
+                is_changed = is_changed or (entry is not old_entry)
+                self.files[key] = entry
+                report.skipped.append(str(path_obj))
+        for key in sorted(orphaned_keys):
+            self._remove(key)
+            report.removed.append(str(self.path_obj_to_root/key))
+        if is_changed or report.indexed or report.removed:
+            self._write_index()
+        return report
+
+    def find_word(self, word) -> dict[str, list[int]]:
+        """ Map each poem in which a given word is found to the lines on which
+        it is found. """
+        return self._to_paths(self.words.get(word.casefold(), {}))
+
+    def find_entity(self, name, kind=None) -> dict[str, list[int]]:
+        """ As above, but for a tagged entity, e.g. a place, or for any kind of
+        entity if none is given. """
+        name = trim_whitespace(name).casefold()
+        if kind is None:
+            kinds = list(self.entities)
+        else:
+            kinds = [kind]
+        postings = {}
+        for each_kind in kinds:
+            found = self.entities.get(each_kind, {}).get(name, {})
+            for key, lines in found.items():
+                postings[key] = sorted(set(postings.get(key, []))|set(lines))
+        return self._to_paths(postings)
+
+    def search(self, words=(), entities=()) -> list[str]:
+        """ Return every poem in which each of the given words, and each of the
+        given entities, is found. """
+        result = None
+        found = \
+            [self.find_word(word) for word in words]+\
+            [self.find_entity(name) for name in entities]
+        for postings in found:
+            if result is None:
+                result = set(postings)
+            else:
+                result &= set(postings)
+        return sorted(result or ())
+
+    def get_entities(self, kind) -> list[str]:
+        """ List every entity of a given kind, e.g. "ship", in the corpus. """
+        return sorted(self.entities.get(kind, {}))
+
+    def _add(self, key, path_obj):
+        """ Index a single file. """
+        data = path_obj.read_bytes()
+        stat = path_obj.stat()
+        words, entities = \
+            index_text(data.decode(errors="replace"), self.renderer)
+        for word, lines in words.items():
+            self.words.setdefault(word, {})[key] = lines
+        for kind, names in entities.items():
+            for name, lines in names.items():
+                self.entities.setdefault(kind, {}).setdefault(name, {})[key] = \
+                    lines
+        self.files[key] = {
+            "input": hash_bytes(data),
+            "stat": [stat.st_mtime_ns, stat.st_size],
+            "words": sorted(words),
+            "entities": sorted(
+                [kind, name]
+                for kind, names in entities.items()
+                for name in names
+            )
+        }
+
+    def _remove(self, key):
+        """ Forget everything indexed from a single file. """
+        entry = self.files.pop(key, None)
+        if entry is None:
+            return
+        for word in entry["words"]:
+            remove_posting(self.words, word, key)
+        for kind, name in entry["entities"]:
+            remove_posting(self.entities[kind], name, key)
+            if not self.entities[kind]:
+                del self.entities[kind]
+
+    def _check_entry(self, path_obj, entry) -> dict|None:
+        """ Return an up-to-date entry for a given file, or None if it needs to
+        be indexed again. """
+        if entry is None:
+            return None
+        stat = path_obj.stat()
+        if [stat.st_mtime_ns, stat.st_size] == entry["stat"]:
+            return entry
+        if hash_file(path_obj) != entry["input"]:
+            return None
+        return dict(entry, stat=[stat.st_mtime_ns, stat.st_size])
+
+    def _get_key(self, path_obj) -> str:
+        """ Get the key under which a given file is recorded in the index. """
+        return path_obj.relative_to(self.path_obj_to_root).as_posix()
+
+    def _to_paths(self, postings) -> dict[str, list[int]]:
+        """ Key a set of postings on the path to each file. """
+        return {
+            str(self.path_obj_to_root/key): lines
+            for key, lines in sorted(postings.items())
+        }
+
+    def _read_index(self):
+        """ Read the index, if there is a usable one. """
+        try:
+            with open(self.path_obj_to_index, "r") as index_file:
+                index = json.load(index_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        if (
+            (index.get("version") != INDEX_VERSION) or
+            (index.get("lookups") != self.fingerprint)
+        ):
+            return
+        self.files = index["files"]
+        self.words = index["words"]
+        self.entities = index["entities"]
+
+    def _write_index(self):
+        """ Write the index, replacing the old one in a single step. """
+        index = {
+            "version": INDEX_VERSION,
+            "lookups": self.fingerprint,
+            "files": self.files,
+            "words": self.words,
+            "entities": self.entities
+        }
+        path_obj_to_temp = self.path_obj_to_index.with_suffix(".tmp")
+        with open(path_obj_to_temp, "w") as index_file:
+            # The index can be large, so don't pad it out.
+            json.dump(index, index_file, separators=(",", ":"))
+        os.replace(path_obj_to_temp, self.path_obj_to_index)
+
+##################
+# HELPER CLASSES #
+##################
+
+@dataclass
+class IndexReport:
+    """ What an update did. """
+    indexed: list[str] = field(default_factory=list)
+    skipped: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+
+####################
+# HELPER FUNCTIONS #
+####################
+
+def index_text(text, renderer=None) -> tuple[dict, dict]:
+    """ Find the lines on which each word, and each entity, in a string of HPML
+    is found, tokenising each line only once. The words are taken from the
+    verse as rendered in plain text, leaving out any notes; the entities are
+    taken from anywhere, notes included. """
+    if renderer is None:
+        renderer = PlainRenderer()
+    words = {}
+    entities = {}
+    for line_number, line in enumerate(text.split("\n"), start=1):
+        if is_directive(line, SEMANTICS.settowidth.hpml):
+            continue
+        tokens = tokenise(line)
+        for word in get_words(renderer.render_tokens(tokens)):
+            add_posting(words, word, line_number)
+        for kind, name in iter_entities(tokens, renderer):
+            add_posting(entities.setdefault(kind, {}), name, line_number)
+    return words, entities
+
+def get_words(text) -> list[str]:
+    """ Split some plain text into words, without regard to case. """
+    return [word.casefold() for word in WORD_PATTERN.findall(text)]
+
+def iter_entities(tokens, renderer):
+    """ Yield the kind and name of each entity in a list of tokens, looking
+    within the arguments of other commands too, but no deeper than commands
+    are rendered. The arguments are walked with a stack of their own, rather
+    than by recursion. """
+    stack = [iter(tokens)]
+    while stack:
+        token = next(stack[-1], None)
+        if token is None:
+            stack.pop()
+            continue
+        if not isinstance(token, Command) or (token.argument is None):
+            continue
+        arguments = token.get_tokens()
+        kind = ENTITY_KINDS.get(token.name)
+        if kind:
+            name = trim_whitespace(renderer.render_tokens(arguments))
+            if name:
+                yield kind, name.casefold()
+        if len(stack) <= MAX_NESTING_DEPTH:
+            stack.append(iter(arguments))
+
+def add_posting(postings, term, line_number):
+    """ Record that a term is found on a given line, once only. """
+    lines = postings.setdefault(term, [])
+    if not lines or (lines[-1] != line_number):
+        lines.append(line_number)
+
+def remove_posting(postings, term, key):
+    """ Forget that a term is found in a given file. """
+    files = postings.get(term)
+    if files is None:
+        return
+    files.pop(key, None)
+    if not files:
+        del postings[term]
+
+def hash_bytes(data) -> str:
+    """ Ronseal. """
+    return hashlib.sha256(data).hexdigest()
@@ -4,11 +4,50 @@ HPML commands and their LaTeX and plain text equivalents.
 """
 
 # Standard imports.
+from collections import namedtuple
 from enum import Enum
 from types import SimpleNamespace
+import json
 
 # Local imports
-from .utils import get_semantics, get_syntactics
+from .utils import PATH_TO_SEMANTICS, PATH_TO_SYNTACTICS
+
+# Local constants.
+ENTRY_FIELDS = ("hpml", "latex", "plain", "html")
+
+###########
+# RECORDS #
+###########
+
+class Entry(namedtuple("Entry", ENTRY_FIELDS, defaults=(None,)*4)):
+    """ An HPML command, with its LaTeX, plain text and, where the plain text
+    falls short, HTML equivalents. Being a tuple, it is immutable, and compact,
+    and its fields are quick to read. Each field is a string, or None. It is
+    built without the typing module, which is slow to import. """
+    __slots__ = ()
+
+###########
+# LOADERS #
+###########
+
+def load_semantics():
+    """ Return a record of the HPML semantic commands, each one itself a
+    record. """
+    with open(PATH_TO_SEMANTICS, "r") as semantics_file:
+        semantics_dict = json.load(semantics_file)
+    semantics_type = namedtuple("Semantics", semantics_dict)
+    result = \
+        semantics_type(
+            *(Entry(**value) for value in semantics_dict.values())
+        )
+    return result
+
+def load_syntactics():
+    """ Return a dictionary of the HPML syntactic commands. """
+    with open(PATH_TO_SYNTACTICS, "r") as syntactics_file:
+        syntactics_dict = json.load(syntactics_file)
+    result = {key: Entry(**value) for key, value in syntactics_dict.items()}
+    return result
 
 ###########
 # LOOKUPS #
@@ -16,12 +55,12 @@ from .utils import get_semantics, get_syntactics
 
 DASHES = SimpleNamespace(m="---", n="--")
 FRACTIONS = {
-    "#HALF": SimpleNamespace(plain="half", latex="\\sfrac{$1$}{$2$}"),
-    "#THIRD": SimpleNamespace(plain="third", latex="\\sfrac{$1$}{$3$}"),
-    "#QUARTER": SimpleNamespace(plain="quarter", latex="\\sfrac{$1$}{$4$}")
+    "#HALF": Entry(plain="half", latex="\\sfrac{$1$}{$2$}", html="½"),
+    "#THIRD": Entry(plain="third", latex="\\sfrac{$1$}{$3$}", html="⅓"),
+    "#QUARTER": Entry(plain="quarter", latex="\\sfrac{$1$}{$4$}", html="¼")
 }
-SEMANTICS = get_semantics()
-SYNTACTICS = get_syntactics()
+SEMANTICS = load_semantics()
+SYNTACTICS = load_syntactics()
 
 # Abbreviations.
 STABLC = SEMANTICS.startblock.hpml # Same as LaTeX.
@@ -48,6 +87,7 @@ class OtherMods(Enum):
     """ Lists the mods which do not suppress any non-standard printing
     conventions. """
     EM_DASHES = "em_dashes"
+    SUPPRESS_MARGINNOTES = "suppress_marginnotes"
 
 # Sets of values are sometimes useful.
 SUPPRESS_NON_STANDARD_MODS_AS_SET = {
@@ -72,6 +112,7 @@ class OtherLaTeX(Enum):
     NEW_LINE_NO_BREAK = "\\\\*"
     NEW_VERSE = "\\\\!"
     POEM_LINES = "\\poemlines{"
+    POEM_TITLE = "\\poemtitle{"
 
 #############
 # FUNCTIONS #
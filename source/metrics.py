@@ -0,0 +1,174 @@
+"""
+This code defines a class which estimates how wide each line of a poem will be
+when typeset, from the advance width of each glyph in the fonts which the
+package code loads.
+
+The widths are those of Computer Modern at its design size, in thousandths of
+an em; CMU Serif, the main font, shares them. The kerning between glyphs, and
+the difference between blackletter and roman, are ignored.
+"""
+
+# Standard imports.
+from functools import cache
+from itertools import repeat
+from operator import itemgetter
+import heapq
+import json
+
+# Local imports.
+from .lookups import SEMANTICS, STABLC, ENDBLC, FRACTIONS
+from .parser import MAX_NESTING_DEPTH, Line, LineKind, tokenise
+from .translator import get_plain_translator
+from .utils import PATH_TO_GLYPH_WIDTHS
+
+# Local constants.
+ROMAN = "roman"
+ITALIC = "italic"
+SMALL_CAPS = "small_caps"
+SUBSCRIPT_SCALE = 0.7
+MINICHORUS = SEMANTICS.minichorus.hpml.strip()
+MINIINSCRIPTION = SEMANTICS.miniinscription.hpml.strip()
+# The font in which the argument of each command is set, where it differs
+# from the font around it.
+FONT_COMMANDS = {
+    SEMANTICS.ital.hpml: ITALIC,
+    SEMANTICS.person.hpml: ITALIC,
+    SEMANTICS.place.hpml: SMALL_CAPS
+}
+# The commands whose arguments take up no room on the line.
+ZERO_WIDTH_COMMANDS = {
+    SEMANTICS.footnote.hpml,
+    SEMANTICS.blfootnote.hpml,
+    SEMANTICS.flagverse.hpml,
+    SEMANTICS.marginnote.hpml
+}
+
+##############
+# MAIN CLASS #
+##############
+
+class WidthEstimator:
+    """ The class in question. """
+    def __init__(self, glyph_widths=None, plain_translator=None):
+        if glyph_widths is None:
+            glyph_widths = get_glyph_widths()
+        if plain_translator is None:
+            plain_translator = get_plain_translator()
+        self.plain_translator = plain_translator
+        self.fonts = glyph_widths["fonts"]
+        self.default = glyph_widths["default"]
+        self.tab = glyph_widths["spacing"]["tab"]
+        self.fraction = glyph_widths["spacing"]["fraction"]
+        self.symbols = glyph_widths["symbols"]
+
+    def measure_text(self, text, font=ROMAN) -> float:
+        """ Sum the advance widths of the glyphs in a string, ignoring any
+        braces. """
+        widths = self.fonts[font]
+        glyphs = text.replace(STABLC, "").replace(ENDBLC, "")
+        return sum(map(widths.get, glyphs, repeat(self.default)))
+
+    def measure_line(self, hpml, font=ROMAN) -> float:
+        """ Estimate the width of a line of HPML, set in a given font. """
+        return self.measure_tokens(tokenise(hpml), font)
+
+    def measure_tokens(self, tokens, font=ROMAN, depth=0) -> float:
+        """ Estimate the width of a list of tokens, set in a given font, and
+        found within a given number of commands. """
+        result = 0
+        skip_space = False
+        for token in tokens:
+            if isinstance(token, str):
+                if skip_space:
+                    token = token.removeprefix(" ")
+                result += self.measure_text(token, font)
+                skip_space = False
+                continue
+            if token.name in (MINICHORUS, MINIINSCRIPTION):
+                # The rest of the line is in italics, and LaTeX swallows the
+                # space after the command.
+                if token.name == MINICHORUS:
+                    result += self.tab
+                font = ITALIC
+                skip_space = True
+                continue
+            result += self.measure_command(token, font, depth)
+            skip_space = False
+        return result
+
+    def measure_command(self, command, font=ROMAN, depth=0) -> float:
+        """ Estimate the width of a single command, and its argument if it has
+        one, set in a given font. A command nested too deeply is measured as
+        text. """
+        if command.argument is None:
+            if command.name == SEMANTICS.tab.hpml:
+                return self.tab
+            if command.name == SEMANTICS.add.hpml:
+                return self.measure_text("&", font)
+            if command.name in FRACTIONS:
+                return self.fraction
+            if command.name in self.symbols:
+                return self.measure_text(self.symbols[command.name], font)
+            plain = self.plain_translator.lookup.get(command.name)
+            if plain is None:
+                return self.measure_text(command.name, font)
+            return self.measure_text(plain, font)
+        opener = command.name+STABLC
+        if opener in ZERO_WIDTH_COMMANDS:
+            return 0
+        if depth >= MAX_NESTING_DEPTH:
+            return self.measure_text(command.argument, font)
+        result = \
+            self.measure_tokens(
+                command.get_tokens(),
+                FONT_COMMANDS.get(opener, font),
+                depth+1
+            )
+        if opener == SEMANTICS.sub.hpml:
+            result *= SUBSCRIPT_SCALE
+        return result
+
+    def measure_stanza(self, stanza) -> list[tuple[float, Line]]:
+        """ Estimate the width of every line of verse in a stanza. Every line
+        after a chorus or inscription opener is in italics; the opener itself
+        takes up no room. """
+        result = []
+        font = ROMAN
+        for line in stanza.lines:
+            if line.kind == LineKind.BLOCK_OPENER:
+                font = ITALIC
+                continue
+            result.append((self.measure_line(line.hpml, font), line))
+        return result
+
+    def measure_document(self, document) -> list[tuple[float, Line]]:
+        """ Estimate the width of every line of verse in a document, in one
+        pass. """
+        return [
+            item
+            for stanza in document.stanzas
+            for item in self.measure_stanza(stanza)
+        ]
+
+    def get_second_widest_line(self, stanzas) -> Line|None:
+        """ Find the line, in an iterable of stanzas, which is estimated to be
+        the second widest - or the widest if it stands alone, or None if there
+        are no lines - holding no more than one stanza at a time. """
+        measured = (
+            item for stanza in stanzas for item in self.measure_stanza(stanza)
+        )
+        widest = heapq.nlargest(2, measured, key=itemgetter(0))
+        if not widest:
+            return None
+        _, result = widest[-1]
+        return result
+
+####################
+# HELPER FUNCTIONS #
+####################
+
+@cache
+def get_glyph_widths() -> dict:
+    """ Load the table of advance widths, once. """
+    with open(PATH_TO_GLYPH_WIDTHS, "r", encoding="utf-8") as widths_file:
+        return json.load(widths_file)
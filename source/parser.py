@@ -0,0 +1,323 @@
+"""
+This code defines the classes and functions which parse HPML, ONCE per
+document, into a tree of stanzas, lines and commands.
+"""
+
+# Standard imports.
+from dataclasses import dataclass, field
+from enum import Enum
+from functools import cache
+import heapq
+import re
+
+# Local imports.
+from .lookups import SEMANTICS, STABLC, ENDBLC
+from .utils import normalise_whitespace, trim_whitespace
+
+# Local constants.
+COMMAND_PATTERN = re.compile("#+[A-Z]+")
+COMMAND_NAME_PATTERN = re.compile("#+\\w*")
+BRACE_PATTERN = re.compile("[{}\n]")
+# How deeply commands may be nested within one another before whatever lies
+# deeper is taken as plain text, so that a long run of unclosed braces can't
+# exhaust the stack of whatever walks the commands.
+MAX_NESTING_DEPTH = 100
+DIRECTIVES = {
+    "settowidth": SEMANTICS.settowidth.hpml,
+    "epigraph": SEMANTICS.epigraph.hpml
+}
+
+#########
+# NODES #
+#########
+
+class LineKind(Enum):
+    """ Lists the different kinds of line. """
+    VERSE = "verse"
+    BLOCK_OPENER = "block_opener"
+    MINI_BLOCK = "mini_block"
+
+@dataclass
+class Command:
+    """ An HPML command, with its argument if it takes one. """
+    name: str
+    argument: str|None = None
+    is_closed: bool = True
+
+    def get_tokens(self) -> list:
+        """ Tokenise the argument, if there is one. """
+        if self.argument is None:
+            return []
+        return tokenise(self.argument)
+
+@dataclass
+class Line:
+    """ A line of verse. The HPML is kept as parsed; the compiler's passes work
+    on the LaTeX. """
+    hpml: str
+    kind: LineKind = LineKind.VERSE
+    latex: str|None = None
+
+    def __post_init__(self):
+        if self.latex is None:
+            self.latex = self.hpml
+
+    def get_tokens(self) -> list:
+        """ Tokenise the HPML. """
+        return tokenise(self.hpml)
+
+@dataclass
+class Stanza:
+    """ A run of lines, separated from the next by a blank line. The stanza
+    also indexes itself as it is built: it records the range of source lines
+    which it spans, and the positions of its block openers and mini-blocks, so
+    that no pass need scan every line for them. """
+    lines: list[Line] = field(default_factory=list)
+    start: int|None = None
+    end: int|None = None
+    block_openers: list[int] = field(default_factory=list)
+    mini_blocks: list[int] = field(default_factory=list)
+
+    def add_line(self, line, source_index=None):
+        """ Add a line to the end of the stanza, and index it. """
+        if line.kind == LineKind.BLOCK_OPENER:
+            self.block_openers.append(len(self.lines))
+        elif line.kind == LineKind.MINI_BLOCK:
+            self.mini_blocks.append(len(self.lines))
+        self.lines.append(line)
+        if source_index is not None:
+            if self.start is None:
+                self.start = source_index
+            self.end = source_index+1
+
+@dataclass
+class Document:
+    """ A whole poem. The directives map the name of each directive found to
+    the index of its source line, and its argument. """
+    stanzas: list[Stanza] = field(default_factory=list)
+    settowidth: str|None = None
+    epigraph: str|None = None
+    directives: dict[str, tuple[int, str]] = field(default_factory=dict)
+
+    def get_lines(self) -> list[Line]:
+        """ Return every line, in order. """
+        return [line for stanza in self.stanzas for line in stanza.lines]
+
+    def get_hpml_lines(self) -> list[str]:
+        """ Return the HPML of each line, with a blank line between stanzas. """
+        return self._join_stanzas(lambda line: line.hpml)
+
+    def get_latex_lines(self) -> list[str]:
+        """ Return the LaTeX of each line, with a blank line between
+        stanzas. """
+        return self._join_stanzas(lambda line: line.latex)
+
+    def _join_stanzas(self, get_text):
+        """ Ronseal. """
+        result = []
+        for index, stanza in enumerate(self.stanzas):
+            if index > 0:
+                result.append("")
+            result += [get_text(line) for line in stanza.lines]
+        return result
+
+#############
+# FUNCTIONS #
+#############
+
+def parse_document(hpml) -> Document:
+    """ Parse a string of HPML into a document, in a single pass. The
+    whitespace is normalised across the whole string at once, but directives
+    are looked for in the lines as given. """
+    result = Document()
+    lines = zip(hpml.split("\n"), normalise_whitespace(hpml).split("\n"))
+    result.stanzas = list(group_stanzas(lines, result.directives))
+    if "settowidth" in result.directives:
+        _, result.settowidth = result.directives["settowidth"]
+    if "epigraph" in result.directives:
+        _, result.epigraph = result.directives["epigraph"]
+    return result
+
+def iter_stanzas(lines, directives=None):
+    """ Group an iterable of lines into stanzas, holding no more than one
+    stanza at a time. If a dictionary is given, then the first line which
+    consists of each directive is left out, and recorded in the dictionary;
+    otherwise, any directives must have been removed already. """
+    pairs = ((line, trim_whitespace(line)) for line in lines)
+    return group_stanzas(pairs, directives)
+
+def group_stanzas(pairs, directives=None):
+    """ As above, but for an iterable of (line, trimmed line) pairs. """
+    stanza = Stanza()
+    for index, (line, trimmed_line) in enumerate(pairs):
+        if directives is not None:
+            name = match_directive(line, directives)
+            if name:
+                directives[name] = (index, line[len(DIRECTIVES[name]):-1])
+                continue
+        if trimmed_line:
+            stanza.add_line(
+                Line(trimmed_line, kind=classify_line(trimmed_line)),
+                index
+            )
+        elif stanza.lines:
+            yield stanza
+            stanza = Stanza()
+    if stanza.lines:
+        yield stanza
+
+def match_directive(line, found):
+    """ Return the name of the directive of which a given line consists, unless
+    there is none, or that directive has been found already. """
+    for name, marker in DIRECTIVES.items():
+        if (name not in found) and is_directive(line, marker):
+            return name
+    return None
+
+def is_directive(line, marker) -> bool:
+    """ Determine whether a given line consists of a given directive, i.e. the
+    directive's marker, and an argument whose closing brace ends the line. """
+    return (
+        line.startswith(marker) and
+        line.endswith(ENDBLC) and
+        (find_closing_brace(line, len(marker)-1) == len(line)-1)
+    )
+
+def classify_line(line) -> LineKind:
+    """ Decide what kind of line a given line is. """
+    if (SEMANTICS.chorus.hpml in line) or (SEMANTICS.inscription.hpml in line):
+        return LineKind.BLOCK_OPENER
+    if (
+        (SEMANTICS.minichorus.hpml in line) or
+        (SEMANTICS.miniinscription.hpml in line)
+    ):
+        return LineKind.MINI_BLOCK
+    return LineKind.VERSE
+
+def tokenise(string) -> list:
+    """ Split a string into plain text and commands, matching each command's
+    braces. """
+    result = []
+    position = 0
+    text_start = 0
+    while True:
+        match = COMMAND_PATTERN.search(string, position)
+        if not match:
+            break
+        if match.start() > text_start:
+            result.append(string[text_start:match.start()])
+        command = Command(match.group())
+        position = match.end()
+        if string.startswith(STABLC, position):
+            argument_end = find_closing_brace(string, position)
+            if argument_end == -1:
+                command.argument = string[position+1:]
+                command.is_closed = False
+                position = len(string)
+            else:
+                command.argument = string[position+1:argument_end]
+                position = argument_end+1
+        result.append(command)
+        text_start = position
+    if text_start < len(string):
+        result.append(string[text_start:])
+    return result
+
+def find_closing_brace(string, opening_index, end=None) -> int:
+    """ Find the brace which closes the one at a given index, looking no
+    further than a given end index, or return -1. """
+    if end is None:
+        end = len(string)
+    depth = 0
+    for match in BRACE_PATTERN.finditer(string, opening_index, end):
+        character = match.group()
+        if character == STABLC:
+            depth += 1
+        elif character == ENDBLC:
+            depth -= 1
+            if depth == 0:
+                return match.start()
+    return -1
+
+def match_braces(string) -> dict[int, int]:
+    """ Match every brace in a string in a single pass, mapping the index of
+    each opening brace to that of the brace which closes it, on the same line,
+    or to -1. The closing braces are recorded in the order in which they are
+    found, i.e. in order of index. """
+    result = {}
+    unclosed = []
+    for match in BRACE_PATTERN.finditer(string):
+        character = match.group()
+        if character == STABLC:
+            unclosed.append(match.start())
+        elif character == ENDBLC:
+            if unclosed:
+                result[unclosed.pop()] = match.start()
+        else:
+            result.update(dict.fromkeys(unclosed, -1))
+            unclosed.clear()
+    result.update(dict.fromkeys(unclosed, -1))
+    return result
+
+def remove_command_with_argument(string, opener) -> str:
+    """ Remove each instance of a given command, e.g. "#FOOTNOTE{", along with
+    its argument, matching the braces. A command whose argument is not closed
+    on the same line is left alone. """
+    return remove_commands_with_arguments(string, (opener,))
+
+def remove_commands_with_arguments(string, openers) -> str:
+    """ As above, but for any number of commands at once, in a single pass
+    over the string, however many commands, or braces, there are. """
+    closing_indices = None
+    result = []
+    position = 0
+    for match in get_openers_pattern(tuple(openers)).finditer(string):
+        if match.start() < position:
+            # This lies within an argument which has been removed already.
+            continue
+        if closing_indices is None:
+            closing_indices = match_braces(string)
+        closing_index = closing_indices[match.end()-1]
+        if closing_index != -1:
+            result.append(string[position:match.start()])
+            position = closing_index+1
+    result.append(string[position:])
+    return "".join(result)
+
+def remove_commands_keep_arguments(string) -> str:
+    """ Remove each #COMMAND, ##COMMAND, etc, along with the braces around its
+    argument, if it has one, but keep the argument itself. """
+    closing_indices = None
+    cuts = []
+    kept = set()
+    for match in COMMAND_NAME_PATTERN.finditer(string):
+        cuts.append((match.start(), match.end()))
+        if string.startswith(STABLC, match.end()):
+            if closing_indices is None:
+                closing_indices = match_braces(string)
+            if closing_indices[match.end()] != -1:
+                cuts.append((match.end(), match.end()+1))
+                kept.add(closing_indices[match.end()])
+    if not cuts:
+        return string
+    # The closing braces are taken in the order in which they were matched,
+    # so that both lists of cuts are in order of index.
+    closing_cuts = [
+        (index, index+1)
+        for index in (closing_indices or {}).values()
+        if index in kept
+    ]
+    result = []
+    position = 0
+    for start, end in heapq.merge(cuts, closing_cuts):
+        result.append(string[position:start])
+        position = end
+    result.append(string[position:])
+    return "".join(result)
+
+@cache
+def get_openers_pattern(openers) -> re.Pattern:
+    """ Compile a pattern which matches any of a tuple of openers, preferring
+    the longest. """
+    alternatives = sorted(openers, key=len, reverse=True)
+    return re.compile("|".join(map(re.escape, alternatives)))
@@ -4,19 +4,49 @@ HPML into LaTeX.
 """
 
 # Standard imports.
-import re
+from collections import Counter
+from dataclasses import dataclass
+from functools import cache
 import warnings
 
 # Local imports.
 from .lookups import (
     is_suppress_non_standard_mod,
     is_other_mod,
+    OtherMods,
+    SuppressNonStandardMods,
     SUPPRESS_NON_STANDARD,
     SUPPRESS_NON_STANDARD_MODS_AS_SET,
     SEMANTICS,
     FRACTIONS,
     DASHES
 )
+from .parser import remove_command_with_argument
+from .translator import Translator
+
+# Local constants.
+# The substitutions which make up each mod, bar the suppression of margin
+# notes, which has to match braces.
+MOD_PAIRS = {
+    SuppressNonStandardMods.SUPPRESS_PERSON_FONT.value:
+        ((SEMANTICS.person.hpml, ""),),
+    SuppressNonStandardMods.SUPPRESS_PLACE_FONT.value:
+        ((SEMANTICS.place.hpml, ""),),
+    SuppressNonStandardMods.SUPPRESS_PUBLICATION_FONT.value:
+        ((SEMANTICS.publication.hpml, SEMANTICS.ital.hpml),),
+    SuppressNonStandardMods.SUPPRESS_FOREIGN_FONT.value:
+        ((SEMANTICS.foreign.hpml, SEMANTICS.ital.hpml),),
+    SuppressNonStandardMods.SUPPRESS_SHIP_FONT.value:
+        ((SEMANTICS.ship.hpml, SEMANTICS.ital.hpml),),
+    SuppressNonStandardMods.SUPPRESS_AMPERSANDS.value:
+        ((SEMANTICS.add.hpml, SEMANTICS.add.plain),),
+    SuppressNonStandardMods.SUPPRESS_FRACTIONS.value:
+        tuple((fraction, value.plain) for fraction, value in FRACTIONS.items()),
+    OtherMods.EM_DASHES.value:
+        ((" "+DASHES.n+" ", " "+DASHES.m+" "),)
+}
+# The order in which the mods are applied, whatever order they are given in.
+MOD_ORDER = (OtherMods.SUPPRESS_MARGINNOTES.value,)+tuple(MOD_PAIRS)
 
 ##############
 # MAIN CLASS #
@@ -24,72 +54,96 @@ from .lookups import (
 
 class Preprocessor:
     """ The class in question. """
-    def __init__(self, hpml, raw_mods):
+    def __init__(self, hpml, raw_mods, count_replacements=False):
         if not raw_mods:
             raw_mods = ()
         self.hpml = hpml
         self.mods = build_mods(raw_mods)
+        self.plan = get_mod_plan(frozenset(self.mods))
+        self.replacements = 0 if count_replacements else None
 
     def preprocess(self):
         """ Ronseal. """
-        for mod in self.mods:
-            mod_method = getattr(self, mod)
-            mod_method()
+        if self.replacements is None:
+            self.hpml = self.plan.apply(self.hpml)
+        else:
+            counts = Counter()
+            self.hpml = self.plan.apply(self.hpml, counts)
+            self.replacements += counts.total()
         return self.hpml
 
-    def replace_substring(self, old, new):
-        """ Replace a given substring with another. """
-        self.hpml = self.hpml.replace(old, new)
-
-    def suppress_person_font(self):
-        """ Implement the mod. """
-        self.replace_substring(SEMANTICS.person.hpml, "")
-
-    def suppress_place_font(self):
-        """ Implement the mod. """
-        self.replace_substring(SEMANTICS.place.hpml, "")
-
-    def suppress_publication_font(self):
-        """ Implement the mod. """
-        self.replace_substring(SEMANTICS.publication.hpml, SEMANTICS.ital.hpml)
-
-    def suppress_foreign_font(self):
-        """ Implement the mod. """
-        self.replace_substring(SEMANTICS.foreign.hpml, SEMANTICS.ital.hpml)
-
-    def suppress_ship_font(self):
-        """ Implement the mod. """
-        self.replace_substring(SEMANTICS.ship.hpml, SEMANTICS.ital.hpml)
-
-    def suppress_ampersands(self):
-        """ Implement the mod. """
-        self.replace_substring(SEMANTICS.add.hpml, SEMANTICS.add.plain)
-
-    def suppress_fractions(self):
-        """ Implement the mod. """
-        for fraction, value in FRACTIONS.items():
-            self.replace_substring(fraction, value.plain)
-
-    def suppress_marginnotes(self):
-        """ Implement the mod. """
-        re.sub("##MARGINNOTE{.*}", "", self.hpml)
-
-    def em_dashes(self):
-        """ Implement the mod. """
-        self.replace_substring(" "+DASHES.n+" ", " "+DASHES.m+" ")
+    def preprocess_lines(self, lines):
+        """ Preprocess each of an iterable of lines in turn. This gives the
+        same result as preprocessing them all at once, since no mod works
+        across a line break. """
+        for line in lines:
+            self.hpml = line
+            yield self.preprocess()
+
+##################
+# HELPER CLASSES #
+##################
+
+@dataclass(frozen=True)
+class ModPlan:
+    """ A set of mods, compiled into a single rewrite. Margin notes, if they
+    are to be suppressed, are removed first, so that no other mod can unbalance
+    their braces; every other mod is a literal substitution, and these are
+    applied, in the order of MOD_ORDER, by a single translator. """
+    mods: frozenset[str]
+    suppress_marginnotes: bool = False
+    translator: Translator|None = None
+
+    def apply(self, hpml, counts=None) -> str:
+        """ Apply the plan to a string of HPML. If a counter is given, count
+        how many times each substring is replaced. """
+        if self.suppress_marginnotes:
+            marker = SEMANTICS.marginnote.hpml
+            if (counts is not None) and (marker in hpml):
+                counts[marker] += hpml.count(marker)
+            hpml = remove_command_with_argument(hpml, marker)
+        if self.translator:
+            hpml = self.translator.translate(hpml, counts)
+        return hpml
 
 ####################
 # HELPER FUNCTIONS #
 ####################
 
 def build_mods(raw_mods):
-    """ Build a SET of mods from a list of raw mods. """
+    """ Build a SET of mods from a list of raw mods, warning of any which
+    isn't recognised, every time. """
+    mods, unrecognised = resolve_mods(tuple(raw_mods))
+    for raw_mod in unrecognised:
+        warnings.warn("Unrecognised preprocessor mod: "+str(raw_mod))
+    return set(mods)
+
+@cache
+def resolve_mods(raw_mods) -> tuple[frozenset[str], tuple]:
+    """ Resolve a tuple of raw mods, once for each distinct tuple, into a set
+    of mods, and a tuple of those raw mods which aren't recognised. """
     result = set()
+    unrecognised = []
     for raw_mod in raw_mods:
         if raw_mod == SUPPRESS_NON_STANDARD:
             result = result.union(SUPPRESS_NON_STANDARD_MODS_AS_SET)
         elif is_suppress_non_standard_mod(raw_mod) or is_other_mod(raw_mod):
             result.add(raw_mod)
         else:
-            warnings.warn("Unrecognised preprocessor mod: "+str(raw_mod))
+            unrecognised.append(raw_mod)
+    return frozenset(result), tuple(unrecognised)
+
+@cache
+def get_mod_plan(mods) -> ModPlan:
+    """ Compile a frozenset of mods into a plan, once for each distinct set. """
+    pairs = []
+    for mod in MOD_ORDER:
+        if (mod in MOD_PAIRS) and (mod in mods):
+            pairs += MOD_PAIRS[mod]
+    result = \
+        ModPlan(
+            mods=mods,
+            suppress_marginnotes=OtherMods.SUPPRESS_MARGINNOTES.value in mods,
+            translator=Translator(pairs) if pairs else None
+        )
     return result
@@ -0,0 +1,301 @@
+"""
+This code defines a class which holds any house commands - syntactic or
+semantic - defined on top of the bundled lookups, and compiles the merged set
+into a single pair of translators.
+
+Extra commands can be added one by one, or loaded from a JSON file, or from a
+Python file, laid out as:
+
+    {
+        "syntactics": {"#OE": {"latex": "\\\\oe{}", "plain": "oe"}},
+        "semantics": {"saint": {"hpml": "#SAINT{", "latex": "\\\\textsc{"}}
+    }
+
+In a Python file, the two tables are given as the module-level constants
+SYNTACTICS and SEMANTICS.
+"""
+
+# Standard imports.
+from pathlib import Path
+from threading import RLock
+import hashlib
+import json
+import os
+import re
+
+# Local imports.
+from .emitter import get_symbols
+from .lookups import Entry, SEMANTICS, SYNTACTICS, FRACTIONS, STABLC
+from .translator import (
+    get_bundled_translators,
+    get_latex_pairs,
+    get_plain_pairs,
+    load_or_build_translators
+)
+from .utils import get_lookups_fingerprint, get_path_obj_to_cache_dir
+
+# Local constants.
+COMMAND_CODE_PATTERN = re.compile("#+[A-Z]+\\{?")
+PRECOMPILED_FN_STEM = "translators-"
+PRECOMPILED_FN_SUFFIX = ".pickle"
+# How many registries' translators to keep in the cache directory at once.
+MAX_PRECOMPILED = 4
+JSON_EXTENSION = ".json"
+PYTHON_EXTENSION = ".py"
+
+##############
+# MAIN CLASS #
+##############
+
+class CommandRegistry:
+    """ The class in question. No command may be defined twice, and no
+    command's name may appear within another's, e.g. #ED within #EDDOT, since
+    replacing one would then break up the other. """
+    def __init__(self, paths=()):
+        self.syntactics = {}
+        self.semantics = {}
+        self._names = set(map(get_name, get_builtin_codes()))
+        self._keys = set(SEMANTICS._fields)
+        self._translators = None
+        self._fingerprint = None
+        self._symbols = None
+        self._lock = RLock()
+        for path in paths:
+            self.load(path)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        state["_translators"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = RLock()
+
+    def add_syntactic(self, hpml, latex, plain=None, html=None):
+        """ Define a command which takes no argument. """
+        value = {"latex": latex, "plain": plain, "html": html}
+        self.update({"syntactics": {hpml: value}})
+
+    def add_semantic(self, key, hpml, latex, plain=None, html=None):
+        """ Define a command, under a given key, which may take an
+        argument. """
+        value = {"hpml": hpml, "latex": latex, "plain": plain, "html": html}
+        self.update({"semantics": {key: value}})
+
+    def update(self, definitions):
+        """ Add every command in a dictionary laid out as above. The whole set
+        is checked before any of it is added, so that, if any command is
+        refused, none is. """
+        syntactics = {
+            hpml: make_entry(hpml, value, hpml=hpml)
+            for hpml, value in definitions.get("syntactics", {}).items()
+        }
+        semantics = {
+            key: make_entry(key, value)
+            for key, value in definitions.get("semantics", {}).items()
+        }
+        with self._lock:
+            names = set(self._names)
+            keys = set(self._keys)
+            for entry in syntactics.values():
+                check_entry(entry)
+                claim_name(entry.hpml, names)
+            for key, entry in semantics.items():
+                if key in keys:
+                    raise RegistryException(
+                        "A semantic command is already defined with key: "+key
+                    )
+                keys.add(key)
+                check_entry(entry)
+                claim_name(entry.hpml, names)
+            self.syntactics.update(syntactics)
+            self.semantics.update(semantics)
+            self._names = names
+            self._keys = keys
+            self._invalidate()
+
+    def load(self, path):
+        """ Add every command in a JSON or Python file. """
+        path_obj = Path(path)
+        if path_obj.suffix == JSON_EXTENSION:
+            with open(path_obj, "r") as definitions_file:
+                definitions = json.load(definitions_file)
+        elif path_obj.suffix == PYTHON_EXTENSION:
+            # This is only needed for a Python file, so import it here.
+            # pylint: disable-next=import-outside-toplevel
+            import runpy
+            namespace = runpy.run_path(str(path_obj))
+            definitions = {
+                "syntactics": namespace.get("SYNTACTICS", {}),
+                "semantics": namespace.get("SEMANTICS", {})
+            }
+        else:
+            raise RegistryException(
+                "Command definitions must be in a "+JSON_EXTENSION+" or a "+
+                PYTHON_EXTENSION+" file, not: "+str(path)
+            )
+        self.update(definitions)
+
+    def _invalidate(self):
+        """ Forget the translators, and the fingerprint, built from the old
+        definitions. """
+        self._translators = None
+        self._fingerprint = None
+        self._symbols = None
+
+    def has_extras(self) -> bool:
+        """ Ronseal. """
+        return bool(self.syntactics or self.semantics)
+
+    def get_fingerprint(self) -> str:
+        """ Hash the bundled lookups, together with every extra command. """
+        with self._lock:
+            if self._fingerprint is None:
+                hasher = hashlib.sha256(get_lookups_fingerprint().encode())
+                extras = (
+                    sorted(self.syntactics.items()),
+                    sorted(self.semantics.items())
+                )
+                hasher.update(repr(extras).encode())
+                self._fingerprint = hasher.hexdigest()
+            return self._fingerprint
+
+    def get_latex_pairs(self) -> list[tuple[str, str]]:
+        """ Return the (HPML, LaTeX) pairs: the bundled syntactics, then the
+        extra ones, then the bundled semantics, then the extra ones. """
+        extra_syntactics = \
+            [(hpml, entry.latex) for hpml, entry in self.syntactics.items()]
+        extra_semantics = \
+            [(entry.hpml, entry.latex) for entry in self.semantics.values()]
+        result = get_latex_pairs()
+        result[len(SYNTACTICS):len(SYNTACTICS)] = extra_syntactics
+        return result+extra_semantics
+
+    def get_plain_pairs(self) -> list[tuple[str, str]]:
+        """ Return the (HPML, plain text) pairs. """
+        result = get_plain_pairs()
+        result += [
+            (hpml, entry.plain)
+            for hpml, entry in self.syntactics.items()
+            if entry.plain is not None
+        ]
+        return result
+
+    def get_translators(self) -> tuple:
+        """ Return the LaTeX and plain text translators for the merged set of
+        commands, building them, or loading them from the cache directory,
+        only when the definitions have changed. The lock is held throughout,
+        so that the translators are built from the very definitions from
+        which the fingerprint was taken. """
+        with self._lock:
+            if not self.has_extras():
+                return get_bundled_translators()
+            fingerprint = self.get_fingerprint()
+            if self._translators is None:
+                filename = \
+                    PRECOMPILED_FN_STEM+fingerprint[:16]+PRECOMPILED_FN_SUFFIX
+                self._translators = \
+                    load_or_build_translators(
+                        fingerprint,
+                        self.get_latex_pairs(),
+                        self.get_plain_pairs(),
+                        filename=filename
+                    )
+                prune_precompiled(filename)
+            return self._translators
+
+    def get_latex_translator(self):
+        """ Ronseal. """
+        return self.get_translators()[0]
+
+    def get_plain_translator(self):
+        """ Ronseal. """
+        return self.get_translators()[1]
+
+    def get_symbols(self) -> dict[str, Entry]:
+        """ Map each command which takes no argument to its entry. """
+        with self._lock:
+            if self._symbols is None:
+                result = dict(get_symbols())
+                result.update(self.syntactics)
+                for entry in self.semantics.values():
+                    if not entry.hpml.endswith(STABLC):
+                        result[entry.hpml] = entry
+                self._symbols = result
+            return self._symbols
+
+##################
+# HELPER CLASSES #
+##################
+
+class RegistryException(Exception):
+    """ A custom exception. """
+
+####################
+# HELPER FUNCTIONS #
+####################
+
+def prune_precompiled(filename):
+    """ Mark a registry's pickled translators as the most recently used, and
+    delete all but the few most recently used others, so that the cache
+    directory doesn't grow without limit as the definitions change. """
+    path_obj_to_cache_dir = get_path_obj_to_cache_dir()
+    pattern = PRECOMPILED_FN_STEM+"*"+PRECOMPILED_FN_SUFFIX
+    try:
+        os.utime(path_obj_to_cache_dir/filename)
+        path_objs = \
+            sorted(
+                path_obj_to_cache_dir.glob(pattern),
+                key=lambda path_obj: path_obj.stat().st_mtime_ns,
+                reverse=True
+            )
+        for path_obj in path_objs[MAX_PRECOMPILED:]:
+            path_obj.unlink(missing_ok=True)
+    except OSError:
+        pass
+
+def make_entry(name, value, **fields) -> Entry:
+    """ Make an entry from the definition of a given command, refusing any
+    definition which isn't a dictionary of an entry's fields. """
+    try:
+        return Entry(**fields, **value)
+    except TypeError as error:
+        raise RegistryException(
+            "Bad definition of command "+name+": "+str(error)
+        ) from error
+
+def get_builtin_codes() -> list[str]:
+    """ Return the HPML code for every bundled command. """
+    result = [entry.hpml for entry in SEMANTICS if entry.hpml.startswith("#")]
+    result += list(SYNTACTICS)
+    result += list(FRACTIONS)
+    return result
+
+def check_entry(entry):
+    """ Check that a new command gives both its HPML and its LaTeX. """
+    if not (isinstance(entry.hpml, str) and isinstance(entry.latex, str)):
+        raise RegistryException(
+            "Each command must give both its HPML and its LaTeX: "+repr(entry)
+        )
+
+def claim_name(hpml, names):
+    """ Check that a new command is well formed, and collides with none of a
+    set of names, and add its name to the set. """
+    if not COMMAND_CODE_PATTERN.fullmatch(hpml):
+        raise RegistryException("Badly formed HPML command: "+hpml)
+    name = get_name(hpml)
+    for other in names:
+        if name == other:
+            raise RegistryException("Command already defined: "+name)
+        if (name in other) or (other in name):
+            raise RegistryException(
+                "Command "+name+" collides with command "+other+"."
+            )
+    names.add(name)
+
+def get_name(hpml) -> str:
+    """ Get the name of a command from its code, e.g. "#PLACE" from
+    "#PLACE{". """
+    return hpml.strip().removesuffix(STABLC)
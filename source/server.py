@@ -0,0 +1,477 @@
+"""
+This code defines a small HTTP service, listening on localhost or on a Unix
+socket, which compiles HPML in a pool of warm worker processes, batching
+together any requests which arrive at about the same time.
+
+The endpoints are:
+    POST /compile   {"hpml": "...", "options": {...}} -> {"latex": "..."}
+    GET  /health    -> {"status": "ok", ...}, or a 503 if every worker is stuck
+    GET  /metrics   -> request counts, queue depth and latency percentiles
+"""
+
+# Standard imports.
+from collections import deque
+from concurrent.futures import (
+    Future,
+    ProcessPoolExecutor,
+    TimeoutError as FutureTimeoutError
+)
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+from threading import Lock, Thread
+import json
+import os
+import queue
+import socket
+import stat
+import time
+
+# Local imports.
+from .asynchronous import compile_text
+from .engine import HPMLEngine, HPMLEngineException, check_options
+
+# Local constants.
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8427
+DEFAULT_MAX_BATCH_SIZE = 16
+DEFAULT_MAX_BATCH_DELAY = 0.005
+DEFAULT_REQUEST_TIMEOUT = 60
+LATENCY_WINDOW = 1000
+PERCENTILES = (0.5, 0.9, 0.99)
+ENCODING = "utf-8"
+
+##############
+# MAIN CLASS #
+##############
+
+class CompileServer:
+    """ The class in question. """
+    def __init__(
+            self,
+            host=DEFAULT_HOST,
+            port=DEFAULT_PORT,
+            socket_path=None,
+            jobs=None,
+            max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+            max_batch_delay=DEFAULT_MAX_BATCH_DELAY,
+            request_timeout=DEFAULT_REQUEST_TIMEOUT,
+            **defaults
+        ):
+        check_options(defaults)
+        if socket_path:
+            remove_stale_socket(socket_path)
+        self.host = host
+        self.port = port
+        self.socket_path = socket_path
+        self.jobs = jobs or os.cpu_count() or 1
+        self.request_timeout = request_timeout
+        self.defaults = defaults
+        self.metrics = ServerMetrics()
+        self.executor = \
+            ProcessPoolExecutor(max_workers=self.jobs, initializer=warm_up)
+        self.batcher = \
+            Batcher(
+                self.executor,
+                self.metrics,
+                workers=self.jobs,
+                max_batch_size=max_batch_size,
+                max_batch_delay=max_batch_delay
+            )
+        self.httpd = self._make_httpd()
+        self.httpd.compile_server = self
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *_):
+        self.shutdown()
+
+    def _make_httpd(self):
+        """ Make the object which listens for requests. """
+        if self.socket_path:
+            return ThreadingUnixHTTPServer(self.socket_path, RequestHandler)
+        return ThreadingHTTPServer((self.host, self.port), RequestHandler)
+
+    def get_address(self) -> str:
+        """ Describe where the server is listening. """
+        if self.socket_path:
+            return "unix:"+self.socket_path
+        host, port = self.httpd.server_address[:2]
+        return "http://"+host+":"+str(port)
+
+    def compile(self, hpml, options=None) -> Future:
+        """ Queue a string of HPML to be compiled, with the server's defaults
+        overridden by any options given. """
+        options = dict(options or {})
+        check_options(options)
+        return self.batcher.submit(hpml, dict(self.defaults, **options))
+
+    def get_health(self) -> dict:
+        """ Report the server as degraded if any worker has been stuck on a
+        batch for longer than a request may take, and as unhealthy if every
+        worker has. """
+        hung = self.batcher.count_hung(self.request_timeout)
+        if not hung:
+            status = "ok"
+        elif hung < self.jobs:
+            status = "degraded"
+        else:
+            status = "unhealthy"
+        result = {
+            "status": status,
+            "workers": self.jobs,
+            "hung_workers": hung,
+            "uptime": self.metrics.get_uptime()
+        }
+        return result
+
+    def get_metrics(self) -> dict:
+        """ Ronseal. """
+        return self.metrics.to_dict(queue_depth=self.batcher.get_depth())
+
+    def serve_forever(self):
+        """ Serve until shut down. """
+        self.batcher.start()
+        self.httpd.serve_forever()
+
+    def start(self):
+        """ Serve from a background thread. """
+        self._thread = Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+
+    def shutdown(self):
+        """ Stop serving, and close the pool. """
+        if self._thread is not None:
+            self.httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.httpd.server_close()
+        self.batcher.stop()
+        self.executor.shutdown()
+        if self.socket_path and is_socket(self.socket_path):
+            os.remove(self.socket_path)
+
+##################
+# HELPER CLASSES #
+##################
+
+class Batcher:
+    """ Gathers queued requests into batches - as many as arrive within a
+    given delay of the first, up to a given size - and spreads each batch
+    across the workers, sending each worker its share as a single job. """
+    def __init__(
+            self,
+            executor,
+            metrics,
+            workers=1,
+            max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+            max_batch_delay=DEFAULT_MAX_BATCH_DELAY
+        ):
+        self.executor = executor
+        self.metrics = metrics
+        self.workers = workers
+        self.max_batch_size = max_batch_size
+        self.max_batch_delay = max_batch_delay
+        self._queue = queue.Queue()
+        self._in_flight = 0
+        self._sent = {}
+        self._lock = Lock()
+        self._thread = None
+
+    def start(self):
+        """ Ronseal. """
+        if self._thread is None:
+            self._thread = Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """ Send off whatever is queued, and then stop. """
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, hpml, options) -> Future:
+        """ Queue a single request. """
+        result = Future()
+        self._queue.put((hpml, options, result))
+        return result
+
+    def get_depth(self) -> int:
+        """ Count the requests which are queued or being compiled. """
+        with self._lock:
+            return self._queue.qsize()+self._in_flight
+
+    def count_hung(self, timeout) -> int:
+        """ Count the workers which have been running the same batch for
+        longer than a given number of seconds. """
+        now = time.monotonic()
+        with self._lock:
+            result = sum(
+                1 for future, sent in self._sent.items()
+                if future.running() and (now-sent > timeout)
+            )
+        return min(result, self.workers)
+
+    def _run(self):
+        """ Gather and send off batches until told to stop. """
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic()+self.max_batch_delay
+            while len(batch) < self.max_batch_size:
+                timeout = deadline-time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            for share in split_batch(batch, self.workers):
+                self._dispatch(share)
+
+    def _dispatch(self, batch):
+        """ Send a batch to a worker, leaving out any request cancelled while
+        it was queued. Once sent, a request can't be cancelled. """
+        batch = [
+            item for item in batch if item[2].set_running_or_notify_cancel()
+        ]
+        if not batch:
+            return
+        with self._lock:
+            self._in_flight += len(batch)
+        self.metrics.record_batch(len(batch))
+        jobs = [(hpml, options) for hpml, options, _ in batch]
+        future = self.executor.submit(compile_batch, jobs)
+        with self._lock:
+            self._sent[future] = time.monotonic()
+        future.add_done_callback(partial(self._resolve, batch))
+
+    def _resolve(self, batch, future):
+        """ Hand each request in a finished batch its result. """
+        with self._lock:
+            self._in_flight -= len(batch)
+            self._sent.pop(future, None)
+        if future.exception() is not None:
+            for _, _, item_future in batch:
+                item_future.set_exception(future.exception())
+            return
+        results = future.result()
+        for (_, _, item_future), (output, error) in zip(batch, results):
+            if error is None:
+                item_future.set_result(output)
+            else:
+                item_future.set_exception(error)
+
+class ServerMetrics:
+    """ Counts requests, and keeps the latencies of the most recent ones. """
+    def __init__(self):
+        self.started = time.monotonic()
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.batched_requests = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self._lock = Lock()
+
+    def get_uptime(self) -> float:
+        """ Ronseal. """
+        return time.monotonic()-self.started
+
+    def record_request(self, latency, ok=True):
+        """ Record one request, and how long it took in seconds. """
+        with self._lock:
+            self.requests += 1
+            if not ok:
+                self.errors += 1
+            self.latencies.append(latency)
+
+    def record_batch(self, size):
+        """ Record one batch sent to a worker. """
+        with self._lock:
+            self.batches += 1
+            self.batched_requests += size
+
+    def to_dict(self, queue_depth=0) -> dict:
+        """ Export the records, with the latency percentiles. """
+        with self._lock:
+            latencies = sorted(self.latencies)
+            result = {
+                "uptime": self.get_uptime(),
+                "requests": self.requests,
+                "errors": self.errors,
+                "batches": self.batches,
+                "mean_batch_size":
+                    self.batched_requests/self.batches if self.batches else 0.0,
+                "queue_depth": queue_depth,
+                "latency": {
+                    "p"+str(round(fraction*100)):
+                        get_percentile(latencies, fraction)
+                    for fraction in PERCENTILES
+                }
+            }
+        return result
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """ Handles a single HTTP request. """
+    def do_GET(self): # pylint: disable=invalid-name
+        """ Ronseal. """
+        compile_server = self.server.compile_server
+        if self.path == "/health":
+            health = compile_server.get_health()
+            status = 503 if health["status"] == "unhealthy" else 200
+            self.send_json(status, health)
+        elif self.path == "/metrics":
+            self.send_json(200, compile_server.get_metrics())
+        else:
+            self.send_json(404, {"error": "Not found: "+self.path})
+
+    def do_POST(self): # pylint: disable=invalid-name
+        """ Ronseal. """
+        if self.path != "/compile":
+            self.send_json(404, {"error": "Not found: "+self.path})
+            return
+        start = time.perf_counter()
+        status, body = self.compile()
+        self.server.compile_server.metrics.record_request(
+            time.perf_counter()-start,
+            ok=status == 200
+        )
+        self.send_json(status, body)
+
+    def compile(self) -> tuple[int, dict]:
+        """ Compile the HPML in the body of the request. A malformed request
+        gets a 400, a compilation which fails, or whose worker fails, a 500,
+        and one which takes too long a 504. """
+        compile_server = self.server.compile_server
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length).decode(ENCODING))
+            if not isinstance(request, dict):
+                raise ValueError("The request must be a JSON object.")
+            if not isinstance(request.get("hpml"), str):
+                raise ValueError("The request must give the HPML as a string.")
+            future = \
+                compile_server.compile(request["hpml"], request.get("options"))
+        except (ValueError, TypeError, HPMLEngineException) as error:
+            return 400, describe_error(error)
+        try:
+            output = future.result(timeout=compile_server.request_timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            return 504, {"error": "Timed out."}
+        except Exception as error: # pylint: disable=broad-exception-caught
+            return 500, describe_error(error)
+        return 200, {"latex": output}
+
+    def send_json(self, status, body):
+        """ Send a response with a JSON body. """
+        data = json.dumps(body).encode(ENCODING)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def address_string(self) -> str:
+        """ Describe the client, which has no address on a Unix socket. """
+        if isinstance(self.client_address, tuple):
+            return super().address_string()
+        return "unix"
+
+    def log_message(self, *_): # pylint: disable=arguments-differ
+        """ Keep quiet; the metrics endpoint says what's going on. """
+
+class CompileServerException(Exception):
+    """ A custom exception. """
+
+class ThreadingUnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    """ An HTTP server which listens on a Unix socket. """
+    daemon_threads = True
+
+    def server_bind(self):
+        """ Bind, and give the request handler the names it expects. """
+        super().server_bind()
+        self.server_name = "localhost"
+        self.server_port = 0
+
+####################
+# HELPER FUNCTIONS #
+####################
+
+def warm_up():
+    """ Build every table, once, when a worker process starts. """
+    HPMLEngine()
+
+def compile_batch(jobs) -> list[tuple]:
+    """ Compile each of a list of (hpml, options) pairs, returning an (output,
+    error) pair for each. This is what a worker process runs. """
+    result = []
+    for hpml, options in jobs:
+        try:
+            result.append((compile_text(hpml, options), None))
+        except Exception as error: # pylint: disable=broad-exception-caught
+            result.append((None, error))
+    return result
+
+def split_batch(batch, count) -> list[list]:
+    """ Split a batch into no more than a given number of shares, as evenly as
+    possible, keeping the requests in order. """
+    size = -(-len(batch)//max(count, 1))
+    return [batch[index:index+size] for index in range(0, len(batch), size)]
+
+def is_socket(path) -> bool:
+    """ Determine whether there is a socket, and not some other kind of file,
+    at a given path. """
+    try:
+        return stat.S_ISSOCK(os.lstat(path).st_mode)
+    except FileNotFoundError:
+        return False
+
+def is_listening(path) -> bool:
+    """ Determine whether anything is listening on the socket at a given path,
+    by trying to connect to it. Only a refused connection counts as nothing
+    listening; any other error is raised. """
+    with socket.socket(socket.AF_UNIX) as client:
+        try:
+            client.connect(path)
+        except ConnectionRefusedError:
+            return False
+    return True
+
+def remove_stale_socket(path):
+    """ Remove a socket left behind by an earlier server, but refuse to remove
+    one on which a server is still listening, or anything else. """
+    if is_socket(path):
+        if is_listening(path):
+            raise CompileServerException(
+                "Refusing to listen on "+path+", since a server is already "+
+                "listening there."
+            )
+        os.remove(path)
+    elif os.path.lexists(path):
+        raise CompileServerException(
+            "Refusing to listen on "+path+", since something other than a "+
+            "socket is already there."
+        )
+
+def describe_error(error) -> dict:
+    """ Describe an error in the body of a response. """
+    return {"error": type(error).__name__+": "+str(error)}
+
+def get_percentile(sorted_values, fraction) -> float:
+    """ Get a given percentile of a sorted list by the nearest rank. """
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values)-1, int(fraction*len(sorted_values)))
+    return sorted_values[index]
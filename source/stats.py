@@ -0,0 +1,127 @@
+"""
+This code defines a class which records how long each stage of compilation
+takes, and how many replacements each stage - and each command - makes, across
+any number of compilations.
+"""
+
+# Standard imports.
+from collections import Counter
+from dataclasses import asdict, dataclass
+from functools import wraps
+from threading import Lock
+import json
+import time
+
+##############
+# MAIN CLASS #
+##############
+
+class CompileStats:
+    """ The class in question. One object can be shared between any number of
+    compilers, in any number of threads. """
+    def __init__(self):
+        self.compilations = 0
+        self.stages = {}
+        self.commands = Counter()
+        self._lock = Lock()
+
+    def record_stage(self, name, elapsed, replacements=None):
+        """ Record one run of a given stage. """
+        with self._lock:
+            stage = self.stages.get(name)
+            if stage is None:
+                stage = self.stages[name] = StageStats()
+            stage.add(elapsed, replacements)
+
+    def record_commands(self, counts):
+        """ Record how many times each command was replaced. """
+        with self._lock:
+            self.commands.update(counts)
+
+    def record_compilation(self):
+        """ Ronseal. """
+        with self._lock:
+            self.compilations += 1
+
+    def merge(self, other):
+        """ Add the records of another stats object to this one's. """
+        with self._lock:
+            self.compilations += other.compilations
+            for name, other_stage in other.stages.items():
+                stage = self.stages.setdefault(name, StageStats())
+                stage.calls += other_stage.calls
+                stage.total_time += other_stage.total_time
+                stage.max_time = max(stage.max_time, other_stage.max_time)
+                stage.replacements += other_stage.replacements
+            self.commands.update(other.commands)
+
+    def reset(self):
+        """ Forget everything recorded so far. """
+        with self._lock:
+            self.compilations = 0
+            self.stages = {}
+            self.commands = Counter()
+
+    def to_dict(self) -> dict:
+        """ Export the records, with the commands most replaced first. """
+        with self._lock:
+            result = {
+                "compilations": self.compilations,
+                "stages": {
+                    name: stage.to_dict() for name, stage in self.stages.items()
+                },
+                "commands": dict(self.commands.most_common())
+            }
+        return result
+
+    def to_json(self, **kwargs) -> str:
+        """ Export the records as JSON. """
+        return json.dumps(self.to_dict(), **kwargs)
+
+##################
+# HELPER CLASSES #
+##################
+
+@dataclass
+class StageStats:
+    """ The records for a single stage. Times are in seconds. """
+    calls: int = 0
+    total_time: float = 0.0
+    max_time: float = 0.0
+    replacements: int = 0
+
+    def add(self, elapsed, replacements=None):
+        """ Record one run of the stage. """
+        self.calls += 1
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+        if replacements:
+            self.replacements += replacements
+
+    def to_dict(self) -> dict:
+        """ Export the records, with the mean time. """
+        result = asdict(self)
+        result["mean_time"] = self.total_time/self.calls if self.calls else 0.0
+        return result
+
+####################
+# HELPER FUNCTIONS #
+####################
+
+def timed_stage(method):
+    """ Decorate a method of a compiler, so that, if the compiler has a stats
+    object, each call is timed and recorded under the method's name, along
+    with the number of replacements, if any, which the method returns. """
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.stats is None:
+            return method(self, *args, **kwargs)
+        start = time.perf_counter()
+        result = method(self, *args, **kwargs)
+        self.stats.record_stage(
+            method.__name__,
+            time.perf_counter()-start,
+            result
+        )
+        return result
+    return wrapper
@@ -0,0 +1,207 @@
+"""
+This code defines a class which compiles HPML into LaTeX as a stream, holding no
+more than a couple of stanzas in memory at a time.
+"""
+
+# Standard imports.
+from pathlib import Path
+
+# Local imports.
+from .centerer import (
+    convert_line_of_hpml_to_plain_text,
+    get_second_longest_line
+)
+from .hpml_compiler import (
+    STANDARD_MODS,
+    HPMLCompilerException,
+    add_endings,
+    process_choruses,
+    process_minichoruses,
+    translate
+)
+from .lookups import SEMANTICS, ENDBLC, OtherLaTeX
+from .metrics import WidthEstimator
+from .parser import DIRECTIVES, iter_stanzas
+from .preprocessor import Preprocessor
+
+##############
+# MAIN CLASS #
+##############
+
+class StreamingCompiler:
+    """ The class in question. The source is either a path, in which case the
+    file is scanned ahead for the epigraph and the centering line, or an
+    iterable of lines, in which case any directives must come before the end
+    of the first stanza (if the output is to be enclosed). """
+    def __init__(
+            self,
+            source,
+            is_prose_poem=False,
+            mods=None,
+            enclose=True,
+            manual_settowidth_string=None,
+            auto_center=True,
+            epigraph=None,
+            line_numbers=None,
+            estimate_widths=False,
+            registry=None
+        ):
+        self.source = source
+        self.is_prose_poem = is_prose_poem
+        self.mods = mods or STANDARD_MODS
+        self.enclose = enclose and not is_prose_poem
+        self.manual_settowidth_string = manual_settowidth_string
+        self.auto_center = auto_center
+        self.epigraph = epigraph
+        self.line_numbers = line_numbers
+        self.estimate_widths = estimate_widths
+        self.registry = registry
+        self._directives = {}
+        self._auto_settowidth_string = None
+        self._is_prescanned = False
+
+    def iter_latex(self):
+        """ Yield the output, line by line. """
+        self._directives = {}
+        if self.enclose and self.is_path():
+            self._prescan()
+        found = {}
+        stanzas = iter_stanzas(self._iter_preprocessed_lines(), found)
+        previous = next(stanzas, None)
+        if not self._is_prescanned:
+            self._directives = found
+        if self.enclose:
+            yield from self._make_header()
+        found_before_header = len(found)
+        for stanza in stanzas:
+            self._check_for_late_directive(found, found_before_header)
+            yield from self._compile_stanza(previous, False)
+            yield ""
+            previous = stanza
+        self._check_for_late_directive(found, found_before_header)
+        if previous is not None:
+            yield from self._compile_stanza(previous, True)
+        if self.enclose:
+            yield OtherLaTeX.END_VERSE.value
+
+    def write_to(self, stream):
+        """ Write the output to a given text stream. """
+        for index, line in enumerate(self.iter_latex()):
+            if index > 0:
+                stream.write("\n")
+            stream.write(line)
+
+    def is_path(self) -> bool:
+        """ Decide whether the source is a path or an iterable of lines. """
+        return isinstance(self.source, (str, Path))
+
+    def _iter_source_lines(self):
+        """ Yield each line of the source, without its line break. """
+        if self.is_path():
+            with open(self.source, "r") as source_file:
+                for line in source_file:
+                    yield line.removesuffix("\n")
+        else:
+            for line in self.source:
+                yield line.removesuffix("\n")
+
+    def _iter_preprocessed_lines(self):
+        """ Ronseal. """
+        preprocessor = Preprocessor("", self.mods)
+        return preprocessor.preprocess_lines(self._iter_source_lines())
+
+    def _check_for_late_directive(self, found, found_before_header):
+        """ Raise an exception if a directive has turned up after the header
+        which needed it has already been written. """
+        if (
+            self.enclose and
+            (len(found) > found_before_header) and
+            not self._is_prescanned
+        ):
+            raise HPMLCompilerException(
+                "When streaming from an iterable, any directive must come "+
+                "before the end of the first stanza."
+            )
+
+    def _prescan(self):
+        """ Read through the source once, finding the directives and, if
+        needed, the line by which to center the poem. """
+        stanzas = \
+            iter_stanzas(self._iter_preprocessed_lines(), self._directives)
+        plain_translator = None
+        if self.registry is not None:
+            plain_translator = self.registry.get_plain_translator()
+        if self.estimate_widths:
+            estimator = WidthEstimator(plain_translator=plain_translator)
+            line = estimator.get_second_widest_line(stanzas)
+            if line is None:
+                self._auto_settowidth_string = ""
+            else:
+                self._auto_settowidth_string = \
+                    convert_line_of_hpml_to_plain_text(
+                        line.hpml,
+                        plain_translator
+                    )
+        else:
+            plain_lines = (
+                convert_line_of_hpml_to_plain_text(line.hpml, plain_translator)
+                for stanza in stanzas
+                for line in stanza.lines
+            )
+            self._auto_settowidth_string = \
+                get_second_longest_line(line for line in plain_lines if line)
+        self._is_prescanned = True
+
+    def _make_header(self):
+        """ Yield the lines which go before the first stanza. """
+        settowidth_string = self.manual_settowidth_string
+        if (not settowidth_string) and ("settowidth" in self._directives):
+            _, settowidth_string = self._directives["settowidth"]
+        if "epigraph" in self._directives:
+            _, epigraph = self._directives["epigraph"]
+            epigraph = SEMANTICS.ital.latex+epigraph+OtherLaTeX.END_BLOCK.value
+        else:
+            epigraph = self.epigraph
+        if epigraph:
+            yield OtherLaTeX.BEGIN_CENTER.value
+            yield epigraph
+            yield OtherLaTeX.END_CENTER.value
+            yield OtherLaTeX.BIGSKIP.value
+            yield OtherLaTeX.BIGSKIP.value
+        if settowidth_string or self.auto_center:
+            if not settowidth_string:
+                settowidth_string = self._get_auto_settowidth_string()
+            yield OtherLaTeX.PRE_SETTOWIDTH.value+settowidth_string+ENDBLC
+            yield OtherLaTeX.BEGIN_VERSE_CENTERED.value
+        else:
+            yield OtherLaTeX.BEGIN_VERSE.value
+        if self.line_numbers:
+            yield (
+                OtherLaTeX.POEM_LINES.value+
+                str(self.line_numbers)+
+                OtherLaTeX.END_BLOCK.value
+            )
+
+    def _get_auto_settowidth_string(self) -> str:
+        """ Return the line found by the prescan, if there was one. """
+        if not self._is_prescanned:
+            raise HPMLCompilerException(
+                "Auto-centering needs to scan ahead, which is only possible "+
+                "when streaming from a path; otherwise, give a manual "+
+                "settowidth string, or turn off auto-centering."
+            )
+        return self._auto_settowidth_string
+
+    def _compile_stanza(self, stanza, is_last_stanza):
+        """ Run a single stanza through the compiler's passes, and yield its
+        lines. """
+        process_choruses(stanza)
+        process_minichoruses(stanza)
+        if not self.is_prose_poem:
+            add_endings(stanza, is_last_stanza)
+        if self.registry is None:
+            translate(stanza)
+        else:
+            translate(stanza, translator=self.registry.get_latex_translator())
+        for line in stanza.lines:
+            yield line.latex
@@ -0,0 +1,228 @@
+"""
+This code defines a class which wraps compiled poems in LaTeX documents, and
+typesets them into PDFs across a pool of workers, keeping each PDF in a cache
+keyed on what it was typeset from.
+"""
+
+# Standard imports.
+from dataclasses import dataclass
+from pathlib import Path
+import hashlib
+import os
+import shutil
+
+# Local imports.
+from .utils import get_package_code, get_path_obj_to_cache_dir
+
+# Local constants.
+DEFAULT_TEX_COMMAND = ("xelatex", "-interaction=nonstopmode", "-halt-on-error")
+DEFAULT_DOCUMENT_CLASS = "article"
+DEFAULT_TIMEOUT = 300
+DOCUMENT_FN = "poem.tex"
+DOCUMENTCLASS = "\\documentclass"
+PDF_EXTENSION = ".pdf"
+LOG_EXTENSION = ".log"
+PDF_CACHE_DIRNAME = "pdfs"
+
+##############
+# MAIN CLASS #
+##############
+
+class TeXRunner:
+    """ The class in question. The TeX command is run, in a fresh temporary
+    directory, with the name of the document appended to it, and must leave a
+    PDF of the same name behind; any command which does that - a stub script,
+    say - will do. """
+    def __init__(
+            self,
+            tex_command=DEFAULT_TEX_COMMAND,
+            jobs=None,
+            preamble=None,
+            document_class=DEFAULT_DOCUMENT_CLASS,
+            path_to_cache_dir=None,
+            timeout=DEFAULT_TIMEOUT
+        ):
+        if isinstance(tex_command, str):
+            tex_command = tex_command.split()
+        if preamble is None:
+            preamble = get_package_code()
+        if path_to_cache_dir is None:
+            path_to_cache_dir = get_path_obj_to_cache_dir()/PDF_CACHE_DIRNAME
+        self.tex_command = tuple(tex_command)
+        self.jobs = jobs or os.cpu_count() or 1
+        self.preamble = preamble
+        self.document_class = document_class
+        self.path_obj_to_cache_dir = Path(path_to_cache_dir)
+        self.timeout = timeout
+
+    def wrap(self, latex) -> str:
+        """ Wrap a compiled poem in a complete document, unless it is one
+        already. """
+        return wrap_in_document(latex, self.preamble, self.document_class)
+
+    def get_key(self, document) -> str:
+        """ Hash a document, together with the command which typesets it. """
+        hasher = hashlib.sha256()
+        hasher.update(document.encode())
+        hasher.update(b"\0"+repr(self.tex_command).encode())
+        return hasher.hexdigest()
+
+    def typeset(self, paths_to_tex) -> list["TypesetResult"]:
+        """ Typeset each of a list of .tex files, as written by
+        HPMLCompiler.save_to_file(), into a PDF alongside it, returning the
+        results in the order given. """
+        jobs = []
+        for path in paths_to_tex:
+            path_obj = Path(path)
+            jobs.append((path_obj, path_obj.with_suffix(PDF_EXTENSION)))
+        return self._run(jobs)
+
+    def typeset_strings(self, items) -> list["TypesetResult"]:
+        """ Typeset each of a list of (latex, path_to_pdf) pairs. """
+        return self._run([(latex, Path(path)) for latex, path in items])
+
+    def _run(self, jobs) -> list["TypesetResult"]:
+        """ Run each job across the pool of workers. Each worker is a thread,
+        since the work is done by the TeX process it waits on. """
+        if self.jobs <= 1 or len(jobs) <= 1:
+            return [self._typeset_one(*job) for job in jobs]
+        # This is slow to import, and only needed for a pool, so import it here.
+        # pylint: disable-next=import-outside-toplevel
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            return list(executor.map(self._typeset_one, *zip(*jobs)))
+
+    def _typeset_one(self, source, path_obj_to_pdf) -> "TypesetResult":
+        """ Typeset a single poem, given as a path or as a string, catching any
+        error. """
+        result = \
+            TypesetResult(
+                source=source,
+                path_to_pdf=path_obj_to_pdf,
+                path_to_log=path_obj_to_pdf.with_suffix(LOG_EXTENSION)
+            )
+        try:
+            if isinstance(source, Path):
+                latex = source.read_text()
+            else:
+                latex = source
+            document = self.wrap(latex)
+            path_obj_to_cached = \
+                self.path_obj_to_cache_dir/self.get_key(document)
+            path_obj_to_cached_pdf = \
+                path_obj_to_cached.with_suffix(PDF_EXTENSION)
+            path_obj_to_cached_log = \
+                path_obj_to_cached.with_suffix(LOG_EXTENSION)
+            if path_obj_to_cached_pdf.exists():
+                result.cached = True
+            else:
+                log = self._run_tex(document, path_obj_to_cached_pdf)
+                if not path_obj_to_cached_pdf.exists():
+                    result.path_to_log.write_text(log)
+                    raise TeXRunnerException(
+                        "The TeX command failed; see the log at: "+
+                        str(result.path_to_log)
+                    )
+                write_atomically(path_obj_to_cached_log, log.encode())
+            shutil.copyfile(path_obj_to_cached_pdf, path_obj_to_pdf)
+            if path_obj_to_cached_log.exists():
+                shutil.copyfile(path_obj_to_cached_log, result.path_to_log)
+        except Exception as error: # pylint: disable=broad-exception-caught
+            result.error = error
+        return result
+
+    def _run_tex(self, document, path_obj_to_cached_pdf) -> str:
+        """ Run the TeX command on a document in a temporary directory, copy
+        the PDF, if it succeeds, into the cache, and return the log. """
+        # These are only needed to typeset, so import them here.
+        # pylint: disable-next=import-outside-toplevel
+        import subprocess
+        # pylint: disable-next=import-outside-toplevel
+        import tempfile
+        with tempfile.TemporaryDirectory() as path_to_temp_dir:
+            path_obj_to_temp_dir = Path(path_to_temp_dir)
+            path_obj_to_document = path_obj_to_temp_dir/DOCUMENT_FN
+            path_obj_to_document.write_text(document)
+            process = \
+                subprocess.run(
+                    self.tex_command+(DOCUMENT_FN,),
+                    cwd=path_to_temp_dir,
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    timeout=self.timeout,
+                    check=False
+                )
+            path_obj_to_log = path_obj_to_document.with_suffix(LOG_EXTENSION)
+            if path_obj_to_log.exists():
+                log = path_obj_to_log.read_text(errors="replace")
+            else:
+                log = process.stdout.decode(errors="replace")
+            path_obj_to_pdf = path_obj_to_document.with_suffix(PDF_EXTENSION)
+            if (process.returncode == 0) and path_obj_to_pdf.exists():
+                write_atomically(
+                    path_obj_to_cached_pdf,
+                    path_obj_to_pdf.read_bytes()
+                )
+        return log
+
+##################
+# HELPER CLASSES #
+##################
+
+@dataclass
+class TypesetResult:
+    """ The result of typesetting one poem. """
+    source: str|Path
+    path_to_pdf: Path
+    path_to_log: Path
+    cached: bool = False
+    error: Exception|None = None
+
+    @property
+    def ok(self) -> bool:
+        """ Ronseal. """
+        return self.error is None
+
+class TeXRunnerException(Exception):
+    """ A custom exception. """
+
+####################
+# HELPER FUNCTIONS #
+####################
+
+def wrap_in_document(
+        latex,
+        preamble=None,
+        document_class=DEFAULT_DOCUMENT_CLASS
+    ) -> str:
+    """ Wrap some compiled LaTeX in a complete document, with the package
+    code, or another preamble, unless it is one already. """
+    if latex.lstrip().startswith(DOCUMENTCLASS):
+        return latex
+    if preamble is None:
+        preamble = get_package_code()
+    components = [
+        DOCUMENTCLASS+"{"+document_class+"}",
+        preamble.rstrip("\n"),
+        "\\begin{document}",
+        latex.rstrip("\n"),
+        "\\end{document}"
+    ]
+    return "\n\n".join(filter(None, components))+"\n"
+
+def write_atomically(path_obj, data):
+    """ Write a file by way of a temporary file, so that no reader ever sees it
+    half-written. """
+    # pylint: disable-next=import-outside-toplevel
+    import tempfile
+    path_obj.parent.mkdir(parents=True, exist_ok=True)
+    file_descriptor, path_to_temp = \
+        tempfile.mkstemp(dir=path_obj.parent, suffix=".tmp")
+    try:
+        with os.fdopen(file_descriptor, "wb") as temp_file:
+            temp_file.write(data)
+        os.replace(path_to_temp, path_obj)
+    except BaseException:
+        os.unlink(path_to_temp)
+        raise
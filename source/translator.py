@@ -0,0 +1,263 @@
+"""
+This code defines a class which rewrites every HPML token in a given table into
+its equivalent in a single left-to-right pass.
+
+The result is always the same as that of applying str.replace() for each entry
+in the table in turn. Where the table makes that order matter for a given line
+- e.g. where the output of one entry could complete the code for a later entry
+- the translator spots it, and falls back to replacing entry by entry.
+"""
+
+# Standard imports.
+from functools import cache
+from pathlib import Path
+import hashlib
+import os
+import pickle
+import re
+
+# Local imports.
+from .lookups import SEMANTICS, SYNTACTICS, FRACTIONS
+from .utils import get_lookups_fingerprint, get_path_obj_to_cache_dir
+
+# Local constants.
+PRECOMPILED_FN = "translators.pickle"
+PRECOMPILED_VERSION = 1
+LATEX_SEMANTICS_IN_ORDER = (
+    "tab",
+    "marginnote",
+    "place",
+    "person",
+    "publication",
+    "ship",
+    "foreign",
+    FRACTIONS,
+    "add",
+    "stress",
+    "flagverse",
+    "sub",
+    "footnote",
+    "blfootnote",
+    "whitespace"
+)
+
+##############
+# MAIN CLASS #
+##############
+
+class Translator:
+    """ The class in question. """
+    def __init__(self, pairs):
+        self.pairs = []
+        self.lookup = {}
+        for old, new in pairs:
+            if old and (old not in self.lookup):
+                self.pairs.append((old, new))
+                self.lookup[old] = new
+        self.pattern = compile_alternation(old for old, _ in self.pairs)
+        hazards, self.left_risks, self.right_risks = find_hazards(self.pairs)
+        self.hazard_pattern = compile_alternation(sorted(hazards))
+        self.reach = max((len(old) for old, _ in self.pairs), default=0)
+
+    def translate(self, string, counts=None):
+        """ Rewrite every token in a given string. If a counter is given, count
+        how many times each token is replaced. """
+        if not self.pattern:
+            return string
+        if self.is_order_dependent(string):
+            return self.translate_sequentially(string, counts)
+        if counts is None:
+            return self.pattern.sub(self._get_replacement, string)
+        def get_replacement_and_count(match):
+            token = match.group()
+            counts[token] += 1
+            return self.lookup[token]
+        return self.pattern.sub(get_replacement_and_count, string)
+
+    def translate_sequentially(self, string, counts=None):
+        """ Rewrite every token in a given string, one entry at a time. """
+        for old, new in self.pairs:
+            if (counts is not None) and (old in string):
+                counts[old] += string.count(old)
+            string = string.replace(old, new)
+        return string
+
+    def is_order_dependent(self, string):
+        """ Determine whether the order in which the entries are applied could
+        make a difference to this particular string. """
+        if self.hazard_pattern and self.hazard_pattern.search(string):
+            return True
+        if not (self.left_risks and self.right_risks):
+            return False
+        previous_end = None
+        for match in self.pattern.finditer(string):
+            token = match.group()
+            if (
+                (previous_end is not None) and
+                (token in self.left_risks) and
+                (match.start()-previous_end <= self.reach-2)
+            ):
+                return True
+            if token in self.right_risks:
+                previous_end = match.end()
+        return False
+
+    def _get_replacement(self, match):
+        """ Look up the replacement for a given match. """
+        return self.lookup[match.group()]
+
+####################
+# HELPER FUNCTIONS #
+####################
+
+def compile_alternation(literals):
+    """ Compile a regex which matches any of the given literals, trying them in
+    the order given. """
+    result = "|".join(re.escape(literal) for literal in literals)
+    if not result:
+        return None
+    return re.compile(result)
+
+def get_overlaps(left, right):
+    """ Return the length of each proper suffix of the left string which is
+    also a proper prefix of the right. """
+    result = []
+    for length in range(1, min(len(left), len(right))):
+        if left.endswith(right[:length]):
+            result.append(length)
+    return result
+
+def find_hazards(pairs):
+    """ Find (1) the literals which, if present in a string, mean that the
+    order in which the pairs are applied could matter, (2) those tokens whose
+    output could complete a later token with what lies to its left, and (3)
+    those which could do so with what lies to its right. """
+    hazards = set()
+    left_risks = set()
+    right_risks = set()
+    for index, (earlier, new) in enumerate(pairs):
+        for later, _ in pairs[index+1:]:
+            # An earlier token could break up a later one.
+            if later.find(earlier, 1) != -1:
+                hazards.add(later)
+            for length in get_overlaps(later, earlier):
+                hazards.add(later[:-length]+earlier)
+            # An earlier token's output could form part of a later one.
+            if later in new:
+                hazards.add(earlier)
+            for length in get_overlaps(later, new):
+                hazards.add(later[:-length]+earlier)
+                left_risks.add(earlier)
+            for length in get_overlaps(new, later):
+                hazards.add(earlier+later[length:])
+                right_risks.add(earlier)
+            start = later.find(new)
+            while start != -1:
+                end = start+len(new)
+                hazards.add(later[:start]+earlier+later[end:])
+                if start > 0:
+                    left_risks.add(earlier)
+                if end < len(later):
+                    right_risks.add(earlier)
+                if not new:
+                    break
+                start = later.find(new, start+1)
+            if not new:
+                left_risks.add(earlier)
+                right_risks.add(earlier)
+                for split in range(1, len(later)):
+                    hazards.add(later[:split]+earlier+later[split:])
+    return hazards, left_risks, right_risks
+
+def get_latex_pairs():
+    """ Return the (HPML, LaTeX) pairs, in the order in which they have always
+    been applied. """
+    result = [(hpml, value.latex) for hpml, value in SYNTACTICS.items()]
+    for item in LATEX_SEMANTICS_IN_ORDER:
+        if item is FRACTIONS:
+            result += [(hpml, value.latex) for hpml, value in item.items()]
+        else:
+            semantic_obj = getattr(SEMANTICS, item)
+            result.append((semantic_obj.hpml, semantic_obj.latex))
+    return result
+
+def get_plain_pairs():
+    """ Return the (HPML, plain text) pairs used by the centerer. """
+    result = [(hpml, value.plain) for hpml, value in SYNTACTICS.items()]
+    result += [(hpml, value.plain) for hpml, value in FRACTIONS.items()]
+    return result
+
+@cache
+def get_bundled_translators() -> tuple[Translator, Translator]:
+    """ Return the LaTeX and plain text translators for the bundled lookups,
+    building them on first use. """
+    result = \
+        load_or_build_translators(
+            get_lookups_fingerprint(),
+            get_latex_pairs(),
+            get_plain_pairs()
+        )
+    return result
+
+def load_or_build_translators(
+        fingerprint,
+        latex_pairs,
+        plain_pairs,
+        filename=PRECOMPILED_FN
+    ) -> tuple[Translator, Translator]:
+    """ Return a LaTeX and a plain text translator for a given pair of tables.
+    Finding the hazards in the tables is the slowest part of starting up, so
+    the finished translators are pickled to the cache directory, and loaded
+    from there for as long as neither the tables' fingerprint, nor the code
+    which built them, changes. """
+    path_obj = get_path_obj_to_cache_dir()/filename
+    try:
+        with open(path_obj, "rb") as precompiled_file:
+            precompiled = pickle.load(precompiled_file)
+        if (
+            (precompiled["version"] == PRECOMPILED_VERSION) and
+            (precompiled["code"] == get_code_fingerprint()) and
+            (precompiled["lookups"] == fingerprint)
+        ):
+            return precompiled["translators"]
+    except Exception: # pylint: disable=broad-exception-caught
+        pass
+    result = (Translator(latex_pairs), Translator(plain_pairs))
+    precompiled = {
+        "version": PRECOMPILED_VERSION,
+        "code": get_code_fingerprint(),
+        "lookups": fingerprint,
+        "translators": result
+    }
+    path_obj_to_temp = path_obj.with_name(path_obj.name+"."+str(os.getpid()))
+    try:
+        path_obj.parent.mkdir(parents=True, exist_ok=True)
+        with open(path_obj_to_temp, "wb") as precompiled_file:
+            pickle.dump(precompiled, precompiled_file)
+        os.replace(path_obj_to_temp, path_obj)
+    except OSError:
+        path_obj_to_temp.unlink(missing_ok=True)
+    return result
+
+@cache
+def get_code_fingerprint() -> str:
+    """ Hash this module's source, so that a pickle built by older code is
+    never loaded. """
+    return hashlib.sha256(Path(__file__).read_bytes()).hexdigest()
+
+def get_latex_translator() -> Translator:
+    """ Ronseal. """
+    return get_bundled_translators()[0]
+
+def get_plain_translator() -> Translator:
+    """ Ronseal. """
+    return get_bundled_translators()[1]
+
+def __getattr__(name):
+    """ Keep the translators available as constants, without building them
+    at import. """
+    if name == "LATEX_TRANSLATOR":
+        return get_latex_translator()
+    if name == "PLAIN_TRANSLATOR":
+        return get_plain_translator()
+    raise AttributeError("module "+__name__+" has no attribute "+name)
@@ -3,46 +3,53 @@ This code defines some utility functions used across the package.
 """
 
 # Standard imports.
-import json
+import hashlib
+import os
 import re
 import shutil
 import warnings
 from pathlib import Path
-from types import SimpleNamespace
 
 # Local constants.
 PATH_OBJ_TO_DATA = Path(__file__).parent/"data"
 PATH_TO_SYNTACTICS = str((PATH_OBJ_TO_DATA/"syntactics.json").resolve())
 PATH_TO_SEMANTICS = str((PATH_OBJ_TO_DATA/"semantics.json").resolve())
+PATH_TO_GLYPH_WIDTHS = \
+    str((PATH_OBJ_TO_DATA/"glyph_widths.json").resolve())
 PATH_OBJ_TO_GTKSOURCEVIEW = Path("/usr")/"share"/"gtksourceview-4"
 PATH_TO_HPML_LANG_SRC = str((PATH_OBJ_TO_DATA/"hpml.lang").resolve())
 PATH_OBJ_TO_HPML_LANG_DST = \
     PATH_OBJ_TO_GTKSOURCEVIEW/"language-specs"/"hpml.lang"
 PATH_TO_HPML_LANG_DST = str(PATH_OBJ_TO_HPML_LANG_DST.resolve())
+CACHE_DIR_ENV_VAR = "HPML_CACHE_DIR"
 HPML_EXTENSION = ".hpml"
+LEADING_OR_TRAILING_SPACES = re.compile("^ +| +$", re.MULTILINE)
+REPEATED_SPACES = re.compile("  +")
+REPEATED_BLANK_LINES = re.compile("\n{3,}")
 TEX_EXTENSION = ".tex"
 
 #############
 # FUNCTIONS #
 #############
 
-def get_syntactics():
-    """ Return a dictionary of the HPML syntactic commands. """
-    with open(PATH_TO_SYNTACTICS, "r") as syntactics_file:
-        syntactics_str = syntactics_file.read()
-    syntactics_dict = json.loads(syntactics_str)
-    result = {}
-    for key, value in syntactics_dict.items():
-        result[key] = SimpleNamespace(**value)
-    return result
+def get_lookups_fingerprint():
+    """ Hash the data files from which the lookups are built, so that anything
+    derived from them can tell when they change. """
+    hasher = hashlib.sha256()
+    paths = (PATH_TO_SEMANTICS, PATH_TO_SYNTACTICS, PATH_TO_GLYPH_WIDTHS)
+    for path in paths:
+        with open(path, "rb") as data_file:
+            hasher.update(data_file.read())
+    return hasher.hexdigest()
 
-def get_semantics():
-    """ Return an object of the HPML semantic commands. """
-    with open(PATH_TO_SEMANTICS, "r") as semantics_file:
-        semantics_str = semantics_file.read()
-    result = \
-        json.loads(semantics_str, object_hook=lambda d: SimpleNamespace(**d))
-    return result
+def get_path_obj_to_cache_dir():
+    """ Get the directory in which precompiled data can be kept between
+    runs. """
+    if os.environ.get(CACHE_DIR_ENV_VAR):
+        return Path(os.environ[CACHE_DIR_ENV_VAR])
+    if os.environ.get("XDG_CACHE_HOME"):
+        return Path(os.environ["XDG_CACHE_HOME"])/"hpml"
+    return Path.home()/".cache"/"hpml"
 
 def install_hpml_lang():
     """ Install the HPML language features in Gedit. """
@@ -60,38 +67,24 @@ def install_hpml_lang():
 def trim_whitespace(line):
     """ Remove (1) whitespace from the front, (2) and from the back, and (3)
     any double, triple, etc spaces. """
-    line = re.sub("^ *", "", line)
-    line = re.sub(" *$", "", line)
-    while "  " in line:
-        line = line.replace("  ", " ")
-    return line
+    return normalise_whitespace(line)
+
+def normalise_whitespace(text):
+    """ Trim the whitespace, as above, from every line of a string at once. """
+    text = LEADING_OR_TRAILING_SPACES.sub("", text)
+    return REPEATED_SPACES.sub(" ", text)
 
 def trim_blank_lines(lines):
     """ Trim any leading or trailing blank lines, and any double, triple, etc
     blank lines, from a list of lines. """
-    result = []
-    last_index = len(lines)-1
-    prev = None
-    for index, line in enumerate(lines):
-        if (
-            (line != "") or
-            ((prev is not None) and (prev != "") and (index != last_index))
-        ):
-            result.append(line)
-        prev = line
-    return result
+    text = normalise_blank_lines("\n".join(lines))
+    if not text:
+        return []
+    return text.split("\n")
 
-def remove_command_with_argument(command, line):
-    """ Purge anything of the form #COMMAND{argument}. """
-    regex_pattern = command+".*}"
-    result = re.sub(regex_pattern, "", line)
-    return result
-
-def remove_commands_keep_arguments(line):
-    """ Remove each #COMMAND, ##COMMAND, etc. """
-    for regex_pattern in ("###\\w*", "##\\w*", "#\\w*"):
-        result = re.sub(regex_pattern, "", line)
-    return result
+def normalise_blank_lines(text):
+    """ Trim the blank lines, as above, from a string at once. """
+    return REPEATED_BLANK_LINES.sub("\n\n", text).strip("\n")
 
 def get_package_code():
     """ Get the LaTeX string in which all the packages necessary for HPML are
@@ -0,0 +1,109 @@
+"""
+This code defines a class which watches a directory tree of HPML files, and
+recompiles each one whose content changes.
+"""
+
+# Standard imports.
+from pathlib import Path
+import hashlib
+import time
+import warnings
+
+# Local imports.
+from .hpml_compiler import HPMLCompiler
+from .utils import HPML_EXTENSION, TEX_EXTENSION
+
+# Local constants.
+DEFAULT_INTERVAL = 0.5
+DEFAULT_DEBOUNCE = 0.2
+
+##############
+# MAIN CLASS #
+##############
+
+class Watcher:
+    """ The class in question. """
+    def __init__(
+            self,
+            path_to_root,
+            interval=DEFAULT_INTERVAL,
+            debounce=DEFAULT_DEBOUNCE,
+            on_compile=None,
+            **options
+        ):
+        self.path_obj_to_root = Path(path_to_root)
+        self.interval = interval
+        self.debounce = debounce
+        self.on_compile = on_compile
+        self.options = options
+        self._stats = {}
+        self._pending = {}
+        self._hashes = {}
+
+    def scan(self, now=None) -> list[str]:
+        """ Check every file once, recompiling those which have changed and
+        settled, and return the paths to the files recompiled. """
+        if now is None:
+            now = time.monotonic()
+        seen = set()
+        for path_obj in self.path_obj_to_root.rglob("*"+HPML_EXTENSION):
+            path = str(path_obj)
+            seen.add(path)
+            try:
+                stat = path_obj.stat()
+            except FileNotFoundError:
+                continue
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if self._stats.get(path) != signature:
+                self._stats[path] = signature
+                self._pending[path] = now
+        for path in set(self._stats)-seen:
+            self._forget(path)
+        result = []
+        for path, changed_at in list(self._pending.items()):
+            if now-changed_at >= self.debounce:
+                self._pending.pop(path)
+                if self._compile_if_changed(path):
+                    result.append(path)
+        return result
+
+    def watch(self, stop_event=None):
+        """ Scan repeatedly until stopped. """
+        while not (stop_event and stop_event.is_set()):
+            self.scan()
+            time.sleep(self.interval)
+
+    def _forget(self, path):
+        """ Stop tracking a file which no longer exists. """
+        self._stats.pop(path, None)
+        self._pending.pop(path, None)
+        self._hashes.pop(path, None)
+
+    def _compile_if_changed(self, path) -> bool:
+        """ Recompile a given file if its content has changed since it was last
+        compiled. """
+        try:
+            with open(path, "rb") as hpml_file:
+                content = hpml_file.read()
+        except FileNotFoundError:
+            self._forget(path)
+            return False
+        content_hash = hashlib.sha256(content).hexdigest()
+        if self._hashes.get(path) == content_hash:
+            return False
+        self._hashes[path] = content_hash
+        try:
+            compiler = \
+                HPMLCompiler(
+                    input_string=content.decode(),
+                    path_to_output_file=Path(path).with_suffix(TEX_EXTENSION),
+                    **self.options
+                )
+            compiler.compile()
+            compiler.save_to_file()
+        except Exception as error: # pylint: disable=broad-exception-caught
+            warnings.warn("Failed to compile "+path+": "+str(error))
+            return False
+        if self.on_compile:
+            self.on_compile(path)
+        return True
@@ -0,0 +1,21 @@
+"""
+This code defines the fixtures shared by every test.
+"""
+
+# Non-standard imports.
+import pytest
+
+# Source imports.
+from source.utils import CACHE_DIR_ENV_VAR
+
+############
+# FIXTURES #
+############
+
+@pytest.fixture(autouse=True)
+def isolate_cache_dir(tmp_path_factory, monkeypatch):
+    """ Point the cache directory at a temporary one, so that no test writes to
+    the real cache. """
+    path_obj_to_cache_dir = tmp_path_factory.mktemp("cache")
+    monkeypatch.setenv(CACHE_DIR_ENV_VAR, str(path_obj_to_cache_dir))
+    return path_obj_to_cache_dir
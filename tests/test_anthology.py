@@ -0,0 +1,117 @@
+"""
+This code defines the functions which test the Anthology class.
+"""
+
+# Standard imports.
+from pathlib import Path
+
+# Source imports.
+from source.anthology import Anthology
+from source.hpml_compiler import HPMLCompiler
+from source.utils import get_package_code
+
+# Local constants.
+PATH_OBJ_TO_DATA = Path(__file__).parent/"data"
+
+###########
+# TESTING #
+###########
+
+def test_anthology():
+    """ Test that each poem is compiled as it would be on its own, with its
+    own title and options, and that the results are stitched together in
+    order. """
+    urn = (PATH_OBJ_TO_DATA/"ode_on_a_grecian_urn.hpml").read_text()
+    australia = (PATH_OBJ_TO_DATA/"south_australia.hpml").read_text()
+    hpml = (
+        "###POEM{Ode on a Grecian Urn}\n"+urn+"\n"+
+        "###POEM\n"+
+        "###OPTIONS{line_numbers=5, auto_center=false}\n"+
+        australia
+    )
+    anthology = Anthology(input_string=hpml, jobs=2)
+    output = anthology.compile()
+    expected_urn = HPMLCompiler(input_string=urn).compile()
+    expected_australia = \
+        HPMLCompiler(
+            input_string=australia,
+            line_numbers=5,
+            auto_center=False
+        ).compile()
+    assert output == "\n\n".join([
+        get_package_code().rstrip("\n"),
+        "\\poemtitle{Ode on a Grecian Urn}\n"+expected_urn,
+        expected_australia
+    ])
+
+def test_mapped_anthology(tmp_path):
+    """ Test that an anthology given as a file is compiled just as it would be
+    if given as a string. """
+    urn = (PATH_OBJ_TO_DATA/"ode_on_a_grecian_urn.hpml").read_text()
+    hpml = (
+        "\n###POEM{Ode}\n###OPTIONS{line_numbers=5}\n"+urn+"\n"+
+        "###POEM\n"+urn+"\n"
+    )
+    path_obj = tmp_path/"anthology.hpml"
+    path_obj.write_text(hpml)
+    anthology = Anthology(path_to_input_file=str(path_obj), jobs=2)
+    poems = list(anthology.iter_poems())
+    assert [poem.options for poem in poems] == [{"line_numbers": 5}, {}]
+    assert [poem.source.read() for poem in poems] == [urn]*2
+    anthology.compile()
+    expected = Anthology(input_string=hpml, jobs=1).compile()
+    assert anthology.output_string == expected
+
+def test_poem_like_a_path(tmp_path, monkeypatch):
+    """ Test that a poem which looks like a path is compiled as a poem. """
+    monkeypatch.chdir(tmp_path)
+    (tmp_path/"notes.hpml").write_text("Something else entirely")
+    anthology = \
+        Anthology(
+            input_string="###POEM\nSee notes.hpml",
+            include_preamble=False,
+            jobs=1
+        )
+    expected = HPMLCompiler(input_string="See notes.hpml").compile()
+    assert anthology.compile() == expected
+
+def test_empty_poems():
+    """ Test that a poem which is nothing but blank lines is left out, whether
+    it comes at the end of the file or in the middle. """
+    foo = "\\poemtitle{A}\n"+HPMLCompiler(input_string="foo").compile()
+    bar = "\\poemtitle{C}\n"+HPMLCompiler(input_string="bar").compile()
+    cases = (
+        ("###POEM{A}\nfoo\n###POEM{B}\n\n", [foo]),
+        ("###POEM{A}\nfoo\n###POEM{B}\n  \n\n###POEM{C}\nbar", [foo, bar])
+    )
+    for hpml, blocks in cases:
+        anthology = \
+            Anthology(input_string=hpml, include_preamble=False, jobs=1)
+        assert anthology.compile() == "\n\n".join(blocks)
+
+def test_mapped_empty_poems(tmp_path):
+    """ Test that a mapped file is split into the same poems as a string,
+    when some poems are nothing but blank lines, or options. """
+    cases = (
+        "###POEM{A}\nfoo\n###POEM{B}\n\n",
+        "###POEM{A}\nfoo\n###POEM{B}\n",
+        "###POEM{A}\nfoo\n###POEM{B}",
+        "###POEM{A}\nfoo\n###POEM{B}\n  \n\n###POEM{C}\nbar",
+        "###POEM{A}\n###OPTIONS{line_numbers=5}\n \n###POEM{C}\nbar\n",
+        "\n \n###POEM{A}\n\n\nfoo\n\n"
+    )
+    path_obj = tmp_path/"anthology.hpml"
+    for hpml in cases:
+        path_obj.write_text(hpml)
+        # The string keeps the line break at the end of the file.
+        expected = [
+            (poem.title, poem.options, poem.hpml.removesuffix("\n"))
+            for poem in Anthology(input_string=hpml).iter_poems()
+        ]
+        anthology = Anthology(path_to_input_file=str(path_obj))
+        actual = [
+            (poem.title, poem.options, poem.source.read())
+            for poem in anthology.iter_poems()
+        ]
+        assert actual == expected
+        assert all(poem_hpml.strip() for _, _, poem_hpml in actual)
@@ -0,0 +1,77 @@
+"""
+This code defines the functions which test the asynchronous compile API.
+"""
+
+# Standard imports.
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import asyncio
+import shutil
+import subprocess
+import sys
+
+# Source imports.
+from source.asynchronous import (
+    AsyncCompiler,
+    compile_async,
+    compile_file_async
+)
+from source.hpml_compiler import HPMLCompiler
+
+# Local constants.
+PATH_OBJ_TO_DATA = Path(__file__).parent/"data"
+
+###########
+# TESTING #
+###########
+
+def test_compile_async():
+    """ Test that compiling asynchronously, in threads or in processes, gives
+    the same output as compiling synchronously. """
+    hpml = "First line\n#PLACE{Rome}"
+    expected = HPMLCompiler(input_string=hpml, line_numbers=5).compile()
+    assert asyncio.run(compile_async(hpml, line_numbers=5)) == expected
+
+    async def compile_many(compiler):
+        jobs = (compiler.compile(hpml, line_numbers=5) for _ in range(10))
+        return await asyncio.gather(*jobs)
+
+    compiler = AsyncCompiler(max_concurrency=2)
+    assert asyncio.run(compile_many(compiler)) == [expected]*10
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        compiler = AsyncCompiler(executor=executor)
+        assert asyncio.run(compile_many(compiler)) == [expected]*10
+
+def test_compile_file_async(tmp_path):
+    """ Test that a file is read, compiled and saved. """
+    path_to_hpml = tmp_path/"south_australia.hpml"
+    shutil.copy(PATH_OBJ_TO_DATA/"south_australia.hpml", path_to_hpml)
+    expected = HPMLCompiler(path_to_input_file=str(path_to_hpml))
+    expected.compile()
+    out_path = asyncio.run(compile_file_async(path_to_hpml))
+    assert out_path == tmp_path/"south_australia.tex"
+    assert out_path.read_text() == expected.output_string
+    out_path = tmp_path/"elsewhere.tex"
+    assert asyncio.run(compile_file_async(path_to_hpml, out_path)) == out_path
+    assert out_path.read_text() == expected.output_string
+
+def test_lazy_import():
+    """ Test that importing the package doesn't import asyncio, or any of the
+    other slow modules, but that everything they define is still to be found
+    on it. """
+    script = (
+        "import sys, source\n"
+        "slow = ('asyncio', 'concurrent.futures', 'mmap', 'subprocess')\n"
+        "assert not [name for name in slow if name in sys.modules]\n"
+        "for module in source.LAZY_NAMES.values():\n"
+        "    assert 'source.'+module not in sys.modules\n"
+        "for name in source.LAZY_NAMES:\n"
+        "    assert getattr(source, name) is not None\n"
+        "assert 'asyncio' in sys.modules\n"
+    )
+    path_obj_to_root = Path(__file__).parent.parent
+    subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=path_obj_to_root,
+        check=True
+    )
@@ -0,0 +1,74 @@
+"""
+This code defines the functions which test the batch compilation function.
+"""
+
+# Standard imports.
+from pathlib import Path
+
+# Source imports.
+from source import batch
+from source.batch import compile_many
+from source.corpus_reader import CorpusReader
+from source.hpml_compiler import HPMLCompiler, HPMLCompilerException
+
+# Local constants.
+PATH_OBJ_TO_DATA = Path(__file__).parent/"data"
+
+###########
+# TESTING #
+###########
+
+def test_compile_many():
+    """ Test that a batch gives the same results as compiling each item on its
+    own, in the order given, with errors reported per item. """
+    path_to_hpml = PATH_OBJ_TO_DATA/"south_australia.hpml"
+    strings = ["First line\nSecond line", "", "#PLACE{Rome}"]
+    results = compile_many([path_to_hpml]+strings, jobs=2, save=False)
+    assert [result.ok for result in results] == [True, True, False, True]
+    expected = HPMLCompiler(path_to_input_file=str(path_to_hpml))
+    expected.compile()
+    assert results[0].output_string == expected.output_string
+    assert results[0].path_to_output_file is None
+    expected = HPMLCompiler(input_string=strings[0])
+    expected.compile()
+    assert results[1].output_string == expected.output_string
+    assert isinstance(results[2].error, HPMLCompilerException)
+
+def test_string_ending_in_extension(tmp_path, monkeypatch):
+    """ Test that a one-line string ending in ".hpml" is compiled as HPML, not
+    opened as a file, even if a file of that name exists. """
+    monkeypatch.chdir(tmp_path)
+    (tmp_path/"notes.hpml").write_text("Something else entirely")
+    results = compile_many(["See notes.hpml"], jobs=1, save=False)
+    expected = HPMLCompiler(input_string="See notes.hpml").compile()
+    assert results[0].output_string == expected
+
+def test_slices_share_a_reader(tmp_path, monkeypatch):
+    """ Test that many slices of one file are read through a single reader,
+    which is closed once the batch is done. """
+    words = ("First", "Second", "Third")
+    text = "\n\n".join(words)
+    path_obj = tmp_path/"corpus.hpml"
+    path_obj.write_text(text)
+    reader = CorpusReader(path_obj)
+    slices = [
+        reader.make_slice(text.index(word), text.index(word)+len(word))
+        for word in words
+    ]
+    reader.close()
+    events = []
+    class CountingReader(CorpusReader):
+        """ Records when each reader maps and unmaps the file. """
+        def open(self):
+            events.append("open")
+            super().open()
+        def close(self):
+            events.append("close")
+            super().close()
+    monkeypatch.setattr(batch, "CorpusReader", CountingReader)
+    results = compile_many(slices, jobs=1, save=False)
+    expected = [HPMLCompiler(input_string=word).compile() for word in words]
+    assert [result.output_string for result in results] == expected
+    assert events[0] == "open"
+    assert events[-1] == "close"
+    assert events.count("close") == 1
@@ -0,0 +1,49 @@
+"""
+This code defines the functions which test the benchmark suite.
+"""
+
+# Standard imports.
+import json
+
+# Non-standard imports.
+import pytest
+
+# Source imports.
+from benchmarks.corpus import CorpusSpec, generate_hpml
+from benchmarks.suite import STAGES, compare_results, run_suite
+from source.hpml_compiler import HPMLCompiler
+
+###########
+# TESTING #
+###########
+
+def test_generate_hpml():
+    """ Test that the generator is deterministic, and honours its knobs. """
+    spec = CorpusSpec(stanza_count=5, command_density={"add": 1.0})
+    hpml = generate_hpml(spec)
+    assert hpml == generate_hpml(spec)
+    lines = [line for line in hpml.split("\n") if line and "###" not in line]
+    assert len(lines) == spec.get_line_count()
+    assert all("#ADD" in line for line in lines)
+    plain = \
+        CorpusSpec(
+            stanza_count=5,
+            command_density={},
+            chorus_frequency=0,
+            minichorus_frequency=0,
+            fraction_usage=0
+        )
+    assert "#" not in generate_hpml(plain)
+    HPMLCompiler(input_string=hpml).compile()
+    with pytest.raises(ValueError):
+        CorpusSpec(command_density={"chorus": 1.0})
+
+def test_run_suite():
+    """ Test that every benchmark runs, and that the results can be saved and
+    compared. """
+    results = run_suite(CorpusSpec(stanza_count=3), repeat=1)
+    names = [item["name"] for item in results["results"]]
+    assert len(names) == 3+len(STAGES)
+    assert all(item["lines_per_second"] > 0 for item in results["results"])
+    results = json.loads(json.dumps(results))
+    assert set(compare_results(results, results).values()) == {1.0}
@@ -0,0 +1,59 @@
+"""
+This code defines the functions which test the Builder class and the "hpml
+build" command.
+"""
+
+# Source imports.
+from source.builder import Builder
+from source.cli import run_cli
+from source.registry import CommandRegistry
+
+###########
+# TESTING #
+###########
+
+def test_builder(tmp_path):
+    """ Test that only stale outputs are rebuilt, and that orphaned outputs are
+    removed. """
+    path_obj_to_first = tmp_path/"first.hpml"
+    path_obj_to_second = tmp_path/"sub"/"second.hpml"
+    path_obj_to_second.parent.mkdir()
+    path_obj_to_first.write_text("First poem")
+    path_obj_to_second.write_text("Second poem")
+    report = Builder(tmp_path, jobs=1).build()
+    assert len(report.compiled) == 2
+    assert path_obj_to_second.with_suffix(".tex").exists()
+    report = Builder(tmp_path, jobs=1).build()
+    assert (len(report.compiled), len(report.skipped)) == (0, 2)
+    report = Builder(tmp_path, jobs=1, is_prose_poem=True).build()
+    assert len(report.compiled) == 2
+    path_obj_to_first.write_text("First poem, revised")
+    path_obj_to_second.unlink()
+    report = Builder(tmp_path, jobs=1, is_prose_poem=True).build()
+    assert report.compiled == [str(path_obj_to_first)]
+    assert report.removed == [str(path_obj_to_second.with_suffix(".tex"))]
+    assert not path_obj_to_second.with_suffix(".tex").exists()
+
+def test_builder_with_registry(tmp_path):
+    """ Test that a build with a registry is skipped when nothing has changed,
+    and redone when the registry's definitions change. """
+    (tmp_path/"poem.hpml").write_text("C#OEur")
+    registry = CommandRegistry()
+    registry.add_syntactic("#OE", "\\oe{}")
+    report = Builder(tmp_path, jobs=1, registry=registry).build()
+    assert len(report.compiled) == 1
+    registry = CommandRegistry()
+    registry.add_syntactic("#OE", "\\oe{}")
+    report = Builder(tmp_path, jobs=1, registry=registry).build()
+    assert (len(report.compiled), len(report.skipped)) == (0, 1)
+    registry.add_syntactic("#AE", "\\ae{}")
+    report = Builder(tmp_path, jobs=1, registry=registry).build()
+    assert len(report.compiled) == 1
+
+def test_cli_build(tmp_path, capsys):
+    """ Test the build subcommand. """
+    (tmp_path/"poem.hpml").write_text("A poem")
+    assert run_cli(["build", str(tmp_path), "-j", "1"]) == 0
+    assert "Compiled 1," in capsys.readouterr().out
+    assert run_cli(["build", str(tmp_path)]) == 0
+    assert "Compiled 0, skipped 1," in capsys.readouterr().out
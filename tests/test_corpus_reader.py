@@ -0,0 +1,46 @@
+"""
+This code defines the functions which test the CorpusReader class.
+"""
+
+# Standard imports.
+import pickle
+import re
+
+# Source imports.
+from source.corpus_reader import CorpusReader, CorpusSlice
+
+###########
+# TESTING #
+###########
+
+def test_corpus_reader(tmp_path):
+    """ Test that content and lines are found by their byte ranges, and that
+    slices are read as if the lines had been split and joined again. """
+    path_obj = tmp_path/"corpus.hpml"
+    data = \
+        "First líne\r\nSecond line\r\n  \r\n\r\nThird line\nCUT\nFourth\n".\
+            encode()
+    path_obj.write_bytes(data)
+    start = data.index(b"Third")
+    with CorpusReader(path_obj) as reader:
+        assert reader.decode(0, data.index(b"  ")) == \
+            "First líne\nSecond line\n"
+        assert reader.find_content(data.index(b"\r\n  ")+2) == start
+        end = reader.trim_line_break(start, len(reader))
+        cuts = list(reader.find_lines(re.compile(b"^CUT$", re.MULTILINE)))
+        assert reader.decode(*cuts[0]) == "CUT"
+        corpus_slice = reader.make_slice(start, end, cuts)
+        assert reader.make_slice(start, end).read(reader) == \
+            "Third line\nCUT\nFourth"
+        assert corpus_slice.read(reader) == "Third line\nFourth"
+    assert corpus_slice.read() == "Third line\nFourth"
+    assert len(pickle.dumps(corpus_slice)) < 200
+    assert CorpusSlice(str(path_obj), ()).read() == ""
+
+def test_empty_file(tmp_path):
+    """ Test that an empty file, which can't be mapped, is read as empty. """
+    path_obj = tmp_path/"empty.hpml"
+    path_obj.write_text("")
+    with CorpusReader(path_obj) as reader:
+        assert len(reader) == 0
+        assert reader.find_content() == -1
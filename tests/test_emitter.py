@@ -0,0 +1,77 @@
+"""
+This code defines the functions which test the rendering of plain text and HTML.
+"""
+
+# Source imports.
+from source.emitter import emit_document
+from source.hpml_compiler import HPMLCompiler
+from source.parser import MAX_NESTING_DEPTH, parse_document
+
+# Local constants.
+HPML = (
+    "###EPIGRAPH{An #ITAL{epigraph}}\n"+
+    "To #PLACE{Rome} #ADD #PERSON{Caesar}#FOOTNOTE{A man.}\n"+
+    "##TAB #STRESS{e}st <b> #EACUTE #HALF\n"+
+    "\n"+
+    "###CHORUS\n"+
+    "Sung by #SHIP{Argo}\n"+
+    "##MINIINSCRIPTION #FOREIGN{Bon voyage}"
+)
+
+###########
+# TESTING #
+###########
+
+def test_emit_plain():
+    """ Test that plain text keeps the verse, and leaves out the notes. """
+    plain = emit_document(parse_document(HPML), ["plain"])["plain"]
+    assert plain == (
+        "An epigraph\n"+
+        "\n"+
+        "To Rome and Caesar\n"+
+        "     est <b> e half\n"+
+        "\n"+
+        "Sung by Argo\n"+
+        "Bon voyage"
+    )
+
+def test_emit_html():
+    """ Test that HTML marks up each semantic command with a span. """
+    html = emit_document(parse_document(HPML), ["html"])["html"]
+    assert html == (
+        "<div class=\"poem\">\n"+
+        "<p class=\"epigraph\"><i>An <i>epigraph</i></i></p>\n"+
+        "<p class=\"stanza\">\n"+
+        "To <span class=\"place\">Rome</span> &amp; "+
+        "<span class=\"person\">Caesar</span>"+
+        "<span class=\"footnote\">A man.</span><br>\n"+
+        "&emsp;&emsp; ést &lt;b&gt; é ½\n"+
+        "</p>\n"+
+        "<p class=\"stanza\">\n"+
+        "<span class=\"chorus\">Sung by <span class=\"ship\">Argo</span>"+
+        "</span><br>\n"+
+        "<span class=\"chorus\"><span class=\"miniinscription\">"+
+        "<span class=\"foreign\">Bon voyage</span></span></span>\n"+
+        "</p>\n"+
+        "</div>"
+    )
+
+def test_compile_targets():
+    """ Test that the compiler emits every target asked for, and that the
+    LaTeX is unchanged. """
+    compiler = HPMLCompiler(input_string=HPML, targets=["latex", "plain"])
+    compiler.compile()
+    assert set(compiler.outputs) == {"latex", "plain"}
+    assert compiler.outputs["latex"] == compiler.output_string
+    assert compiler.output_string == HPMLCompiler(input_string=HPML).compile()
+
+def test_deep_nesting():
+    """ Test that a long run of unclosed commands is rendered, as far as it is
+    nested too deeply, as text, without exhausting the stack. """
+    hpml = "#ITAL{"*600+"x"
+    compiler = HPMLCompiler(input_string=hpml, targets=["plain", "html"])
+    compiler.compile()
+    assert compiler.outputs["plain"] == "#ITAL"*(600-MAX_NESTING_DEPTH-1)+"x"
+    assert compiler.outputs["html"].count("<i>") == MAX_NESTING_DEPTH
+    nested = "#ITAL{"*10+"x"+"}"*10
+    assert emit_document(parse_document(nested), ["plain"])["plain"] == "x"
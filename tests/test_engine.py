@@ -0,0 +1,59 @@
+"""
+This code defines the functions which test the HPMLEngine class.
+"""
+
+# Standard imports.
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Non-standard imports.
+import pytest
+
+# Source imports.
+from source.cache import CompileCache
+from source.engine import HPMLEngine, HPMLEngineException
+from source.hpml_compiler import HPMLCompiler
+from source.stats import CompileStats
+
+# Local constants.
+PATH_OBJ_TO_DATA = Path(__file__).parent/"data"
+POEMS = ("ode_on_a_grecian_urn.hpml", "south_australia.hpml")
+
+###########
+# TESTING #
+###########
+
+def test_engine():
+    """ Test that an engine gives the same output as a compiler, with its
+    defaults overridden per call. """
+    engine = HPMLEngine(enclose=False)
+    hpml = "First line\n#PLACE{Rome}"
+    expected = HPMLCompiler(input_string=hpml, enclose=False)
+    assert engine.compile(hpml) == expected.compile()
+    expected = HPMLCompiler(input_string=hpml, line_numbers=5)
+    assert engine.compile(hpml, enclose=True, line_numbers=5) == \
+        expected.compile()
+    with pytest.raises(HPMLEngineException):
+        engine.compile(hpml, path_to_input_file="poem.hpml")
+    with pytest.raises(HPMLEngineException):
+        HPMLEngine(colour="red")
+    with pytest.raises(HPMLEngineException):
+        engine.compile(hpml, targets=["pdf"])
+    with pytest.raises(HPMLEngineException):
+        engine.compile(hpml, enclose="yes")
+
+def test_engine_threads():
+    """ Test that one engine, shared between many threads, gives the same
+    output as compiling each poem on its own. """
+    texts = []
+    for filename in POEMS:
+        with open(PATH_OBJ_TO_DATA/filename, "r") as hpml_file:
+            texts.append(hpml_file.read())
+    expected = [HPMLCompiler(input_string=text).compile() for text in texts]
+    stats = CompileStats()
+    engine = HPMLEngine(cache=CompileCache(), stats=stats)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        outputs = list(executor.map(engine.compile, texts*20))
+    assert outputs == expected*20
+    assert engine.cache.get_stats()["size"] == len(POEMS)
+    assert stats.compilations >= len(POEMS)
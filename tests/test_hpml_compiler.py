@@ -6,7 +6,9 @@ This code defines the functions which test the HPMLCompiler class.
 from pathlib import Path
 
 # Source imports.
+from source.cache import CompileCache, StanzaCache
 from source.hpml_compiler import HPMLCompiler
+from source.stats import CompileStats
 
 # Local constants.
 PATH_OBJ_TO_DATA = Path(__file__).parent/"data"
@@ -21,6 +23,16 @@ def compile_hpml_from_path(path_to_hpml):
     compiler.compile()
     compiler.save_to_file()
 
+def get_counts(stats) -> tuple[dict, dict]:
+    """ Get the replacements made by each stage, and the commands replaced,
+    from a stats object. """
+    records = stats.to_dict()
+    replacements = {
+        name: stage["replacements"]
+        for name, stage in records["stages"].items()
+    }
+    return replacements, records["commands"]
+
 def assert_tex_equals(path_to_actual, path_to_expected):
     """ Assert that the contents of two .tex files are the same. """
     with open(path_to_actual, "r") as actual_file:
@@ -69,3 +81,101 @@ def test_bug_chorus_endings():
     assert_tex_equals(path_to_actual, path_to_expected)
     # Clean.
     Path(path_to_actual).unlink()
+
+def test_cache():
+    """ Test that the cache returns the same output, and counts its hits,
+    misses and evictions. """
+    cache = CompileCache(maxsize=1)
+    hpml = "Thou still unravished bride of quietness,\n#PLACE{Arcady}"
+    outputs = []
+    for line_numbers in (None, None, 5, None):
+        compiler = \
+            HPMLCompiler(
+                input_string=hpml,
+                line_numbers=line_numbers,
+                cache=cache
+            )
+        outputs.append(compiler.compile())
+    assert outputs[0] == outputs[1] == outputs[3] != outputs[2]
+    assert outputs[0] == HPMLCompiler(input_string=hpml).compile()
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 3, 2)
+
+def test_stats():
+    """ Test that the stats aggregate across compilations, and count each
+    command replaced. """
+    stats = CompileStats()
+    hpml = "###CHORUS\n#PLACE{Tempe} #ADD #PLACE{Arcady}\n##TAB #ADD #HALF"
+    for _ in range(2):
+        compiler = HPMLCompiler(input_string=hpml, stats=stats)
+        assert compiler.compile() == HPMLCompiler(input_string=hpml).compile()
+    exported = stats.to_dict()
+    assert exported["compilations"] == 2
+    assert exported["commands"] == {"#ADD": 4, "#PLACE{": 4, "##TAB": 2}
+    assert exported["stages"]["_translate"]["replacements"] == 10
+    assert exported["stages"]["_process_choruses"]["replacements"] == 2
+    assert exported["stages"]["_preprocess"]["replacements"] == 2
+    assert exported["stages"]["_center_output"]["calls"] == 2
+
+def test_stanza_cache():
+    """ Test that only the stanzas which have changed are recompiled, that a
+    repeated stanza is compiled once, and that the output is unchanged. Each
+    stanza is cached twice: once as LaTeX, and once as the plain text used to
+    center the poem. """
+    path_to_hpml = str(PATH_OBJ_TO_DATA/"south_australia.hpml")
+    with open(path_to_hpml, "r") as hpml_file:
+        hpml = hpml_file.read()
+    stanza_cache = StanzaCache()
+    compiler = HPMLCompiler(input_string=hpml, stanza_cache=stanza_cache)
+    assert compiler.compile() == HPMLCompiler(input_string=hpml).compile()
+    size = len(stanza_cache)
+    assert size == stanza_cache.misses > 0
+    compiler = HPMLCompiler(input_string=hpml, stanza_cache=stanza_cache)
+    assert compiler.compile() == HPMLCompiler(input_string=hpml).compile()
+    assert len(stanza_cache) == stanza_cache.misses == size
+    edited = hpml.replace("one morning fair", "one morning bright")
+    compiler = HPMLCompiler(input_string=edited, stanza_cache=stanza_cache)
+    assert compiler.compile() == HPMLCompiler(input_string=edited).compile()
+    assert len(stanza_cache) == stanza_cache.misses == size+2
+    chorus = "###CHORUS\nHeave away! Haul away!\n\n"
+    repeated = chorus*3+"The end."
+    stanza_cache = StanzaCache()
+    compiler = HPMLCompiler(input_string=repeated, stanza_cache=stanza_cache)
+    assert compiler.compile() == HPMLCompiler(input_string=repeated).compile()
+    assert len(stanza_cache) == 4
+
+def test_stanza_cache_stats():
+    """ Test that the stats for a compilation are the same whether or not its
+    stanzas were restored from the stanza cache, even one filled without
+    stats. """
+    path_to_hpml = str(PATH_OBJ_TO_DATA/"south_australia.hpml")
+    with open(path_to_hpml, "r") as hpml_file:
+        hpml = hpml_file.read()
+    chorus = "###CHORUS\nHeave away! Haul away!\n\n"
+    stanza_cache = StanzaCache()
+    for input_string in (hpml, hpml, chorus*3+"The end.", chorus+"The end."):
+        expected = CompileStats()
+        HPMLCompiler(input_string=input_string, stats=expected).compile()
+        actual = CompileStats()
+        compiler = \
+            HPMLCompiler(
+                input_string=input_string,
+                stanza_cache=stanza_cache,
+                stats=actual
+            )
+        compiler.compile()
+        assert get_counts(actual) == get_counts(expected)
+    assert stanza_cache.hits > 0
+    expected = CompileStats()
+    HPMLCompiler(input_string=hpml, stats=expected).compile()
+    stanza_cache = StanzaCache()
+    HPMLCompiler(input_string=hpml, stanza_cache=stanza_cache).compile()
+    actual = CompileStats()
+    compiler = \
+        HPMLCompiler(
+            input_string=hpml,
+            stanza_cache=stanza_cache,
+            stats=actual
+        )
+    compiler.compile()
+    assert get_counts(actual) == get_counts(expected)
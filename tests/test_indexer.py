@@ -0,0 +1,87 @@
+"""
+This code defines the functions which test the CorpusIndex class and the "hpml
+index" command.
+"""
+
+# Standard imports.
+import os
+
+# Source imports.
+from source.cli import run_cli
+from source.indexer import CorpusIndex, index_text
+
+###########
+# TESTING #
+###########
+
+def test_index_text():
+    """ Test that words are taken from the verse, and entities from anywhere,
+    with the lines on which they are found. """
+    hpml = (
+        "###SETTOWIDTH{Ignored}\n"
+        "We rounded #PLACE{Cape   Horn} in the #SHIP{Lady Ann},\n"
+        "\n"
+        "And Cape Horn again.#FOOTNOTE{See #PERSON{Nancy Blair}.}"
+    )
+    words, entities = index_text(hpml)
+    assert "ignored" not in words
+    assert words["horn"] == [2, 4]
+    assert "nancy" not in words
+    assert entities["place"] == {"cape horn": [2]}
+    assert entities["ship"] == {"lady ann": [2]}
+    assert entities["person"] == {"nancy blair": [4]}
+
+def test_deep_nesting():
+    """ Test that a long run of unclosed commands doesn't exhaust the stack,
+    and that entities nested within it, but not too deeply, are still
+    found. """
+    hpml = (
+        "Rowing to #FOOTNOTE{#PERSON{#PLACE{Java}}}\n"+
+        "#FOOTNOTE{"*2000+"Lost"
+    )
+    words, entities = index_text(hpml)
+    assert words["rowing"] == [1]
+    assert entities["person"] == {"java": [1]}
+    assert entities["place"] == {"java": [1]}
+
+def test_corpus_index(tmp_path):
+    """ Test that the index is searchable, that only changed files are indexed
+    again, and that deleted files are forgotten. """
+    path_obj_to_first = tmp_path/"first.hpml"
+    path_obj_to_second = tmp_path/"sub"/"second.hpml"
+    path_obj_to_second.parent.mkdir()
+    path_obj_to_first.write_text("Round #PLACE{Cape Horn} we go")
+    path_obj_to_second.write_text("Off to sea\nRound the Horn")
+    report = CorpusIndex(tmp_path).update()
+    assert len(report.indexed) == 2
+    corpus_index = CorpusIndex(tmp_path)
+    assert corpus_index.find_entity("cape  horn", kind="place") == \
+        {str(path_obj_to_first): [1]}
+    assert list(corpus_index.find_word("HORN")) == \
+        [str(path_obj_to_first), str(path_obj_to_second)]
+    assert corpus_index.search(words=["sea", "horn"]) == \
+        [str(path_obj_to_second)]
+    report = corpus_index.update()
+    assert (len(report.indexed), len(report.skipped)) == (0, 2)
+    path_obj_to_first.write_text("Round #SHIP{Cape Horn} we go")
+    os.utime(path_obj_to_second, ns=(0, 0))
+    path_obj_to_third = tmp_path/"third.hpml"
+    path_obj_to_third.write_text("Nothing much")
+    report = CorpusIndex(tmp_path).update()
+    assert report.indexed == [str(path_obj_to_first), str(path_obj_to_third)]
+    path_obj_to_second.unlink()
+    corpus_index = CorpusIndex(tmp_path)
+    report = corpus_index.update()
+    assert report.removed == [str(path_obj_to_second)]
+    assert corpus_index.find_entity("Cape Horn", kind="place") == {}
+    assert corpus_index.get_entities("ship") == ["cape horn"]
+    assert corpus_index.find_word("sea") == {}
+    assert "sea" not in corpus_index.words
+
+def test_cli_index(tmp_path, capsys):
+    """ Test the index subcommand. """
+    (tmp_path/"poem.hpml").write_text("To #PLACE{Valparaiso}")
+    assert run_cli(["index", str(tmp_path)]) == 0
+    assert "Indexed 1, skipped 0," in capsys.readouterr().out
+    assert run_cli(["index", str(tmp_path), "--entity", "valparaiso"]) == 0
+    assert capsys.readouterr().out == str(tmp_path/"poem.hpml")+"\n"
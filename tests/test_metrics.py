@@ -0,0 +1,68 @@
+"""
+This code defines the functions which test the width estimator.
+"""
+
+# Source imports.
+from source.hpml_compiler import HPMLCompiler
+from source.metrics import ITALIC, WidthEstimator
+from source.parser import MAX_NESTING_DEPTH, parse_document
+from source.streaming import StreamingCompiler
+
+###########
+# TESTING #
+###########
+
+def test_measure_line():
+    """ Test that fonts, indents and zero-width commands are accounted for. """
+    estimator = WidthEstimator()
+    roman = estimator.measure_line("Arcady")
+    assert estimator.measure_line("#PERSON{Arcady}") == \
+        estimator.measure_text("Arcady", ITALIC)
+    assert estimator.measure_line("#PLACE{Arcady}") != roman
+    assert estimator.measure_line("##TAB Arcady") == \
+        estimator.tab+estimator.measure_text(" Arcady")
+    assert estimator.measure_line("Arcady#FOOTNOTE{A long note}") == roman
+    assert estimator.measure_line("##MINIINSCRIPTION Arcady") == \
+        estimator.measure_text("Arcady", ITALIC)
+
+def test_get_second_widest_line():
+    """ Test that lines are ranked by width, not by length, and that choruses
+    are measured in italics. """
+    hpml = (
+        "illicit little lilies, ill\n"+
+        "WOMBAT MAW WOW\n"+
+        "MOW WHOM MOW\n"+
+        "\n"+
+        "###CHORUS\n"+
+        "WOW WOW\n"
+    )
+    estimator = WidthEstimator()
+    document = parse_document(hpml)
+    assert estimator.get_second_widest_line(document.stanzas).hpml == \
+        "MOW WHOM MOW"
+    assert estimator.measure_document(document)[-1][0] == \
+        estimator.measure_text("WOW WOW", ITALIC)
+    assert estimator.get_second_widest_line([]) is None
+
+def test_estimate_widths(tmp_path):
+    """ Test that the compiler and the streaming compiler agree. """
+    hpml = "illicit little lilies, ill\nWOMBAT MAW WOW\nMOW WHOM MOW"
+    output = HPMLCompiler(input_string=hpml, estimate_widths=True).compile()
+    assert "\\settowidth{\\versewidth}{MOW WHOM MOW}" in output
+    assert "MOW WHOM MOW}" not in HPMLCompiler(input_string=hpml).compile()
+    path_obj_to_input = tmp_path/"poem.hpml"
+    path_obj_to_input.write_text(hpml)
+    streaming_compiler = \
+        StreamingCompiler(path_obj_to_input, estimate_widths=True)
+    assert "\n".join(streaming_compiler.iter_latex()) == output
+
+def test_deep_nesting():
+    """ Test that a long run of unclosed commands is measured, as far as it is
+    nested too deeply, as text, without exhausting the stack. """
+    estimator = WidthEstimator()
+    hpml = "#ITAL{"*600+"x"
+    rest = "#ITAL{"*(600-MAX_NESTING_DEPTH-1)+"x"
+    assert estimator.measure_line(hpml) == \
+        estimator.measure_text(rest, ITALIC)
+    compiler = HPMLCompiler(input_string=hpml, estimate_widths=True)
+    assert compiler.compile() == HPMLCompiler(input_string=hpml).compile()
@@ -0,0 +1,132 @@
+"""
+This code defines the functions which test the parser.
+"""
+
+# Standard imports.
+import time
+
+# Source imports.
+from source.centerer import convert_line_of_hpml_to_plain_text
+from source.parser import (
+    Command,
+    LineKind,
+    is_directive,
+    match_braces,
+    parse_document,
+    remove_commands_keep_arguments,
+    remove_commands_with_arguments,
+    tokenise
+)
+
+###########
+# TESTING #
+###########
+
+def test_parse_document():
+    """ Test that a document is split into directives, stanzas and lines. """
+    hpml = (
+        "###EPIGRAPH{Some epigraph}\n"+
+        "  First   line\n"+
+        "##MINICHORUS Heave away!\n"+
+        "\n\n"+
+        "###CHORUS\n"+
+        "Haul away!\n"
+    )
+    document = parse_document(hpml)
+    assert document.epigraph == "Some epigraph"
+    assert document.settowidth is None
+    assert len(document.stanzas) == 2
+    first, second = document.stanzas
+    assert first.lines[0].hpml == "First line"
+    assert first.lines[1].kind == LineKind.MINI_BLOCK
+    assert second.lines[0].kind == LineKind.BLOCK_OPENER
+    assert document.get_hpml_lines() == [
+        "First line",
+        "##MINICHORUS Heave away!",
+        "",
+        "###CHORUS",
+        "Haul away!"
+    ]
+
+def test_stanza_index():
+    """ Test that the parser indexes each stanza's source lines and blocks,
+    and the position of each directive, as it goes. """
+    hpml = (
+        "First line\n"+
+        "###SETTOWIDTH{Width}\n"+
+        "##MINIINSCRIPTION Second line\n"+
+        "\n"+
+        "###CHORUS\n"+
+        "Third line\n"+
+        "###SETTOWIDTH{Ignored}\n"
+    )
+    document = parse_document(hpml)
+    assert document.settowidth == "Width"
+    assert document.directives == {"settowidth": (1, "Width")}
+    first, second = document.stanzas
+    assert (first.start, first.end) == (0, 3)
+    assert (first.block_openers, first.mini_blocks) == ([], [1])
+    assert (second.start, second.end) == (4, 7)
+    assert (second.block_openers, second.mini_blocks) == ([0], [])
+    assert second.lines[-1].hpml == "###SETTOWIDTH{Ignored}"
+
+def test_tokenise():
+    """ Test that each command's braces are matched correctly. """
+    tokens = tokenise("To #PLACE{#ITAL{Rome}} and ##TAB #FOOTNOTE{unclosed")
+    assert tokens == [
+        "To ",
+        Command("#PLACE", "#ITAL{Rome}"),
+        " and ",
+        Command("##TAB"),
+        " ",
+        Command("#FOOTNOTE", "unclosed", is_closed=False)
+    ]
+    assert tokens[1].get_tokens() == [Command("#ITAL", "Rome")]
+
+def test_whitespace_normalisation():
+    """ Test that the whitespace is normalised across the whole document, but
+    that a directive is only recognised if it stands unpadded. """
+    hpml = (
+        "  First   line  \n"+
+        " \n"+
+        "\n"+
+        " ###SETTOWIDTH{Padded}\n"+
+        "###EPIGRAPH{Some  epigraph}\n"
+    )
+    document = parse_document(hpml)
+    assert document.settowidth is None
+    assert document.epigraph == "Some  epigraph"
+    first, second = document.stanzas
+    assert [line.hpml for line in first.lines] == ["First line"]
+    assert [line.hpml for line in second.lines] == ["###SETTOWIDTH{Padded}"]
+
+def test_brace_matching():
+    """ Test that each command is removed along with its argument, and no more,
+    however its braces are nested, and that a command whose argument is not
+    closed on the same line is left alone. """
+    assert match_braces("{a{b}}{\n}{") == {2: 4, 0: 5, 6: -1, 9: -1}
+    openers = ("#FOOTNOTE{", "##MARGINNOTE{")
+    line = "A #FOOTNOTE{x {y}} b ##MARGINNOTE{#ITAL{z}} c #PLACE{Rome}"
+    assert remove_commands_with_arguments(line, openers) == \
+        "A  b  c #PLACE{Rome}"
+    line = "A #FOOTNOTE{open\nB #FOOTNOTE{shut}"
+    assert remove_commands_with_arguments(line, openers) == \
+        "A #FOOTNOTE{open\nB "
+    assert remove_commands_keep_arguments("#PLACE{#ITAL{Rome}} {x} #ED") == \
+        "Rome {x} "
+    assert convert_line_of_hpml_to_plain_text(
+        "To #PLACE{Rome}#FOOTNOTE{A note.} and #PLACE{Troy}"
+    ) == "To Rome and Troy"
+    assert is_directive("###EPIGRAPH{To {my} love}", "###EPIGRAPH{")
+    assert not is_directive("###EPIGRAPH{To} my {love}", "###EPIGRAPH{")
+
+def test_brace_matching_is_linear():
+    """ Test that a line of many unclosed, or deeply nested, commands takes no
+    more than linear time. """
+    openers = ("#FOOTNOTE{",)
+    for line in ("#FOOTNOTE{"*20000, "#FOOTNOTE{"*20000+"}"*20000):
+        start = time.perf_counter()
+        remove_commands_with_arguments(line, openers)
+        remove_commands_keep_arguments(line)
+        convert_line_of_hpml_to_plain_text(line)
+        assert time.perf_counter()-start < 1
@@ -2,6 +2,9 @@
 This code defines the functions which test the PREPROCESSOR class.
 """
 
+# Non-standard imports.
+import pytest
+
 # Source imports.
 from source.preprocessor import Preprocessor
 
@@ -45,3 +48,24 @@ def test_m_dashes_and_suppress_ampersands():
     after = preprocessor.preprocess()
     assert "#ADD" not in after
     assert " -- " not in after
+
+def test_suppress_marginnotes():
+    """ Test that margin notes are removed, braces and all, and nothing
+    else. """
+    before = "Line ##MARGINNOTE{A #PERSON{nested} note} of {verse}."
+    preprocessor = Preprocessor(before, ["suppress_marginnotes"])
+    assert preprocessor.preprocess() == "Line  of {verse}."
+
+def test_mod_plans_are_cached():
+    """ Test that the same set of mods, given in any order, compiles to the
+    same plan. """
+    mods = ["suppress_ampersands", "em_dashes", "suppress_fractions"]
+    preprocessor = Preprocessor("", mods)
+    assert Preprocessor("", list(reversed(mods))).plan is preprocessor.plan
+
+def test_unrecognised_mod_warns_every_time():
+    """ Test that an unrecognised mod is warned of on every compilation, not
+    only the first for which its plan is made. """
+    for _ in range(2):
+        with pytest.warns(UserWarning, match="no_such_mod"):
+            Preprocessor("", ["em_dashes", "no_such_mod"])
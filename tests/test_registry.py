@@ -0,0 +1,167 @@
+"""
+This code defines the functions which test the CommandRegistry class.
+"""
+
+# Standard imports.
+import json
+import pickle
+import threading
+
+# Non-standard imports.
+import pytest
+
+# Source imports.
+from source import registry as registry_module
+from source.hpml_compiler import HPMLCompiler
+from source.registry import (
+    MAX_PRECOMPILED,
+    CommandRegistry,
+    RegistryException
+)
+from source.translator import get_latex_translator
+
+# Local constants.
+DEFINITIONS = {
+    "syntactics": {
+        "#OE": {"latex": "\\oe{}", "plain": "oe", "html": "œ"}
+    },
+    "semantics": {
+        "saint": {"hpml": "#SAINT{", "latex": "{\\scshape St. "}
+    }
+}
+PYTHON_DEFINITIONS = \
+    "SYNTACTICS = {\"#YE\": {\"latex\": \"y\\\\textsuperscript{e}\"}}"
+
+###########
+# TESTING #
+###########
+
+def test_registry(tmp_path):
+    """ Test that commands are loaded from JSON and from Python, merged with
+    the bundled ones, and compiled. """
+    path_to_json = tmp_path/"house.json"
+    path_to_json.write_text(json.dumps(DEFINITIONS))
+    path_to_python = tmp_path/"house.py"
+    path_to_python.write_text(PYTHON_DEFINITIONS)
+    registry = CommandRegistry([path_to_json, path_to_python])
+    assert set(registry.syntactics) == {"#OE", "#YE"}
+    compiler = \
+        HPMLCompiler(
+            input_string="C#OEur of #SAINT{Paul} #YE #PLACE{Rome}",
+            enclose=False,
+            targets=["latex", "html"],
+            registry=registry
+        )
+    compiler.compile()
+    assert compiler.output_string == \
+        "C\\oe{}ur of {\\scshape St. Paul} y\\textsuperscript{e} \\textsc{Rome}"
+    assert "Cœur of Paul" in compiler.outputs["html"]
+
+def test_collisions():
+    """ Test that no command may be defined twice, or within another. """
+    registry = CommandRegistry()
+    with pytest.raises(RegistryException):
+        registry.add_syntactic("#ED", "e")
+    with pytest.raises(RegistryException):
+        registry.add_syntactic("#EDDOTS", "e")
+    with pytest.raises(RegistryException):
+        registry.add_syntactic("#LORD", "Lord")
+    with pytest.raises(RegistryException):
+        registry.add_syntactic("#TAB", "\\vin")
+    with pytest.raises(RegistryException):
+        registry.add_semantic("place", "#TOWN{", "\\textsc{")
+    with pytest.raises(RegistryException):
+        registry.add_syntactic("#lower", "")
+    assert not registry.has_extras()
+
+def test_update_is_all_or_nothing(tmp_path):
+    """ Test that, if any command in a file is refused, none is added, so that
+    a corrected file can be loaded afterwards. """
+    definitions = {
+        "syntactics": {
+            "#OE": {"latex": "\\oe{}"},
+            "#EDDOTS": {"latex": "e"}
+        }
+    }
+    path_to_json = tmp_path/"house.json"
+    path_to_json.write_text(json.dumps(definitions))
+    registry = CommandRegistry()
+    with pytest.raises(RegistryException):
+        registry.load(path_to_json)
+    with pytest.raises(RegistryException):
+        registry.update({"syntactics": {"#AE": {"plain": "ae"}}})
+    assert not registry.has_extras()
+    del definitions["syntactics"]["#EDDOTS"]
+    path_to_json.write_text(json.dumps(definitions))
+    registry.load(path_to_json)
+    assert set(registry.syntactics) == {"#OE"}
+
+def test_bad_definitions():
+    """ Test that a definition with a field missing, or one too many, or
+    which isn't a dictionary at all, is refused, naming the command. """
+    registry = CommandRegistry()
+    cases = (
+        {"syntactics": {"#OE": {"latx": "\\oe{}"}}},
+        {"syntactics": {"#OE": {"hpml": "#OE", "latex": "\\oe{}"}}},
+        {"syntactics": {"#OE": "\\oe{}"}},
+        {"semantics": {"hull": {"hpml": "#HULL{", "colour": "red"}}}
+    )
+    for definitions in cases:
+        with pytest.raises(RegistryException) as error:
+            registry.update(definitions)
+        name = next(iter(next(iter(definitions.values()))))
+        assert name in str(error.value)
+    assert not registry.has_extras()
+
+def test_translators_match_fingerprint(monkeypatch):
+    """ Test that the definitions can't change while the translators are being
+    built, so that they are never cached under the wrong fingerprint. """
+    registry = CommandRegistry()
+    registry.add_syntactic("#OE", "\\oe{}")
+    build = registry_module.load_or_build_translators
+    updater = \
+        threading.Thread(target=registry.add_syntactic, args=("#AE", "\\ae{}"))
+    def build_while_updating(fingerprint, *args, **kwargs):
+        updater.start()
+        updater.join(timeout=0.1)
+        assert updater.is_alive()
+        assert fingerprint == registry.get_fingerprint()
+        assert "#AE" not in registry.syntactics
+        return build(fingerprint, *args, **kwargs)
+    monkeypatch.setattr(
+        registry_module,
+        "load_or_build_translators",
+        build_while_updating
+    )
+    latex_translator, _ = registry.get_translators()
+    updater.join()
+    assert latex_translator.translate("#AE") == "#AE"
+    monkeypatch.setattr(registry_module, "load_or_build_translators", build)
+    assert registry.get_latex_translator().translate("#AE") == "\\ae{}"
+
+def test_precompiled_are_pruned(isolate_cache_dir):
+    """ Test that no more than a few registries' translators are kept in the
+    cache directory. """
+    for index in range(MAX_PRECOMPILED+3):
+        registry = CommandRegistry()
+        registry.add_syntactic("#OE", "\\oe{}"+str(index))
+        registry.get_translators()
+    pickles = list(isolate_cache_dir.glob("translators-*.pickle"))
+    assert len(pickles) == MAX_PRECOMPILED
+
+def test_translators_are_cached():
+    """ Test that the translators are built once, and again only when the
+    definitions change, and survive pickling. """
+    registry = CommandRegistry()
+    assert registry.get_latex_translator() is get_latex_translator()
+    registry.add_syntactic("#OE", "\\oe{}")
+    translator = registry.get_latex_translator()
+    assert registry.get_latex_translator() is translator
+    fingerprint = registry.get_fingerprint()
+    registry.add_syntactic("#AE", "\\ae{}")
+    assert registry.get_fingerprint() != fingerprint
+    assert registry.get_latex_translator().translate("#AE#OE") == \
+        "\\ae{}\\oe{}"
+    copy = pickle.loads(pickle.dumps(registry))
+    assert copy.get_fingerprint() == registry.get_fingerprint()
+    assert copy.get_latex_translator().translate("#OE") == "\\oe{}"
@@ -0,0 +1,203 @@
+"""
+This code defines the functions which test the compile server.
+"""
+
+# Standard imports.
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+import json
+import os
+import socket
+import threading
+
+# Non-standard imports.
+import pytest
+
+# Source imports.
+from source import server as server_module
+from source.asynchronous import compile_text
+from source.hpml_compiler import HPMLCompiler
+from source.server import (
+    Batcher,
+    CompileServer,
+    CompileServerException,
+    ServerMetrics,
+    get_percentile,
+    is_listening,
+    is_socket,
+    split_batch
+)
+
+####################
+# HELPER FUNCTIONS #
+####################
+
+def request_json(url, body=None) -> dict:
+    """ Make a request, and decode the JSON response. """
+    data = None if body is None else json.dumps(body).encode()
+    with urlopen(Request(url, data=data)) as response:
+        return json.loads(response.read())
+
+###########
+# TESTING #
+###########
+
+def test_compile_server():
+    """ Test that the server compiles requests, batching those which arrive
+    together, and reports on its health and its metrics. """
+    hpml = "First line\n#PLACE{Rome}"
+    expected = HPMLCompiler(input_string=hpml, line_numbers=5).compile()
+    with CompileServer(port=0, jobs=1, max_batch_delay=0.05) as server:
+        url = server.get_address()
+        assert request_json(url+"/health")["status"] == "ok"
+        body = {"hpml": hpml, "options": {"line_numbers": 5}}
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            responses = \
+                list(
+                    executor.map(
+                        lambda _: request_json(url+"/compile", body),
+                        range(8)
+                    )
+                )
+        assert responses == [{"latex": expected}]*8
+        with pytest.raises(HTTPError) as error:
+            request_json(url+"/compile", {"hpml": hpml, "options": {"x": 1}})
+        assert error.value.code == 400
+        metrics = request_json(url+"/metrics")
+        assert metrics["requests"] == 9
+        assert metrics["errors"] == 1
+        assert metrics["batches"] < 8
+        assert metrics["queue_depth"] == 0
+        assert set(metrics["latency"]) == {"p50", "p90", "p99"}
+
+def test_get_percentile():
+    """ Ronseal. """
+    assert get_percentile([], 0.5) == 0.0
+    assert get_percentile([1, 2, 3, 4], 0.5) == 3
+    assert get_percentile([1, 2, 3, 4], 0.99) == 4
+
+def test_split_batch():
+    """ Test that a burst of requests is spread across the workers. """
+    assert split_batch(list(range(16)), 4) == \
+        [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9, 10, 11], [12, 13, 14, 15]]
+    assert split_batch(list(range(5)), 2) == [[0, 1, 2], [3, 4]]
+    assert split_batch([0, 1], 8) == [[0], [1]]
+    assert split_batch([0, 1], 1) == [[0, 1]]
+
+def test_socket_path(tmp_path):
+    """ Test that the server refuses to replace a file which isn't a socket,
+    or a socket on which another server is listening, and that it replaces,
+    and cleans up, a stale socket. """
+    path_obj_to_file = tmp_path/"not_a_socket"
+    path_obj_to_file.write_text("Precious")
+    with pytest.raises(CompileServerException):
+        CompileServer(socket_path=str(path_obj_to_file), jobs=1)
+    assert path_obj_to_file.read_text() == "Precious"
+    path_to_socket = str(tmp_path/"hpml.sock")
+    with CompileServer(socket_path=path_to_socket, jobs=1):
+        assert is_socket(path_to_socket)
+        with pytest.raises(CompileServerException):
+            CompileServer(socket_path=path_to_socket, jobs=1)
+        assert is_listening(path_to_socket)
+    stale = socket.socket(socket.AF_UNIX)
+    stale.bind(path_to_socket)
+    stale.close()
+    assert not is_listening(path_to_socket)
+    with CompileServer(socket_path=path_to_socket, jobs=1):
+        assert is_socket(path_to_socket)
+    assert not os.path.lexists(path_to_socket)
+
+def test_error_statuses(monkeypatch):
+    """ Test that a malformed request, or a bad option, gets a 400, a failed
+    compilation, or a broken pool, a 500, and a compilation which hangs a
+    504. """
+    with CompileServer(port=0, jobs=1, request_timeout=0.1) as server:
+        url = server.get_address()+"/compile"
+        cases = (
+            ([], 400),
+            ({"hpml": 1}, 400),
+            ({"hpml": "A line", "options": {"targets": ["pdf"]}}, 400),
+            ({"hpml": "A line", "options": {"line_numbers": "5"}}, 400),
+            ({"hpml": ""}, 500)
+        )
+        for body, status in cases:
+            with pytest.raises(HTTPError) as error:
+                request_json(url, body)
+            assert error.value.code == status
+        broken = Future()
+        broken.set_exception(BrokenProcessPool("A worker died."))
+        monkeypatch.setattr(server, "compile", lambda *_: broken)
+        with pytest.raises(HTTPError) as error:
+            request_json(url, {"hpml": "A line"})
+        assert error.value.code == 500
+        monkeypatch.setattr(server, "compile", lambda *_: Future())
+        with pytest.raises(HTTPError) as error:
+            request_json(url, {"hpml": "A line"})
+        assert error.value.code == 504
+
+def test_cancelled_requests():
+    """ Test that a request cancelled while queued is left out of its batch,
+    that one which has been sent off can't be cancelled, and that the rest of
+    the batch gets its results either way. """
+    hpmls = ["Line "+str(index) for index in range(4)]
+    expected = [compile_text(hpml, {}) for hpml in hpmls]
+    blocker = threading.Event()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        metrics = ServerMetrics()
+        batcher = Batcher(executor, metrics, max_batch_delay=0.05)
+        try:
+            futures = [batcher.submit(hpml, {}) for hpml in hpmls]
+            assert futures[1].cancel()
+            batcher.start()
+            for index in (0, 2, 3):
+                assert futures[index].result(timeout=10) == expected[index]
+            assert futures[1].cancelled()
+            executor.submit(blocker.wait)
+            futures = [batcher.submit(hpml, {}) for hpml in hpmls]
+            while metrics.batches < 2:
+                blocker.wait(0.01)
+            assert not futures[1].cancel()
+            blocker.set()
+            assert [future.result(timeout=10) for future in futures] == \
+                expected
+        finally:
+            blocker.set()
+            batcher.stop()
+
+def test_hung_workers(monkeypatch):
+    """ Test that a worker stuck on a batch is counted as hung once a request
+    would have timed out, and that the server then reports itself as
+    unhealthy. """
+    blocker = threading.Event()
+    monkeypatch.setattr(
+        server_module,
+        "compile_batch",
+        lambda jobs: blocker.wait() and [("Done", None)]*len(jobs)
+    )
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        metrics = ServerMetrics()
+        batcher = Batcher(executor, metrics, max_batch_delay=0)
+        batcher.start()
+        try:
+            future = batcher.submit("A line", {})
+            while metrics.batches < 1:
+                blocker.wait(0.01)
+            assert batcher.count_hung(60) == 0
+            blocker.wait(0.05)
+            assert batcher.count_hung(0.01) == 1
+            blocker.set()
+            assert future.result(timeout=10) == "Done"
+            assert batcher.count_hung(0) == 0
+        finally:
+            blocker.set()
+            batcher.stop()
+    with CompileServer(port=0, jobs=2) as server:
+        url = server.get_address()+"/health"
+        monkeypatch.setattr(server.batcher, "count_hung", lambda _: 1)
+        assert request_json(url)["status"] == "degraded"
+        monkeypatch.setattr(server.batcher, "count_hung", lambda _: 2)
+        with pytest.raises(HTTPError) as error:
+            request_json(url)
+        assert error.value.code == 503
@@ -0,0 +1,51 @@
+"""
+This code defines the functions which test the StreamingCompiler class.
+"""
+
+# Standard imports.
+from io import StringIO
+from pathlib import Path
+
+# Non-standard imports.
+import pytest
+
+# Source imports.
+from source.hpml_compiler import HPMLCompiler, HPMLCompilerException
+from source.streaming import StreamingCompiler
+
+# Local constants.
+PATH_OBJ_TO_DATA = Path(__file__).parent/"data"
+
+###########
+# TESTING #
+###########
+
+def test_streaming_from_path():
+    """ Test that streaming from a path gives the same output as compiling the
+    whole file at once. """
+    for hpml_fn in (
+        "ode_on_a_grecian_urn.hpml",
+        "ode_on_a_grecian_urn_manual_centering.hpml",
+        "south_australia.hpml"
+    ):
+        path_to_hpml = str(PATH_OBJ_TO_DATA/hpml_fn)
+        compiler = HPMLCompiler(input_string=Path(path_to_hpml).read_text())
+        stream = StringIO()
+        StreamingCompiler(path_to_hpml).write_to(stream)
+        assert stream.getvalue() == compiler.compile()
+
+def test_streaming_from_iterable():
+    """ Test streaming from an iterable of lines, which can't be scanned
+    ahead. """
+    hpml = (PATH_OBJ_TO_DATA/"south_australia.hpml").read_text()
+    streaming_compiler = \
+        StreamingCompiler(StringIO(hpml), auto_center=False, line_numbers=5)
+    compiler = \
+        HPMLCompiler(input_string=hpml, auto_center=False, line_numbers=5)
+    assert list(streaming_compiler.iter_latex()) == \
+        compiler.compile().split("\n")
+    with pytest.raises(HPMLCompilerException):
+        list(StreamingCompiler(StringIO(hpml)).iter_latex())
+    with pytest.raises(HPMLCompilerException):
+        lines = ["First line", "", "###EPIGRAPH{Too late}"]
+        list(StreamingCompiler(lines, auto_center=False).iter_latex())
@@ -0,0 +1,72 @@
+"""
+This code defines the functions which test the TeXRunner class.
+"""
+
+# Standard imports.
+import sys
+
+# Source imports.
+from source.hpml_compiler import HPMLCompiler
+from source.tex_runner import TeXRunner, TeXRunnerException, wrap_in_document
+
+# Local constants.
+# A stand-in for a TeX engine, which "typesets" a document by copying it, and
+# fails on any document which contains the word "FAIL".
+STUB_TEX = """
+import sys
+document = open(sys.argv[1]).read()
+open("poem.log", "w").write("Typeset "+str(len(document))+" characters.")
+if "FAIL" in document:
+    sys.exit(1)
+open("poem.pdf", "w").write(document)
+"""
+
+###########
+# TESTING #
+###########
+
+def test_wrap_in_document():
+    """ Test that a poem is wrapped once, and only once. """
+    document = wrap_in_document("Some verse", preamble="\\usepackage{verse}")
+    assert document.startswith("\\documentclass{article}")
+    assert "\\usepackage{verse}\n\n\\begin{document}\n\nSome verse" in document
+    assert document.endswith("\\end{document}\n")
+    assert wrap_in_document(document) == document
+
+def test_tex_runner(tmp_path):
+    """ Test that each poem is typeset, that identical documents are taken
+    from the cache, and that a failure is reported along with its log. """
+    path_to_stub = tmp_path/"stub_tex.py"
+    path_to_stub.write_text(STUB_TEX)
+    paths_to_tex = []
+    for name, hpml in (("a", "First poem"), ("b", "Second poem")):
+        compiler = HPMLCompiler(input_string=hpml)
+        compiler.path_to_output_file = tmp_path/(name+".tex")
+        compiler.compile()
+        paths_to_tex.append(compiler.save_to_file())
+    runner = \
+        TeXRunner(
+            tex_command=[sys.executable, str(path_to_stub)],
+            jobs=2,
+            preamble="",
+            path_to_cache_dir=tmp_path/"cache"
+        )
+    results = runner.typeset(paths_to_tex)
+    assert [(result.ok, result.cached) for result in results] == \
+        [(True, False), (True, False)]
+    expected = wrap_in_document(paths_to_tex[0].read_text(), preamble="")
+    assert results[0].path_to_pdf.read_text() == expected
+    assert results[0].path_to_log.read_text().startswith("Typeset")
+    results = \
+        runner.typeset_strings(
+            [
+                (paths_to_tex[1].read_text(), tmp_path/"c.pdf"),
+                ("FAIL", tmp_path/"d.pdf")
+            ]
+        )
+    assert results[0].cached
+    assert (tmp_path/"c.pdf").read_text() == \
+        (tmp_path/"b.pdf").read_text()
+    assert isinstance(results[1].error, TeXRunnerException)
+    assert (tmp_path/"d.log").exists()
+    assert not (tmp_path/"d.pdf").exists()
@@ -0,0 +1,77 @@
+"""
+This code defines the functions which test the Translator class.
+"""
+
+# Standard imports.
+import pickle
+
+# Source imports.
+from source.translator import (
+    PRECOMPILED_FN,
+    Translator,
+    get_bundled_translators,
+    get_latex_pairs,
+    get_latex_translator
+)
+from source.utils import CACHE_DIR_ENV_VAR
+
+####################
+# HELPER FUNCTIONS #
+####################
+
+def translate_sequentially(pairs, string):
+    """ Apply each pair in turn, as the compiler used to. """
+    for old, new in pairs:
+        string = string.replace(old, new)
+    return string
+
+###########
+# TESTING #
+###########
+
+def test_latex_translator():
+    """ Test that the bundled tables translate as they always have. """
+    before = "#PLACE{Rome} #ADD #EDDOT #HALF ##TAB #SUB#GOD #FOOTNOTE{#ETC}"
+    latex_translator = get_latex_translator()
+    after = latex_translator.translate(before)
+    assert after == translate_sequentially(latex_translator.pairs, before)
+    assert "\\textsc{Rome}" in after
+
+def test_order_dependent_table():
+    """ Test that order-dependent tables give the same result as applying each
+    pair in turn. """
+    pairs = [("BC", "x"), ("AB", "y"), ("C", ""), ("A{", "#"), ("#", "{")]
+    for before in ("ABC", "ACBC", "AC{", "#A#BC", "ABCABC"):
+        after = Translator(pairs).translate(before)
+        assert after == translate_sequentially(pairs, before)
+
+def test_precompiled_translators(tmp_path, monkeypatch):
+    """ Test that the translators are pickled on first use, and rebuilt if the
+    pickle goes stale, whether because the tables or the code have changed. """
+    monkeypatch.setenv(CACHE_DIR_ENV_VAR, str(tmp_path))
+    path_obj_to_precompiled = tmp_path/PRECOMPILED_FN
+    get_bundled_translators.cache_clear()
+    try:
+        latex_translator, _ = get_bundled_translators()
+        assert latex_translator.pairs == Translator(get_latex_pairs()).pairs
+        with open(path_obj_to_precompiled, "rb") as precompiled_file:
+            precompiled = pickle.load(precompiled_file)
+        precompiled["lookups"] = "stale"
+        precompiled["translators"] = None
+        with open(path_obj_to_precompiled, "wb") as precompiled_file:
+            pickle.dump(precompiled, precompiled_file)
+        get_bundled_translators.cache_clear()
+        latex_translator, _ = get_bundled_translators()
+        assert latex_translator.translate("#ADD") == "\\&"
+        with open(path_obj_to_precompiled, "rb") as precompiled_file:
+            precompiled = pickle.load(precompiled_file)
+        assert precompiled["lookups"] != "stale"
+        precompiled["code"] = "stale"
+        precompiled["translators"] = None
+        with open(path_obj_to_precompiled, "wb") as precompiled_file:
+            pickle.dump(precompiled, precompiled_file)
+        get_bundled_translators.cache_clear()
+        latex_translator, _ = get_bundled_translators()
+        assert latex_translator.translate("#ADD") == "\\&"
+    finally:
+        get_bundled_translators.cache_clear()
@@ -0,0 +1,32 @@
+"""
+This code defines the functions which test the Watcher class.
+"""
+
+# Standard imports.
+import os
+
+# Source imports.
+from source.watcher import Watcher
+
+###########
+# TESTING #
+###########
+
+def test_watcher(tmp_path):
+    """ Test that only files whose content has changed are recompiled, and
+    only once they have settled. """
+    path_obj_to_hpml = tmp_path/"poems"/"poem.hpml"
+    path_obj_to_hpml.parent.mkdir()
+    path_obj_to_hpml.write_text("First line\nSecond line")
+    watcher = Watcher(tmp_path, debounce=1)
+    assert watcher.scan(now=0) == []
+    assert watcher.scan(now=1) == [str(path_obj_to_hpml)]
+    assert path_obj_to_hpml.with_suffix(".tex").exists()
+    assert watcher.scan(now=2) == []
+    # Touch the file without changing it.
+    os.utime(path_obj_to_hpml, ns=(0, 0))
+    assert watcher.scan(now=3) == []
+    assert watcher.scan(now=4) == []
+    path_obj_to_hpml.write_text("First line\nChanged line")
+    assert watcher.scan(now=5) == []
+    assert watcher.scan(now=6) == [str(path_obj_to_hpml)]